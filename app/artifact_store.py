@@ -0,0 +1,290 @@
+import abc
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+from app.config import (
+    ARTIFACT_BACKEND,
+    ARTIFACT_MAX_MB,
+    ARTIFACT_MAX_AGE_HOURS,
+    ARTIFACT_S3_BUCKET,
+    ARTIFACT_S3_PREFIX,
+    ARTIFACT_S3_ENDPOINT_URL,
+    ARTIFACT_PUBLIC_URL,
+    GENERATE_DIR,
+    CACHE_DIR,
+)
+from app.llm_cache import normalize_prompt
+from app.metrics import ARTIFACT_BYTES
+
+ARTIFACT_DIR = GENERATE_DIR
+INDEX_PATH = os.path.join(CACHE_DIR, "artifacts.sqlite3")
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mov": "video/quicktime",
+    ".gif": "image/gif",
+    ".png": "image/png",
+}
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class Artifact:
+    name: str
+    size: int
+    created: float
+    last_access: float
+    prompt_hash: Optional[str] = None
+
+
+class ArtifactBackend(abc.ABC):
+    """Where artifact bytes live; the store keeps the metadata."""
+
+    @abc.abstractmethod
+    def put(self, name: str, src: str):
+        """Take ownership of the local file `src` under `name`."""
+
+    @abc.abstractmethod
+    def delete(self, name: str):
+        """Remove the artifact; a missing one is not an error."""
+
+    @abc.abstractmethod
+    def url(self, name: str) -> str:
+        """URL clients download the artifact from."""
+
+    def path(self, name: str) -> Optional[str]:
+        """Local filesystem path of the artifact, or None when it isn't stored locally."""
+        return None
+
+
+class LocalBackend(ArtifactBackend):
+    def __init__(self, directory: str, url_prefix: str = "/videos"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+
+    def put(self, name, src):
+        os.makedirs(self.directory, exist_ok=True)
+        dest = os.path.join(self.directory, name)
+        try:
+            os.replace(src, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different filesystem: copy next to the destination, then rename into place
+            tmp = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+            os.remove(src)
+
+    def delete(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def url(self, name):
+        return f"{self.url_prefix}/{name}"
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+
+class S3Backend(ArtifactBackend):
+    """S3-compatible object storage.
+
+    `client` is anything with boto3-style `upload_file`, `delete_object` and
+    `generate_presigned_url`, so a local stand-in can replace S3.
+    """
+
+    PRESIGNED_TTL = 7 * 86400
+
+    def __init__(self, client, bucket: str, prefix: str = "", public_url: Optional[str] = None):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip("/") if public_url else None
+
+    @classmethod
+    def from_config(cls, bucket: str, prefix: str, endpoint_url: Optional[str], public_url: Optional[str]) -> "S3Backend":
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("ARTIFACT_BACKEND=s3 but the 'boto3' package is not installed")
+        return cls(boto3.client("s3", endpoint_url=endpoint_url), bucket, prefix, public_url)
+
+    def put(self, name, src):
+        content_type = MEDIA_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        self.client.upload_file(src, self.bucket, self.prefix + name, ExtraArgs={"ContentType": content_type})
+        os.remove(src)
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + name)
+
+    def url(self, name):
+        if self.public_url:
+            return f"{self.public_url}/{self.prefix}{name}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.prefix + name},
+            ExpiresIn=self.PRESIGNED_TTL,
+        )
+
+
+class ArtifactStore:
+    """Rendered videos and previews under content-hashed names, with a SQLite metadata index.
+
+    A name never changes meaning, which is what lets /videos serve artifacts as
+    immutable. Identical renders share one artifact.
+
+    Retention runs in `sweep()`, off the request path: artifacts older than
+    `max_age_seconds` go first, then the least recently accessed ones until the
+    store fits in `max_bytes`.
+    """
+
+    def __init__(self, backend: ArtifactBackend, index_path: str, max_bytes: int, max_age_seconds: float):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(index_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "name TEXT PRIMARY KEY, size INTEGER NOT NULL, created REAL NOT NULL, "
+            "last_access REAL NOT NULL, prompt_hash TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access)")
+        self._db.commit()
+
+    def put(self, src: str, ext: str, prompt: Optional[str] = None) -> str:
+        """Move the local file `src` into the store and return its content-hashed name."""
+        name = f"{file_digest(src)[:32]}{ext}"
+        size = os.path.getsize(src)
+        now = time.time()
+        # Index first: a sweep that already picked this name as a victim sees the
+        # newer `created` and leaves the row, and the bytes about to land, alone
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (name, size, created, last_access, prompt_hash) VALUES (?, ?, ?, ?, ?)",
+                (name, size, now, now, prompt_hash(prompt) if prompt else None),
+            )
+            self._db.commit()
+        try:
+            self.backend.put(name, src)
+        except Exception:
+            with self._lock:
+                self._db.execute("DELETE FROM artifacts WHERE name = ? AND created = ?", (name, now))
+                self._db.commit()
+            raise
+        return name
+
+    def get(self, name: str) -> Optional[Artifact]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name, size, created, last_access, prompt_hash FROM artifacts WHERE name = ?", (name,)
+            ).fetchone()
+        return Artifact(*row) if row else None
+
+    def touch(self, name: str):
+        """Record a download, which keeps the artifact at the back of the LRU."""
+        with self._lock:
+            self._db.execute("UPDATE artifacts SET last_access = ? WHERE name = ?", (time.time(), name))
+            self._db.commit()
+
+    def url(self, name: str) -> str:
+        return self.backend.url(name)
+
+    def path(self, name: str) -> Optional[str]:
+        return self.backend.path(name)
+
+    def sweep(self) -> int:
+        """Apply the age and size limits; returns the number of artifacts removed."""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            victims = self._db.execute("SELECT name, created FROM artifacts WHERE created <= ?", (cutoff,)).fetchall()
+            total = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE created > ?", (cutoff,)
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                for name, created, size in self._db.execute(
+                    "SELECT name, created, size FROM artifacts WHERE created > ? ORDER BY last_access", (cutoff,)
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    victims.append((name, created))
+                    total -= size
+
+        removed = 0
+        for name, created in victims:
+            try:
+                with self._lock:
+                    # A put() since the selection re-created the artifact; keep it
+                    deleted = self._db.execute(
+                        "DELETE FROM artifacts WHERE name = ? AND created <= ?", (name, created)
+                    ).rowcount
+                    self._db.commit()
+                    if not deleted:
+                        continue
+                    self.backend.delete(name)
+            except Exception as e:
+                logging.warning("Could not delete artifact %s: %s", name, e)
+                continue
+            removed += 1
+        return removed
+
+    def delete(self, name: str):
+        self.backend.delete(name)
+        with self._lock:
+            self._db.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+            self._db.commit()
+
+    async def run_sweeper(self, interval: float):
+        """Sweep every `interval` seconds until cancelled."""
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.sweep)
+                if removed:
+                    logging.info("Artifact sweeper removed %d artifacts", removed)
+            except Exception as e:
+                logging.warning("Artifact sweep failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {"artifacts": count, "bytes": total}
+
+
+def _build_backend() -> ArtifactBackend:
+    if ARTIFACT_BACKEND == "s3":
+        return S3Backend.from_config(ARTIFACT_S3_BUCKET, ARTIFACT_S3_PREFIX, ARTIFACT_S3_ENDPOINT_URL, ARTIFACT_PUBLIC_URL)
+    return LocalBackend(ARTIFACT_DIR)
+
+
+artifact_store = ArtifactStore(
+    _build_backend(),
+    INDEX_PATH,
+    max_bytes=ARTIFACT_MAX_MB * 1024 * 1024,
+    max_age_seconds=ARTIFACT_MAX_AGE_HOURS * 3600,
+)
+ARTIFACT_BYTES.set_function(lambda: artifact_store.stats()["bytes"])
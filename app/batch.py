@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+from app.job_queue import Job, JobQueue
+
+
+@dataclass
+class Batch:
+    jobs: list[Job]
+    # One job id per submitted item; duplicate prompts point at the same job
+    item_job_ids: list[str]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def finished(self) -> bool:
+        return all(job.finished for job in self.jobs)
+
+    @property
+    def status(self) -> str:
+        if self.finished:
+            return "done"
+        if all(job.status == "queued" for job in self.jobs):
+            return "queued"
+        return "running"
+
+    def counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for job in self.jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+class BatchRunner:
+    """Runs many prompts as one unit.
+
+    Code generation for a batch's jobs runs ahead of rendering, at most
+    `concurrency` LLM calls at a time, and each job is queued for a render worker
+    as soon as its code is ready. Workers then never sit idle waiting on the LLM,
+    and a large batch waits for queue room instead of being rejected. Batch jobs
+    run at "batch" priority, behind any interactive request.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        generate: Callable[[str], Awaitable[str]],
+        concurrency: int = 4,
+        history: int = 500,
+    ):
+        self.job_queue = job_queue
+        self.generate = generate
+        self.history = history
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        self._batches: OrderedDict[str, Batch] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, jobs: list[Job], item_job_ids: list[str]) -> Batch:
+        batch = Batch(jobs=jobs, item_job_ids=item_job_ids)
+        for job in jobs:
+            job.batch_id = batch.id
+            job.priority = "batch"
+            self.job_queue.track(job)
+            task = asyncio.create_task(self._prepare(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._batches[batch.id] = batch
+        self._evict()
+        return batch
+
+    def get(self, batch_id: str) -> Optional[Batch]:
+        return self._batches.get(batch_id)
+
+    async def stop(self):
+        # asyncio.wait() in _prepare doesn't cancel the LLM call it waits on
+        llm_tasks = [
+            job.llm_task
+            for batch in self._batches.values()
+            for job in batch.jobs
+            if job.llm_task is not None and not job.llm_task.done()
+        ]
+        tasks = list(self._tasks) + llm_tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _prepare(self, job: Job):
+        if job.code is None and job.template is None:
+            async with self._slots:
+                job.emit("llm_generating")
+                job.llm_task = asyncio.create_task(self.generate(job.prompt))
+                # The worker collects the result (or the error) from llm_task
+                await asyncio.wait([job.llm_task])
+        try:
+            await self.job_queue.enqueue(job)
+        except Exception as e:
+            logging.warning("Could not queue batch job %s: %s", job.id, e)
+            job.error = str(e)
+            job.status = "failed"
+            job.emit("failed", error=job.error)
+
+    def _evict(self):
+        excess = len(self._batches) - self.history
+        if excess <= 0:
+            return
+        stale = [batch_id for batch_id, batch in self._batches.items() if batch.finished][:excess]
+        for batch_id in stale:
+            del self._batches[batch_id]
@@ -0,0 +1,361 @@
+import ast
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+SCENE_CLASS = "GeneratedScene"
+MAX_FONT_SIZE = 60
+DEFAULT_RUN_TIME = 0.5
+THREE_D_NAMES = {"Surface", "ThreeDAxes", "ThreeDScene", "Sphere", "Cube", "Cylinder", "Cone", "Torus"}
+SLOW_ANIMATIONS = {"Write", "Create"}
+
+# Inserted into construct() before the final wait so the layout is visible in the last frames
+AUTO_LAYOUT = '''
+try:
+    _mobs = [m for m in self.mobjects if m in self.mobjects]
+    _texts = [m for m in _mobs if isinstance(m, Text)]
+    _math = [m for m in _mobs if isinstance(m, MathTex)]
+    _visuals = [m for m in _mobs if isinstance(m, VMobject) and not isinstance(m, (Text, MathTex))]
+
+    SAFE_W, SAFE_H = 12, 7
+
+    # 1. Scale + center visual elements (shapes, graphs, etc.)
+    if _visuals:
+        _vg = VGroup(*_visuals)
+        _s = min(SAFE_W / max(_vg.width, 0.01), SAFE_H / max(_vg.height, 0.01), 1.0)
+        if _s < 1.0:
+            _vg.scale(_s)
+        _vg.move_to(ORIGIN)
+
+    # 2. Position math below visuals
+    if _math:
+        _mg = VGroup(*_math)
+        if len(_math) > 1:
+            _mg.arrange(DOWN, buff=0.5)
+        _mg.scale_to_fit_width(min(SAFE_W, _mg.width))
+        if _visuals:
+            _mg.next_to(_vg, DOWN, buff=0.5)
+        else:
+            _mg.move_to(ORIGIN)
+
+    # 3. Position text labels above everything
+    if _texts:
+        _tg = VGroup(*_texts)
+        if len(_texts) > 1:
+            _tg.arrange(RIGHT, buff=0.8)
+        _tg.scale_to_fit_width(min(SAFE_W, _tg.width))
+        if _visuals:
+            _tg.next_to(_vg, UP, buff=0.5)
+        elif _math:
+            _tg.next_to(_mg, UP, buff=0.5)
+        else:
+            _tg.move_to(ORIGIN)
+
+    # 4. Final bounds check - nudge anything that drifted off-screen
+    for _m in self.mobjects:
+        if hasattr(_m, 'get_center'):
+            _x, _y = _m.get_center()[:2]
+            if abs(_x) > 6.5:
+                _m.shift(LEFT * (_x - 6.0 * (1 if _x > 0 else -1)))
+            if abs(_y) > 3.5:
+                _m.shift(DOWN * (_y - 3.0 * (1 if _y > 0 else -1)))
+except Exception:
+    import logging
+    logging.warning("Auto-layout skipped", exc_info=True)
+'''
+
+
+def is_self_call(node: ast.AST, method: str) -> bool:
+    """True for `self.<method>(...)` call nodes."""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == method
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+    )
+
+
+def find_construct(tree: ast.Module) -> Optional[ast.FunctionDef]:
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == SCENE_CLASS:
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name == "construct":
+                    return item
+    return None
+
+
+class TransformPass(ast.NodeTransformer):
+    """A rewrite over the parsed scene; set `fired` when it changes anything."""
+
+    name = "pass"
+
+    def __init__(self):
+        self.fired = False
+
+    def apply(self, tree: ast.Module) -> ast.Module:
+        return self.visit(tree)
+
+    def fired_names(self) -> list[str]:
+        return [self.name] if self.fired else []
+
+    def finish(self, code: str) -> str:
+        """Adjust the unparsed source; for edits that are cheaper on text than on the tree."""
+        return code
+
+
+def _is_star_manim_import(node: ast.stmt) -> bool:
+    return (
+        isinstance(node, ast.ImportFrom)
+        and node.module == "manim"
+        and node.level == 0
+        and len(node.names) == 1
+        and node.names[0].name == "*"
+    )
+
+
+class NormalizeImports(TransformPass):
+    name = "normalize_imports"
+
+    def apply(self, tree):
+        body = []
+        removed = 0
+        has_numpy = False
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom) and (node.module or "").split(".")[0] == "manim":
+                removed += 1
+                continue
+            if isinstance(node, ast.Import) and any(a.name.split(".")[0] == "manim" for a in node.names):
+                removed += 1
+                continue
+            if isinstance(node, ast.Import) and any(a.name == "numpy" and a.asname == "np" for a in node.names):
+                has_numpy = True
+            body.append(node)
+
+        header = [ast.ImportFrom(module="manim", names=[ast.alias(name="*")], level=0)]
+        if not has_numpy:
+            header.append(ast.Import(names=[ast.alias(name="numpy", asname="np")]))
+        # Unchanged only when the sole manim import already was a leading `from manim import *`
+        self.fired = not has_numpy or removed != 1 or not (tree.body and _is_star_manim_import(tree.body[0]))
+        tree.body = header + body
+        return tree
+
+
+class SceneRewrites(TransformPass):
+    """All per-node rewrites in one traversal of the tree.
+
+    - promote_3d_scene: `GeneratedScene(Scene)` becomes `ThreeDScene` when 3D objects are used.
+    - ensure_wait: construct() gets a trailing `self.wait(2)` if it never waits.
+    - cap_font_size: literal `font_size` values are capped at MAX_FONT_SIZE.
+    - fast_animations: Write/Create trace outlines stroke by stroke; FadeIn is 3-5x faster to render.
+    - play_run_time: every `self.play()` gets `run_time=DEFAULT_RUN_TIME` unless it sets one.
+    """
+
+    # Every rewrite mutates nodes in place, so the cheaper read-only traversal is enough
+    generic_visit = ast.NodeVisitor.generic_visit
+
+    def __init__(self):
+        super().__init__()
+        self.play_count = 0
+        self.uses_3d = False
+        self.construct_waits = False
+        self._in_scene = False
+        self._in_construct = False
+        self._fired: list[str] = []
+
+    def _fire(self, name: str):
+        if name not in self._fired:
+            self._fired.append(name)
+
+    def fired_names(self):
+        return self._fired
+
+    def apply(self, tree):
+        self.visit(tree)
+        construct = find_construct(tree)
+        if self.uses_3d:
+            for node in tree.body:
+                if isinstance(node, ast.ClassDef) and node.name == SCENE_CLASS:
+                    for i, base in enumerate(node.bases):
+                        if isinstance(base, ast.Name) and base.id == "Scene":
+                            node.bases[i] = ast.Name(id="ThreeDScene", ctx=ast.Load())
+                            self._fire("promote_3d_scene")
+        if construct is not None and not self.construct_waits:
+            construct.body.append(ast.Expr(ast.parse("self.wait(2)", mode="eval").body))
+            self._fire("ensure_wait")
+        return tree
+
+    def visit_ClassDef(self, node):
+        outer = self._in_scene
+        self._in_scene = node.name == SCENE_CLASS
+        self.generic_visit(node)
+        self._in_scene = outer
+        return node
+
+    def visit_FunctionDef(self, node):
+        outer = self._in_construct
+        self._in_construct = outer or (self._in_scene and node.name == "construct")
+        self.generic_visit(node)
+        self._in_construct = outer
+        return node
+
+    def visit_Name(self, node):
+        if node.id in THREE_D_NAMES:
+            self.uses_3d = True
+        return node
+
+    def visit_keyword(self, node):
+        self.generic_visit(node)
+        if (
+            node.arg == "font_size"
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, (int, float))
+            and node.value.value > MAX_FONT_SIZE
+        ):
+            node.value = ast.Constant(MAX_FONT_SIZE)
+            self._fire("cap_font_size")
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in SLOW_ANIMATIONS:
+            node.func = ast.Name(id="FadeIn", ctx=ast.Load())
+            self._fire("fast_animations")
+        elif is_self_call(node, "set_camera_orientation"):
+            self.uses_3d = True
+        elif is_self_call(node, "wait") and self._in_construct:
+            self.construct_waits = True
+        elif is_self_call(node, "play"):
+            self.play_count += 1
+            if not any(kw.arg == "run_time" for kw in node.keywords):
+                node.keywords.append(ast.keyword(arg="run_time", value=ast.Constant(DEFAULT_RUN_TIME)))
+                self._fire("play_run_time")
+        return node
+
+
+def _is_auto_layout(stmt: ast.stmt) -> bool:
+    """True for the injected layout block, recognised by its leading `_mobs = ...`."""
+    if not isinstance(stmt, ast.Try) or not stmt.body:
+        return False
+    first = stmt.body[0]
+    return (
+        isinstance(first, ast.Assign)
+        and isinstance(first.targets[0], ast.Name)
+        and first.targets[0].id == "_mobs"
+    )
+
+
+# construct() bodies unparse at this indent (class + method)
+_CONSTRUCT_INDENT = " " * 8
+_LAYOUT_MARKER = "__auto_layout__"
+_LAYOUT_SOURCE = "\n".join(
+    _CONSTRUCT_INDENT + line if line else line for line in ast.unparse(ast.parse(AUTO_LAYOUT)).splitlines()
+)
+_LAYOUT_LINE = re.compile(rf"^{_CONSTRUCT_INDENT}{_LAYOUT_MARKER}$", re.MULTILINE)
+
+
+class InjectAutoLayout(TransformPass):
+    """Insert AUTO_LAYOUT before construct()'s last wait.
+
+    The tree only gets a one-line placeholder; `finish` swaps in the layout source,
+    which is unparsed once at import, so neither the rest of the pipeline nor the
+    unparse pays for the ~60 layout statements on every completion.
+    """
+
+    name = "auto_layout"
+
+    def __init__(self):
+        super().__init__()
+        self._inserted = False
+
+    def apply(self, tree):
+        construct = find_construct(tree)
+        if construct is None:
+            return tree
+        if any(_is_auto_layout(stmt) for stmt in construct.body):
+            return tree  # already post-processed, e.g. code coming back from a repair
+        insert_at = len(construct.body)
+        for i, stmt in enumerate(construct.body):
+            if isinstance(stmt, ast.Expr) and is_self_call(stmt.value, "wait"):
+                insert_at = i
+        # A bare name, not a string: a string as construct()'s first statement would unparse as a docstring
+        construct.body.insert(insert_at, ast.Expr(ast.Name(id=_LAYOUT_MARKER, ctx=ast.Load())))
+        self._inserted = True
+        return tree
+
+    def finish(self, code):
+        if not self._inserted:
+            return code
+        code, replaced = _LAYOUT_LINE.subn(lambda _: _LAYOUT_SOURCE, code, count=1)
+        self.fired = replaced == 1
+        return code
+
+
+DEFAULT_PASSES = [
+    NormalizeImports,
+    SceneRewrites,
+    InjectAutoLayout,
+]
+
+
+@dataclass
+class TransformResult:
+    code: str
+    fired: list[str] = field(default_factory=list)
+    play_count: int = 0
+
+
+class TransformPipeline:
+    """Parse the scene once, run every pass over the same tree, unparse once."""
+
+    def __init__(self, passes: Optional[list[type]] = None):
+        self.passes = list(passes if passes is not None else DEFAULT_PASSES)
+
+    def run(self, source: str) -> TransformResult:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as e:
+            raise Exception(f"INVALID_CODE: line {e.lineno}: {e.msg}")
+
+        if find_construct(tree) is None:
+            raise Exception(f"INVALID_CODE: Generated code must contain a '{SCENE_CLASS}' class with construct()")
+
+        result = TransformResult(code=source)
+        transforms = []
+        for pass_cls in self.passes:
+            transform = pass_cls()
+            tree = transform.apply(tree)
+            transforms.append(transform)
+            if isinstance(transform, SceneRewrites):
+                result.play_count = transform.play_count
+
+        # No fix_missing_locations: unparse doesn't need positions, and nobody compiles this tree
+        code = ast.unparse(tree)
+        for transform in transforms:
+            code = transform.finish(code)
+            # After finish, so a pass whose text edit didn't apply isn't reported
+            result.fired.extend(transform.fired_names())
+        result.code = code
+        logging.info("Post-processing passes fired: %s", ", ".join(result.fired) or "none")
+        return result
+
+
+_FENCED_BLOCK = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)(?:```|$)", re.DOTALL)
+
+
+def extract_code(raw: str) -> str:
+    """Take the fenced code block (if any) and drop any prose before the first manim import."""
+    blocks = _FENCED_BLOCK.findall(raw)
+    if blocks:
+        raw = next((b for b in blocks if SCENE_CLASS in b), blocks[0])
+    if "```" in raw:
+        raw = raw.replace("```python", "").replace("```", "").strip()
+    raw = raw.strip("`").strip()
+    start = raw.find("from manim import")
+    if start > 0:
+        raw = raw[start:]
+    return raw
+
+
+default_pipeline = TransformPipeline()
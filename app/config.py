@@ -4,4 +4,107 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL=os.getenv("OPENAI_BASE_URL")
\ No newline at end of file
+OPENAI_BASE_URL=os.getenv("OPENAI_BASE_URL")
+LLM_MODEL=os.getenv("LLM_MODEL", "gpt-4")
+LLM_STREAM=os.getenv("LLM_STREAM", "false").lower() == "true"
+LLM_MAX_TOKENS=int(os.getenv("LLM_MAX_TOKENS", "2000"))
+LLM_PROSE_LIMIT=int(os.getenv("LLM_PROSE_LIMIT", "400"))
+LLM_TIMEOUT=float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_IN_FLIGHT=int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_MAX_CONNECTIONS=int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_RETRIES=int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE=float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX=float(os.getenv("LLM_BACKOFF_MAX", "20"))
+
+# Repair loop: feed Manim's traceback back to the LLM and retry the render
+REPAIR_ENABLED=os.getenv("REPAIR_ENABLED", "false").lower() == "true"
+REPAIR_MAX_ATTEMPTS=int(os.getenv("REPAIR_MAX_ATTEMPTS", "2"))
+REPAIR_BUDGET_SECONDS=float(os.getenv("REPAIR_BUDGET_SECONDS", "300"))
+REPAIR_MAX_TOKENS=int(os.getenv("REPAIR_MAX_TOKENS", "6000"))
+
+# LLM response cache (in-memory, plus SQLite when LLM_CACHE_DB is set)
+LLM_CACHE_ENABLED=os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL=int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_DB=os.getenv("LLM_CACHE_DB") or None
+
+# Observability: /metrics is always on; spans need the `opentelemetry` package
+TRACING_ENABLED=os.getenv("TRACING_ENABLED", "false").lower() == "true"
+
+# Rate limiting (per client IP, or per API key listed in RATE_LIMIT_API_KEYS as "key:limit/window,...")
+RATE_LIMIT_MAX_REQUESTS=int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "2"))
+RATE_LIMIT_WINDOW_SECONDS=int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "86400"))
+RATE_LIMIT_REDIS_URL=os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_API_KEYS=os.getenv("RATE_LIMIT_API_KEYS", "")
+
+# Render job queue
+RENDER_WORKERS=int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_SIZE=int(os.getenv("RENDER_QUEUE_SIZE", "20"))
+JOB_HISTORY_SIZE=int(os.getenv("JOB_HISTORY_SIZE", "500"))
+BATCH_MAX_ITEMS=int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_LLM_CONCURRENCY=int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+# Template fast path: prompts matching a built-in scene skip the LLM and render with a fixed budget
+TEMPLATES_ENABLED=os.getenv("TEMPLATES_ENABLED", "true").lower() == "true"
+TEMPLATE_QUALITY=os.getenv("TEMPLATE_QUALITY", "m")
+TEMPLATE_RENDER_TIMEOUT=int(os.getenv("TEMPLATE_RENDER_TIMEOUT", "120"))
+
+# Render output
+# Progressive preview: "video" renders -ql first, "frame" renders only the last frame (-s) as a PNG
+PREVIEW_MODE=os.getenv("PREVIEW_MODE", "video")
+# Encoding of final renders (previews keep Manim's -ql defaults). Format is mp4, webm, gif or mov; fps and
+# resolution ("1280,720") override the quality preset when set. A codec, CRF or preset adds an ffmpeg pass
+RENDER_FORMAT=os.getenv("RENDER_FORMAT", "mp4").lower()
+RENDER_FPS=int(os.getenv("RENDER_FPS", "0"))
+RENDER_RESOLUTION=os.getenv("RENDER_RESOLUTION", "")
+RENDER_VIDEO_CODEC=os.getenv("RENDER_VIDEO_CODEC", "")
+RENDER_CRF=os.getenv("RENDER_CRF", "")
+RENDER_PRESET=os.getenv("RENDER_PRESET", "")
+FFMPEG_BINARY=os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+# Runtime directories: rendered videos and render workspaces, and the render/glyph caches and artifact index
+_ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+GENERATE_DIR=os.path.abspath(os.getenv("GENERATE_DIR", os.path.join(_ROOT_DIR, "generate")))
+CACHE_DIR=os.path.abspath(os.getenv("CACHE_DIR", os.path.join(_ROOT_DIR, "cache")))
+
+# Artifact store for rendered videos/previews ("local" under GENERATE_DIR, or "s3")
+ARTIFACT_BACKEND=os.getenv("ARTIFACT_BACKEND", "local")
+ARTIFACT_MAX_MB=int(os.getenv("ARTIFACT_MAX_MB", "4096"))
+ARTIFACT_MAX_AGE_HOURS=float(os.getenv("ARTIFACT_MAX_AGE_HOURS", "168"))
+ARTIFACT_SWEEP_INTERVAL=int(os.getenv("ARTIFACT_SWEEP_INTERVAL", "300"))
+ARTIFACT_S3_BUCKET=os.getenv("ARTIFACT_S3_BUCKET")
+ARTIFACT_S3_PREFIX=os.getenv("ARTIFACT_S3_PREFIX", "renders/")
+ARTIFACT_S3_ENDPOINT_URL=os.getenv("ARTIFACT_S3_ENDPOINT_URL")
+ARTIFACT_PUBLIC_URL=os.getenv("ARTIFACT_PUBLIC_URL")
+
+# Video delivery: with a URL prefix set, /videos answers with X-Accel-Redirect so nginx sends the file
+VIDEO_ACCEL_REDIRECT=os.getenv("VIDEO_ACCEL_REDIRECT")
+
+# Render cache (finished videos keyed by scene source + quality flags)
+RENDER_CACHE_ENABLED=os.getenv("RENDER_CACHE_ENABLED", "true").lower() == "true"
+RENDER_CACHE_MAX_MB=int(os.getenv("RENDER_CACHE_MAX_MB", "2048"))
+
+# Render cost estimation (see app/cost_estimator.py for how scores are computed)
+# Benchmark corpus scenes score 6.5-39: short 2D scenes (<= 8) render -qh, loops, 3D and Tex-heavy scenes -qm
+COST_HIGH_QUALITY_SCORE=float(os.getenv("COST_HIGH_QUALITY_SCORE", "8"))
+COST_LOW_QUALITY_SCORE=float(os.getenv("COST_LOW_QUALITY_SCORE", "40"))
+COST_REJECT_SCORE=float(os.getenv("COST_REJECT_SCORE", "300"))
+COST_TIMEOUT_PER_POINT=float(os.getenv("COST_TIMEOUT_PER_POINT", "6"))
+RENDER_TIMEOUT_MIN=int(os.getenv("RENDER_TIMEOUT_MIN", "120"))
+RENDER_TIMEOUT_MAX=int(os.getenv("RENDER_TIMEOUT_MAX", "600"))
+
+# Render resource limits per Manim process (0 = unlimited) and nice levels per priority class
+RENDER_MAX_MEMORY_MB=int(os.getenv("RENDER_MAX_MEMORY_MB", "4096"))
+RENDER_MAX_CPU_SECONDS=int(os.getenv("RENDER_MAX_CPU_SECONDS", "900"))
+RENDER_MAX_FILE_MB=int(os.getenv("RENDER_MAX_FILE_MB", "2048"))
+RENDER_NICE=int(os.getenv("RENDER_NICE", "0"))
+RENDER_BATCH_NICE=int(os.getenv("RENDER_BATCH_NICE", "10"))
+
+# Warm render workers (0 = spawn a fresh `python -m manim` per render)
+WARM_WORKERS=int(os.getenv("WARM_WORKERS", "0"))
+WARM_WORKER_MAX_JOBS=int(os.getenv("WARM_WORKER_MAX_JOBS", "50"))
+WARM_WORKER_MAX_RSS_MB=int(os.getenv("WARM_WORKER_MAX_RSS_MB", "2048"))
+
+# Shared LaTeX/Text SVG cache reused across renders
+GLYPH_CACHE_ENABLED=os.getenv("GLYPH_CACHE_ENABLED", "true").lower() == "true"
+GLYPH_CACHE_MAX_MB=int(os.getenv("GLYPH_CACHE_MAX_MB", "512"))
@@ -0,0 +1,159 @@
+import ast
+import logging
+from dataclasses import dataclass, field
+from app.code_transforms import THREE_D_NAMES, is_self_call
+from app.config import (
+    COST_LOW_QUALITY_SCORE,
+    COST_HIGH_QUALITY_SCORE,
+    COST_REJECT_SCORE,
+    COST_TIMEOUT_PER_POINT,
+    RENDER_TIMEOUT_MIN,
+    RENDER_TIMEOUT_MAX,
+)
+
+# Manim's defaults when a call doesn't say otherwise
+DEFAULT_RUN_TIME = 1.0
+DEFAULT_WAIT = 1.0
+DEFAULT_SURFACE_CELLS = 32 * 32
+
+TEX_NAMES = {"MathTex", "Tex", "SingleStringMathTex", "Matrix", "DecimalMatrix", "IntegerMatrix"}
+
+# Relative weights of each cost signal; a typical 5-play 2D scene scores under 15
+THREE_D_MULTIPLIER = 3.0
+PLAY_WEIGHT = 0.5
+TEX_WEIGHT = 1.5
+SURFACE_WEIGHT = 8.0
+
+
+@dataclass
+class CostEstimate:
+    score: float
+    quality: str
+    timeout: int
+    rejected: bool = False
+    play_count: int = 0
+    reasons: list[str] = field(default_factory=list)
+
+
+def _number(node: ast.AST, default: float) -> float:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return default
+
+
+def _keyword(call: ast.Call, name: str):
+    return next((kw.value for kw in call.keywords if kw.arg == name), None)
+
+
+def _loop_factor(loop: ast.For) -> int:
+    """Iteration count for `for ... in range(<const>)`, else assume a short loop."""
+    it = loop.iter
+    if isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == "range" and it.args:
+        args = [_number(a, -1) for a in it.args]
+        if all(a >= 0 for a in args):
+            start, stop = (0, args[0]) if len(args) == 1 else (args[0], args[1])
+            step = args[2] if len(args) > 2 and args[2] > 0 else 1
+            return max(int((stop - start) / step), 0)
+    if isinstance(it, (ast.List, ast.Tuple)):
+        return len(it.elts)
+    return 3
+
+
+def _surface_cells(call: ast.Call) -> int:
+    resolution = _keyword(call, "resolution")
+    if resolution is None:
+        return DEFAULT_SURFACE_CELLS
+    if isinstance(resolution, (ast.Tuple, ast.List)) and len(resolution.elts) == 2:
+        return int(_number(resolution.elts[0], 32) * _number(resolution.elts[1], 32))
+    side = _number(resolution, 32)
+    return int(side * side)
+
+
+class _CostVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.multiplier = 1
+        self.play_count = 0
+        self.seconds = 0.0
+        self.tex_count = 0
+        self.surface_cells = 0
+        self.uses_3d = False
+
+    def _visit_loop(self, node, factor: int):
+        outer = self.multiplier
+        self.multiplier = outer * factor
+        for stmt in node.body:
+            self.visit(stmt)
+        self.multiplier = outer
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    def visit_For(self, node):
+        self._visit_loop(node, _loop_factor(node))
+
+    def visit_While(self, node):
+        self._visit_loop(node, 3)
+
+    def visit_Name(self, node):
+        if node.id in THREE_D_NAMES:
+            self.uses_3d = True
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if is_self_call(node, "play"):
+            self.play_count += self.multiplier
+            self.seconds += self.multiplier * _number(_keyword(node, "run_time"), DEFAULT_RUN_TIME)
+        elif is_self_call(node, "wait"):
+            duration = node.args[0] if node.args else _keyword(node, "duration")
+            self.seconds += self.multiplier * _number(duration, DEFAULT_WAIT)
+        elif is_self_call(node, "set_camera_orientation") or is_self_call(node, "begin_ambient_camera_rotation"):
+            self.uses_3d = True
+        elif name in TEX_NAMES:
+            self.tex_count += self.multiplier
+        elif name == "Surface":
+            self.surface_cells += self.multiplier * _surface_cells(node)
+
+
+def estimate_cost(code: str) -> CostEstimate:
+    """Score how expensive `code` will be to render and pick quality/timeout accordingly."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return CostEstimate(score=0.0, quality="m", timeout=RENDER_TIMEOUT_MAX, reasons=["unparseable"])
+
+    visitor = _CostVisitor()
+    visitor.visit(tree)
+
+    reasons = [f"{visitor.play_count} plays", f"{visitor.seconds:.1f}s animated"]
+    score = visitor.seconds + PLAY_WEIGHT * visitor.play_count
+    if visitor.uses_3d:
+        score *= THREE_D_MULTIPLIER
+        reasons.append("3D scene")
+    if visitor.tex_count:
+        score += TEX_WEIGHT * visitor.tex_count
+        reasons.append(f"{visitor.tex_count} LaTeX objects")
+    if visitor.surface_cells:
+        score += SURFACE_WEIGHT * visitor.surface_cells / DEFAULT_SURFACE_CELLS
+        reasons.append(f"{visitor.surface_cells} surface cells")
+
+    if score <= COST_HIGH_QUALITY_SCORE:
+        quality = "h"
+    elif score <= COST_LOW_QUALITY_SCORE:
+        quality = "m"
+    else:
+        quality = "l"
+
+    timeout = int(min(RENDER_TIMEOUT_MIN + score * COST_TIMEOUT_PER_POINT, RENDER_TIMEOUT_MAX))
+    estimate = CostEstimate(
+        score=round(score, 2),
+        quality=quality,
+        timeout=timeout,
+        rejected=score > COST_REJECT_SCORE,
+        play_count=visitor.play_count,
+        reasons=reasons,
+    )
+    logging.info(
+        "Render cost %.1f (%s) -> -q%s, timeout %ds%s",
+        estimate.score, ", ".join(reasons), quality, timeout, ", rejected" if estimate.rejected else "",
+    )
+    return estimate
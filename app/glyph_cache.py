@@ -0,0 +1,174 @@
+import ast
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from typing import Optional
+
+# Manim subdirectories (relative to the render's media_dir) whose .svg outputs are content-addressed:
+# Tex/ holds compiled MathTex/Tex, texts/ holds Pango-rasterized Text
+GLYPH_DIRS = ("Tex", "texts")
+# Per-literal lists of the glyphs renders using that literal produced
+INDEX_DIR = "index"
+# Most recent glyphs remembered per literal, so common literals ("x", "1") stay bounded
+GLYPHS_PER_KEY = 64
+
+
+def glyph_keys(code: str) -> set[str]:
+    """String literals in the scene, from which its Tex/Text are built.
+
+    Numbers are left out: the run_time and wait() values the post-processor injects
+    appear in every scene, and keying on them would link unrelated glyphs into each render.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    keys = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip():
+            keys.add(hashlib.sha1(repr(node.value).encode()).hexdigest()[:16])
+    return keys
+
+
+class GlyphCache:
+    """Shared store of Manim's LaTeX and Text SVGs, reused across render workspaces.
+
+    Manim skips LaTeX/Pango whenever `<hash>.svg` already exists in its tex/text
+    directory. Those hashes cover the TeX template and Text settings, so they cannot be
+    predicted from the source; instead an index remembers, per literal in the scene,
+    which SVGs earlier renders using it produced. Each render gets hard links to just
+    those SVGs before it starts, and new SVGs are published back atomically (link to a
+    temp name, then rename) after a successful render, so concurrent renders never
+    observe a half-written file. Seeding touches what it links, so eviction is LRU.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Running total of cached bytes, seeded by one directory scan on first publish
+        self._size: Optional[int] = None
+
+    def seed(self, workspace: str, code: str):
+        """Link the cached SVGs indexed under the scene's literals into the workspace's Tex/ and texts/."""
+        for sub in GLYPH_DIRS:
+            os.makedirs(os.path.join(workspace, sub), exist_ok=True)
+        if not self.enabled:
+            return
+        glyphs = set()
+        for key in glyph_keys(code):
+            glyphs.update(self._read_index(key))
+        for glyph in glyphs:
+            shared = os.path.join(self.directory, glyph)
+            try:
+                os.link(shared, os.path.join(workspace, glyph))
+                os.utime(shared)
+            except OSError:
+                # Evicted meanwhile, or links unsupported; Manim regenerates it
+                pass
+
+    def publish(self, workspace: str, code: str):
+        """Move SVGs this render produced into the shared cache and index them under its literals."""
+        if not self.enabled:
+            return
+        added = []
+        added_bytes = 0
+        for sub in GLYPH_DIRS:
+            source = os.path.join(workspace, sub)
+            if not os.path.isdir(source):
+                continue
+            shared = os.path.join(self.directory, sub)
+            os.makedirs(shared, exist_ok=True)
+            with os.scandir(source) as it:
+                for entry in it:
+                    if not entry.name.endswith(".svg") or entry.stat().st_nlink > 1:
+                        continue  # linked files came from the cache in the first place
+                    glyph = f"{sub}/{entry.name}"
+                    dest = os.path.join(shared, entry.name)
+                    if os.path.exists(dest):
+                        added.append(glyph)  # published by a concurrent render; still index it
+                        continue
+                    tmp = os.path.join(shared, f".{uuid.uuid4().hex}.tmp")
+                    try:
+                        os.link(entry.path, tmp)
+                        os.replace(tmp, dest)
+                        added.append(glyph)
+                        added_bytes += entry.stat().st_size
+                    except OSError as e:
+                        logging.warning("Could not publish %s to glyph cache: %s", entry.name, e)
+        if not added:
+            return
+        with self._lock:
+            for key in glyph_keys(code):
+                glyphs = [g for g in self._read_index(key) if g not in added] + added
+                added_bytes += self._write_index(key, glyphs[-GLYPHS_PER_KEY:])
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += added_bytes
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.directory, INDEX_DIR, key)
+
+    def _read_index(self, key: str) -> list[str]:
+        try:
+            with open(self._index_path(key)) as f:
+                return f.read().split()
+        except OSError:
+            return []
+
+    def _write_index(self, key: str, glyphs: list[str]) -> int:
+        """Replace the key's index; returns how many bytes that added."""
+        index_dir = os.path.join(self.directory, INDEX_DIR)
+        os.makedirs(index_dir, exist_ok=True)
+        path = self._index_path(key)
+        tmp = os.path.join(index_dir, f".{uuid.uuid4().hex}.tmp")
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        try:
+            with open(tmp, "w") as f:
+                f.write("\n".join(glyphs))
+            new_size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning("Could not update glyph index: %s", e)
+            return 0
+        return new_size - old_size
+
+    def _scan(self) -> tuple[list[tuple[float, int, str]], int]:
+        entries = []
+        total = 0
+        for sub in GLYPH_DIRS + (INDEX_DIR,):
+            shared = os.path.join(self.directory, sub)
+            if not os.path.isdir(shared):
+                continue
+            with os.scandir(shared) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        """Drop least recently seeded or published files down to 90% of the budget (caller holds the lock)."""
+        entries, total = self._scan()
+        target = self.max_bytes * 0.9
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from app.metrics import JOBS
+from app.scene_templates import TemplateMatch
+
+KEEPALIVE_SECONDS = 15
+# Lower runs first: interactive requests overtake every queued batch job
+PRIORITY_RANKS = {"interactive": 0, "batch": 1}
+# Batch jobs may fill at most this share of the queue, so interactive requests still find room
+BATCH_QUEUE_SHARE = 0.5
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    prompt: str
+    code: Optional[str] = None
+    preview: bool = False
+    priority: str = "interactive"
+    batch_id: Optional[str] = None
+    # Built-in scene the prompt matched; rendered instead of asking the LLM
+    template: Optional[TemplateMatch] = field(default=None, repr=False)
+    # Code generation started ahead of rendering (batches); the worker awaits it instead of calling the LLM
+    llm_task: Optional[asyncio.Task] = field(default=None, repr=False)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    video_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: list[dict] = field(default_factory=list, repr=False)
+    _changed: Optional[asyncio.Event] = field(default=None, repr=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, phase: str, **data):
+        """Record a progress event and wake any subscribers; safe to call from render threads."""
+        self.events.append({"phase": phase, "time": time.time(), **data})
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._changed.set)
+            except RuntimeError:
+                pass  # loop already closed during shutdown
+
+
+class JobQueue:
+    """Bounded priority queue of render jobs drained by a fixed pool of async workers.
+
+    Jobs are taken by priority class, then in submission order.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Job], Awaitable[str]],
+        workers: int = 1,
+        max_queue: int = 20,
+        history: int = 500,
+    ):
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.history = history
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._room: Optional[asyncio.Condition] = None
+        self._order = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        # Unbounded underneath; submit() and enqueue() enforce the limits per priority class
+        self._queue = asyncio.PriorityQueue()
+        self._room = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logging.info("Started %d render workers (queue size %d)", self.workers, self.max_queue)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def track(self, job: Job) -> Job:
+        """Make a job visible to get()/stream() before it is queued for a worker."""
+        if job.id not in self._jobs:
+            job._loop = asyncio.get_running_loop()
+            job._changed = asyncio.Event()
+            self._jobs[job.id] = job
+            self._evict()
+        return job
+
+    def _put(self, job: Job):
+        self._queue.put_nowait((PRIORITY_RANKS.get(job.priority, 0), next(self._order), job))
+        job.emit("queued", position=self.depth, priority=job.priority)
+
+    def submit(self, job: Job) -> Job:
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        if self.depth >= self.max_queue:
+            raise QueueFullError(f"Render queue is full ({self.max_queue} jobs waiting)")
+        self.track(job)
+        self._put(job)
+        return job
+
+    async def enqueue(self, job: Job) -> Job:
+        """Like submit(), but waits for room in the queue instead of failing.
+
+        Batch jobs wait until the queue is less than BATCH_QUEUE_SHARE full.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        limit = self.max_queue
+        if job.priority == "batch":
+            limit = max(int(self.max_queue * BATCH_QUEUE_SHARE), 1)
+        self.track(job)
+        async with self._room:
+            await self._room.wait_for(lambda: self.depth < limit)
+            self._put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def stream(self, job: Job) -> AsyncIterator[Optional[dict]]:
+        """Yield the job's events as they happen, ending after it finishes.
+
+        Yields None every KEEPALIVE_SECONDS without news so callers can keep idle connections alive.
+        """
+        sent = 0
+        while True:
+            while sent < len(job.events):
+                yield job.events[sent]
+                sent += 1
+            if job.finished:
+                return
+            job._changed.clear()
+            if sent < len(job.events) or job.finished:
+                continue
+            try:
+                await asyncio.wait_for(job._changed.wait(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+
+    def _evict(self):
+        """Forget the oldest finished jobs once the history limit is exceeded."""
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        stale = [job_id for job_id, job in self._jobs.items() if job.finished][:excess]
+        for job_id in stale:
+            del self._jobs[job_id]
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job = await self._queue.get()
+            async with self._room:
+                self._room.notify_all()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.video_url = await self.handler(job)
+                job.status = "done"
+                job.emit("done", video_url=job.video_url)
+            except Exception as e:
+                logging.warning("Render worker %d: job %s failed: %s", index, job.id, e)
+                job.error = str(e)
+                job.status = "failed"
+                job.emit("failed", error=job.error)
+            finally:
+                job.finished_at = time.time()
+                JOBS.labels(status=job.status).inc()
+                self._queue.task_done()
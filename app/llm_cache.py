@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+_FILLER_PREFIX = re.compile(r"^(please\s+|can you\s+|could you\s+|would you\s+|i want\s+|i'd like\s+)+")
+_FILLER_SUFFIX = re.compile(r"(\s+please)+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case, whitespace, punctuation and polite filler that don't change the requested scene."""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = re.sub(r"\s+", " ", text).strip(" .!?,;:")
+    text = _FILLER_PREFIX.sub("", text)
+    text = _FILLER_SUFFIX.sub("", text)
+    return text.strip(" .!?,;:")
+
+
+class LLMCache:
+    """Two-tier (memory + optional SQLite) TTL cache of LLM completions."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int, sqlite_path: Optional[str] = None, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if enabled and sqlite_path:
+            try:
+                self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning("LLM cache database unavailable, using memory only: %s", e)
+                self._db = None
+
+    @staticmethod
+    def key(prompt: str, model: str, prompt_version: str) -> str:
+        payload = "\x00".join([model, prompt_version, normalize_prompt(prompt)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+        row = None
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+        with self._lock:
+            if row:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                return row[1]
+            self.misses += 1
+            return None
+
+    async def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, value, now)
+
+    async def delete(self, key: str):
+        """Forget a completion, e.g. because its scene turned out not to render."""
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_delete, key)
+
+    # SQLite calls run on worker threads (via asyncio.to_thread) so disk I/O never blocks the
+    # event loop; _db_lock serializes them on the shared connection
+
+    def _db_get(self, key: str, now: float) -> Optional[tuple[float, str]]:
+        with self._db_lock:
+            try:
+                return self._db.execute(
+                    "SELECT created, value FROM llm_cache WHERE key = ? AND created > ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.warning("LLM cache lookup failed: %s", e)
+                return None
+
+    def _db_set(self, key: str, value: str, now: float):
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+                self._db.execute("DELETE FROM llm_cache WHERE created <= ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE key NOT IN "
+                    "(SELECT key FROM llm_cache ORDER BY created DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning("LLM cache write failed: %s", e)
+
+    def _db_delete(self, key: str):
+        with self._db_lock:
+            try:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning("LLM cache delete failed: %s", e)
+
+    def _remember(self, key: str, created: float, value: str):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
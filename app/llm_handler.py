@@ -1,6 +1,9 @@
+import asyncio
 import logging
+import random
 import re
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 from openai import (
     RateLimitError,
     AuthenticationError,
@@ -10,268 +13,286 @@ from openai import (
     APIError,
     BadRequestError,
 )
-from app.config import OPENAI_API_KEY, OPENAI_BASE_URL
+from app.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    LLM_MODEL,
+    LLM_STREAM,
+    LLM_MAX_TOKENS,
+    LLM_PROSE_LIMIT,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_DB,
+    LLM_TIMEOUT,
+    LLM_MAX_IN_FLIGHT,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    REPAIR_MAX_TOKENS,
+)
+from app.code_transforms import default_pipeline, extract_code
+from app.llm_cache import LLMCache
+from app.metrics import LLM_TOKENS, phase
 
 logging.basicConfig(level=logging.INFO)
 
-client = OpenAI(
+# One pooled HTTP client for every LLM call; the SDK's own retries are off because
+# _call_with_retries below retries with jitter outside the in-flight semaphore
+client = AsyncOpenAI(
     api_key=OPENAI_API_KEY,
-    base_url=OPENAI_BASE_URL
+    base_url=OPENAI_BASE_URL,
+    timeout=LLM_TIMEOUT,
+    max_retries=0,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        ),
+        timeout=LLM_TIMEOUT,
+    ),
+)
+
+_in_flight = asyncio.Semaphore(LLM_MAX_IN_FLIGHT)
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+llm_cache = LLMCache(
+    ttl_seconds=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    sqlite_path=LLM_CACHE_DB,
+    enabled=LLM_CACHE_ENABLED,
 )
 
-def get_manim_code(prompt: str) -> str:
-    system_prompt = (
-        "You are a Manim Community v0.19.0 expert producing clean, well-positioned, always-valid Python code.\n\n"
-
-        "## FORMAT\n"
-        "- Output ONLY valid Python code — no markdown, no explanations.\n"
-        "- Start with:\n"
-        "    from manim import *\n"
-        "    import numpy as np\n"
-        "- Define exactly ONE class: `GeneratedScene(Scene)` (2D) or `GeneratedScene(ThreeDScene)` (3D).\n"
-        "- Must have `def construct(self):` ending with `self.wait(2)`.\n\n"
-
-        "## ELEMENTS\n"
-        "- Text: `Text(\"...\", font_size=36)` — font_size between 24 and 60.\n"
-        "- Math: `MathTex(...)` for equations.\n"
-        "- Shapes: `Circle`, `Square`, `Dot`, `Line`, `Arrow`, `Rectangle`, `Polygon`.\n"
-        "- Graphs: `Axes(...).plot(...)`. Label with `axes.get_graph_label(graph, label=\"...\", x_val=...)`.\n"
-        "- NEVER add `font_size` to `get_graph_label()`.\n"
-        "- Shade: `axes.get_area(graph, x_range=[a, b], color=..., opacity=0.3)`.\n\n"
-
-        "## LAYOUT RULES (CRITICAL — elements MUST NOT overlap or go off-screen)\n"
-        "- Frame is ~14 units wide × ~8 units tall. Keep everything within these bounds.\n"
-        "- Use `scale_to_fit_width(8)` on large elements to ensure they fit with margin.\n"
-        "- Use `VGroup(...).arrange(RIGHT, buff=1.0)` or `.arrange(DOWN, buff=0.8)` to space elements.\n"
-        "- Place text labels above visuals with `.next_to(visual, UP, buff=0.5)`.\n"
-        "- For multi-part scenes, use `VGroup(...).arrange(DOWN, buff=1.0)` to stack sections vertically.\n"
-        "- Keep at most 4-5 elements visible at once to avoid clutter.\n"
-        "- If showing a sequence (like Fibonacci numbers), show at most 6-8 terms.\n"
-        "- Use `MathTex` for ALL formulas — never use `Text` with math symbols.\n\n"
-
-        "## ANIMATIONS (CRITICAL — must render in <2 minutes at medium quality)\n"
-        "- Use at most 5 `self.play()` calls. Each call adds ~10-30s of render time.\n"
-        "- Use `FadeIn`/`FadeOut` — they are 3-5x faster than `Write`/`Uncreate`/`Create`.\n"
-        "- Set `run_time=0.5` on EVERY `self.play()` call.\n"
-        "- Batch elements: `self.play(FadeIn(VGroup(title, diagram), run_time=0.5))`.\n"
-        "- For sequential reveals use `lag_ratio`: `self.play(FadeIn(VGroup(a,b,c), lag_ratio=0.3, run_time=1.5))` — this reveals one element at a time in a single play call.\n"
-        "- NEVER use `Write` on `MathTex` (traces each character — very slow).\n"
-        "- Avoid `Transform` — use `FadeOut` old + `FadeIn` new instead.\n"
-        "- Do NOT use `Create` on shapes — use `FadeIn`.\n"
-        "- Do NOT use `Write` on Text — use `FadeIn`.\n\n"
-
-        "## 3D\n"
-        "- Use `ThreeDScene` with `self.set_camera_orientation(phi=75*DEGREES, theta=30*DEGREES)`.\n"
-        "- Valid 3D: `Surface`, `ThreeDAxes`, `Sphere`, `Cube`, `Cylinder`.\n"
-        "- NO `ParametricSurface` — use `Surface(...)`.\n\n"
-
-        "## IMPORTANT: Do NOT add final layout/grouping code at the end of construct(). "
-        "The system handles final positioning. Just create and animate your elements.\n\n"
-
-        "## FALLBACK (if concept is not visualizable)\n"
-        "from manim import *\n"
-        "import numpy as np\n\n"
-        "class GeneratedScene(Scene):\n"
-        "    def construct(self):\n"
-        "        self.play(Write(Text(\"Visualization not supported\", font_size=36, color=RED)))\n"
-        "        self.wait(2)\n\n"
-
-        "Generate clean, organized, educational animations. Every element must be clearly visible and spaced."
+SYSTEM_PROMPT = (
+    "You are a Manim Community v0.19.0 expert producing clean, well-positioned, always-valid Python code.\n\n"
+
+    "## FORMAT\n"
+    "- Output ONLY valid Python code — no markdown, no explanations.\n"
+    "- Start with:\n"
+    "    from manim import *\n"
+    "    import numpy as np\n"
+    "- Define exactly ONE class: `GeneratedScene(Scene)` (2D) or `GeneratedScene(ThreeDScene)` (3D).\n"
+    "- Must have `def construct(self):` ending with `self.wait(2)`.\n\n"
+
+    "## ELEMENTS\n"
+    "- Text: `Text(\"...\", font_size=36)` — font_size between 24 and 60.\n"
+    "- Math: `MathTex(...)` for equations.\n"
+    "- Shapes: `Circle`, `Square`, `Dot`, `Line`, `Arrow`, `Rectangle`, `Polygon`.\n"
+    "- Graphs: `Axes(...).plot(...)`. Label with `axes.get_graph_label(graph, label=\"...\", x_val=...)`.\n"
+    "- NEVER add `font_size` to `get_graph_label()`.\n"
+    "- Shade: `axes.get_area(graph, x_range=[a, b], color=..., opacity=0.3)`.\n\n"
+
+    "## LAYOUT RULES (CRITICAL — elements MUST NOT overlap or go off-screen)\n"
+    "- Frame is ~14 units wide × ~8 units tall. Keep everything within these bounds.\n"
+    "- Use `scale_to_fit_width(8)` on large elements to ensure they fit with margin.\n"
+    "- Use `VGroup(...).arrange(RIGHT, buff=1.0)` or `.arrange(DOWN, buff=0.8)` to space elements.\n"
+    "- Place text labels above visuals with `.next_to(visual, UP, buff=0.5)`.\n"
+    "- For multi-part scenes, use `VGroup(...).arrange(DOWN, buff=1.0)` to stack sections vertically.\n"
+    "- Keep at most 4-5 elements visible at once to avoid clutter.\n"
+    "- If showing a sequence (like Fibonacci numbers), show at most 6-8 terms.\n"
+    "- Use `MathTex` for ALL formulas — never use `Text` with math symbols.\n\n"
+
+    "## ANIMATIONS (CRITICAL — must render in <2 minutes at medium quality)\n"
+    "- Use at most 5 `self.play()` calls. Each call adds ~10-30s of render time.\n"
+    "- Use `FadeIn`/`FadeOut` — they are 3-5x faster than `Write`/`Uncreate`/`Create`.\n"
+    "- Set `run_time=0.5` on EVERY `self.play()` call.\n"
+    "- Batch elements: `self.play(FadeIn(VGroup(title, diagram), run_time=0.5))`.\n"
+    "- For sequential reveals use `lag_ratio`: `self.play(FadeIn(VGroup(a,b,c), lag_ratio=0.3, run_time=1.5))` — this reveals one element at a time in a single play call.\n"
+    "- NEVER use `Write` on `MathTex` (traces each character — very slow).\n"
+    "- Avoid `Transform` — use `FadeOut` old + `FadeIn` new instead.\n"
+    "- Do NOT use `Create` on shapes — use `FadeIn`.\n"
+    "- Do NOT use `Write` on Text — use `FadeIn`.\n\n"
+
+    "## 3D\n"
+    "- Use `ThreeDScene` with `self.set_camera_orientation(phi=75*DEGREES, theta=30*DEGREES)`.\n"
+    "- Valid 3D: `Surface`, `ThreeDAxes`, `Sphere`, `Cube`, `Cylinder`.\n"
+    "- NO `ParametricSurface` — use `Surface(...)`.\n\n"
+
+    "## IMPORTANT: Do NOT add final layout/grouping code at the end of construct(). "
+    "The system handles final positioning. Just create and animate your elements.\n\n"
+
+    "## FALLBACK (if concept is not visualizable)\n"
+    "from manim import *\n"
+    "import numpy as np\n\n"
+    "class GeneratedScene(Scene):\n"
+    "    def construct(self):\n"
+    "        self.play(Write(Text(\"Visualization not supported\", font_size=36, color=RED)))\n"
+    "        self.wait(2)\n\n"
+
+    "Generate clean, organized, educational animations. Every element must be clearly visible and spaced."
+)
+
+REPAIR_PROMPT = (
+    "The code you wrote failed to render. Manim reported:\n\n{error}\n\n"
+    "Fix the error and return the complete corrected scene. Keep the same animation, "
+    "follow every rule above, and output ONLY the Python code."
+)
+# Only the tail of Manim's output matters: the exception and the frames right above it
+REPAIR_ERROR_CHARS = 3000
+
+# Bump whenever SYSTEM_PROMPT changes so cached completions from the old prompt are not reused
+SYSTEM_PROMPT_VERSION = "1"
+
+_REFUSAL = re.compile(
+    r"^\s*(i'm sorry|i am sorry|sorry,|i can't|i cannot|i can not|i'm unable|i am unable|as an ai)",
+    re.IGNORECASE,
+)
+_CODE_MARKERS = ("from manim import", "import numpy", "class GeneratedScene", "def construct(")
+_SCENE_HEADER = re.compile(r"^class\s+(\w+)\s*\(\s*\w*Scene\s*\)", re.MULTILINE)
+
+def _unusable_reason(text: str, tokens: int = 0):
+    """Return why a (possibly partial) completion can't become a scene, or None if it still can."""
+    if "Visualization not supported" in text:
+        return None
+    if _REFUSAL.match(text.lstrip("`").removeprefix("python")):
+        return "model refused the prompt"
+    if len(text) > LLM_PROSE_LIMIT and not any(marker in text for marker in _CODE_MARKERS):
+        return f"no code in the first {LLM_PROSE_LIMIT} characters"
+    header = _SCENE_HEADER.search(text)
+    if header and header.group(1) != "GeneratedScene":
+        return f"scene class is named {header.group(1)} instead of GeneratedScene"
+    if tokens > LLM_MAX_TOKENS:
+        return f"exceeded the {LLM_MAX_TOKENS} token budget"
+    return None
+
+def _is_quota_error(e: RateLimitError) -> bool:
+    err_str = str(e).lower()
+    return "insufficient_quota" in err_str or "exceeded your current quota" in err_str or "quota" in err_str
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, honouring the server's Retry-After when it sends one."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    response = getattr(e, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), LLM_BACKOFF_MAX))
+        except ValueError:
+            pass
+    return delay
+
+def _record_usage(usage, purpose: str):
+    if usage is None:
+        return
+    LLM_TOKENS.labels(purpose=purpose, type="prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(purpose=purpose, type="completion").inc(usage.completion_tokens or 0)
+
+async def _call_with_retries(call):
+    """Run `call()` under the in-flight limit, retrying transient upstream errors."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with _in_flight:
+                return await call()
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, RateLimitError) and _is_quota_error(e):
+                raise
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            logging.warning("LLM call failed (%s), retry %d/%d in %.1fs", type(e).__name__, attempt + 1, LLM_MAX_RETRIES, delay)
+            await asyncio.sleep(delay)
+
+async def _complete(messages: list[dict]) -> str:
+    response = await client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=LLM_MAX_TOKENS,
     )
+    _record_usage(response.usage, "generate")
+    completion = response.choices[0].message.content.strip()
+    reason = _unusable_reason(completion)
+    if reason:
+        raise Exception(f"UNUSABLE_OUTPUT: {reason}")
+    return completion
+
+async def _stream_completion(messages: list[dict]) -> str:
+    """Stream a completion, validating it as it arrives and hanging up early on unusable output."""
+    stream = await client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=LLM_MAX_TOKENS,
+        stream=True,
+    )
+    text = ""
+    tokens = 0
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            text += delta
+            tokens += 1
+
+            reason = _unusable_reason(text, tokens)
+            if reason:
+                raise Exception(f"UNUSABLE_OUTPUT: {reason}")
+
+            # A fence closing after the code means the rest is commentary we don't need to pay for
+            opening = text.find("```")
+            if opening != -1 and "class GeneratedScene" in text:
+                closing = text.find("```", text.find("class GeneratedScene"))
+                if closing != -1 and closing > opening:
+                    text = text[:closing + 3]
+                    break
+    finally:
+        # Closing the response drops the connection, which stops generation server-side
+        await stream.close()
+        # Streams don't report usage; each content chunk is roughly one token
+        LLM_TOKENS.labels(purpose="generate", type="completion").inc(tokens)
+    return text.strip()
+
+async def _repair_completion(messages: list[dict], max_tokens: int) -> tuple[str, int]:
+    response = await client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        temperature=0.2,
+        max_tokens=max_tokens,
+    )
+    _record_usage(response.usage, "repair")
+    tokens = response.usage.total_tokens if response.usage else max_tokens
+    return response.choices[0].message.content.strip(), tokens
+
+async def close_client():
+    await client.close()
 
+async def get_manim_code(prompt: str) -> str:
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
+        cache_key = llm_cache.key(prompt, LLM_MODEL, SYSTEM_PROMPT_VERSION)
+        completion = await llm_cache.get(cache_key)
+        if completion is None:
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-        )
+            ]
+            generate = _stream_completion if LLM_STREAM else _complete
+            with phase("llm", model=LLM_MODEL):
+                completion = await _call_with_retries(lambda: generate(messages))
+        else:
+            logging.info("LLM cache hit for prompt")
 
-        raw = response.choices[0].message.content.strip()
+        raw = completion
 
         if "Visualization not supported" in raw:
+            await llm_cache.set(cache_key, completion)
             return raw
 
-        if "```" in raw:
-            raw = raw.replace("```python", "").replace("```", "").strip()
-
-        raw = raw.strip("`").strip()
-        lines = raw.split('\n')
-        start_idx = 0
-        for i, line in enumerate(lines):
-            if line.strip().startswith('from manim import'):
-                start_idx = i
-                break
-        if start_idx > 0:
-            raw = '\n'.join(lines[start_idx:])
-
-        if not raw.startswith("from manim import"):
-            if "from manim import" in raw:
-                start_idx = raw.find("from manim import")
-                raw = raw[start_idx:]
-            else:
-                raw = "from manim import *\nimport numpy as np\n\n" + raw
-
-        lines = raw.split('\n')
-        new_lines = []
-        imports_added = False
-
-        for line in lines:
-            if line.strip().startswith('from manim import') and not imports_added:
-                new_lines.append("from manim import *")
-                imports_added = True
-            elif line.strip().startswith('import numpy as np'):
-                new_lines.append(line)
-            elif not line.strip().startswith('from manim') and not line.strip().startswith('import manim'):
-                new_lines.append(line)
-
-        if not imports_added:
-            new_lines.insert(0, "from manim import *")
-
-        if not any("import numpy as np" in line for line in new_lines):
-            insert_pos = 1
-            for i, line in enumerate(new_lines):
-                if line.strip().startswith('from manim import'):
-                    insert_pos = i + 1
-                    break
-            new_lines.insert(insert_pos, "import numpy as np")
-
-        raw = '\n'.join(new_lines)
-
-        needs_3d_scene = any(obj in raw for obj in [
-            'Surface', 'ThreeDAxes', 'ThreeDScene', 'Sphere', 'Cube', 'Cylinder', 'Cone', 'Torus', 'set_camera_orientation'
-        ])
-
-        if needs_3d_scene:
-            raw = raw.replace("class GeneratedScene(Scene):", "class GeneratedScene(ThreeDScene):")
-
-        if "class GeneratedScene" not in raw:
-            raise Exception("Generated code must contain a 'GeneratedScene' class")
-
-        # Auto-fix missing self.wait()
-        if "self.wait(" not in raw:
-            lines = raw.split('\n')
-            construct_indent = None
-            last_construct_line = -1
-            for i, line in enumerate(lines):
-                if "def construct(self):" in line:
-                    construct_indent = len(line) - len(line.lstrip())
-                elif construct_indent is not None and line.strip():
-                    if len(line) - len(line.lstrip()) > construct_indent:
-                        last_construct_line = i
-                    elif len(line) - len(line.lstrip()) <= construct_indent:
-                        break
-            if last_construct_line >= 0:
-                indent = ' ' * (construct_indent + 4)
-                lines.insert(last_construct_line + 1, f"{indent}self.wait(2)")
-            else:
-                lines.append("        self.wait(2)")
-            raw = '\n'.join(lines)
-
-        # Sanitize font sizes: cap anything over 60
-        def _cap_font_size(m):
-            val = int(m.group(1))
-            return f"font_size={min(val, 60)}"
-        raw = re.sub(r"font_size\s*=\s*(\d+)", _cap_font_size, raw)
-
-        # Performance validation & auto-fix: replace slow animations, add run_time
-        play_count = raw.count("self.play(")
-        if play_count > 5:
-            logging.warning("Code has %d self.play() calls — may be slow", play_count)
-        # Replace Write with FadeIn (3-5x faster, same visual effect)
-        raw = raw.replace("Write(", "FadeIn(")
-        # Replace Create with FadeIn (faster for shapes)
-        raw = raw.replace("Create(", "FadeIn(")
-        # Add run_time=0.5 to any self.play() that doesn't have it
-        lines = raw.split('\n')
-        fixed_lines = []
-        for line in lines:
-            if "self.play(" in line and "run_time" not in line and "self.wait(" not in line:
-                line = line.rstrip()
-                if line.endswith(")"):
-                    line = line[:-1] + ", run_time=0.5)"
-            fixed_lines.append(line)
-        raw = '\n'.join(fixed_lines)
-
-        # Inject smart auto-layout (runs BEFORE self.wait() so layout is visible)
-        if "def construct(self):" in raw:
-            try:
-                lines = raw.split('\n')
-                construct_start = [i for i, line in enumerate(lines) if "def construct(self):" in line][0]
-                construct_indent = len(lines[construct_start]) - len(lines[construct_start].lstrip()) + 4
-                indent = ' ' * construct_indent
-
-                # Find the last self.wait() to insert layout BEFORE it
-                wait_indices = [i for i, line in enumerate(lines) if "self.wait(" in line]
-                insert_at = wait_indices[-1] if wait_indices else len(lines) - 1
-
-                layout_block = (
-                    f"\n{indent}# Smart auto-layout\n"
-                    f"{indent}try:\n"
-                    f"{indent}    _mobs = [m for m in self.mobjects if m in self.mobjects]\n"
-                    f"{indent}    _texts = [m for m in _mobs if isinstance(m, Text)]\n"
-                    f"{indent}    _math = [m for m in _mobs if isinstance(m, MathTex)]\n"
-                    f"{indent}    _visuals = [m for m in _mobs if isinstance(m, VMobject) and not isinstance(m, (Text, MathTex))]\n"
-                    f"\n"
-                    f"{indent}    SAFE_W, SAFE_H = 12, 7\n"
-                    f"\n"
-                    f"{indent}    # 1. Scale + center visual elements (shapes, graphs, etc.)\n"
-                    f"{indent}    if _visuals:\n"
-                    f"{indent}        _vg = VGroup(*_visuals)\n"
-                    f"{indent}        _s = min(SAFE_W / max(_vg.width, 0.01), SAFE_H / max(_vg.height, 0.01), 1.0)\n"
-                    f"{indent}        if _s < 1.0:\n"
-                    f"{indent}            _vg.scale(_s)\n"
-                    f"{indent}        _vg.move_to(ORIGIN)\n"
-                    f"\n"
-                    f"{indent}    # 2. Position math below visuals\n"
-                    f"{indent}    if _math:\n"
-                    f"{indent}        _mg = VGroup(*_math)\n"
-                    f"{indent}        if len(_math) > 1:\n"
-                    f"{indent}            _mg.arrange(DOWN, buff=0.5)\n"
-                    f"{indent}        _mg.scale_to_fit_width(min(SAFE_W, _mg.width))\n"
-                    f"{indent}        if _visuals:\n"
-                    f"{indent}            _mg.next_to(_vg, DOWN, buff=0.5)\n"
-                    f"{indent}        else:\n"
-                    f"{indent}            _mg.move_to(ORIGIN)\n"
-                    f"\n"
-                    f"{indent}    # 3. Position text labels above everything\n"
-                    f"{indent}    if _texts:\n"
-                    f"{indent}        _tg = VGroup(*_texts)\n"
-                    f"{indent}        if len(_texts) > 1:\n"
-                    f"{indent}            _tg.arrange(RIGHT, buff=0.8)\n"
-                    f"{indent}        _tg.scale_to_fit_width(min(SAFE_W, _tg.width))\n"
-                    f"{indent}        if _visuals:\n"
-                    f"{indent}            _tg.next_to(_vg, UP, buff=0.5)\n"
-                    f"{indent}        elif _math:\n"
-                    f"{indent}            _tg.next_to(_mg, UP, buff=0.5)\n"
-                    f"{indent}        else:\n"
-                    f"{indent}            _tg.move_to(ORIGIN)\n"
-                    f"\n"
-                    f"{indent}    # 4. Final bounds check — nudge anything that drifted off-screen\n"
-                    f"{indent}    for _m in self.mobjects:\n"
-                    f"{indent}        if hasattr(_m, 'get_center'):\n"
-                    f"{indent}            _x, _y = _m.get_center()[:2]\n"
-                    f"{indent}            if abs(_x) > 6.5:\n"
-                    f"{indent}                _m.shift(LEFT * (_x - 6.0 * (1 if _x > 0 else -1)))\n"
-                    f"{indent}            if abs(_y) > 3.5:\n"
-                    f"{indent}                _m.shift(DOWN * (_y - 3.0 * (1 if _y > 0 else -1)))\n"
-                    f"{indent}except Exception:\n"
-                    f"{indent}    import logging\n"
-                    f"{indent}    logging.warning(\"Auto-layout skipped\", exc_info=True)\n"
-                )
-
-                lines.insert(insert_at, layout_block)
-                raw = '\n'.join(lines)
-            except Exception as layout_inject_error:
-                logging.warning("Auto-layout injection failed: %s", layout_inject_error)
-
-        return raw
+        with phase("postprocess"):
+            result = default_pipeline.run(extract_code(raw))
+        if result.play_count > 5:
+            logging.warning("Code has %d self.play() calls — may be slow", result.play_count)
+
+        # Cache only completions that made it through post-processing
+        await llm_cache.set(cache_key, completion)
+        return result.code
 
     except RateLimitError as e:
-        err_str = str(e).lower()
-        if "insufficient_quota" in err_str or "exceeded your current quota" in err_str or "quota" in err_str:
+        if _is_quota_error(e):
             raise Exception("QUOTA_EXHAUSTED: Your OpenAI API key has run out of credits. Top up at https://platform.openai.com/account/billing")
         raise Exception("RATE_LIMITED: Too many requests to OpenAI. Wait a minute and try again.")
 
@@ -291,6 +312,9 @@ def get_manim_code(prompt: str) -> str:
         raise Exception(f"OPENAI_ERROR: OpenAI API error: {e}")
 
     except Exception as e:
+        if str(e).startswith(("UNUSABLE_OUTPUT", "INVALID_CODE")):
+            logging.warning("LLM output rejected: %s", e)
+            raise
         logging.warning("LLM generation failed: %s", e)
         return (
             "from manim import *\nimport numpy as np\n\n"
@@ -299,3 +323,31 @@ def get_manim_code(prompt: str) -> str:
             "        self.play(Write(Text(\"Error generating animation\", font_size=36)))\n"
             "        self.wait(2)"
         )
+
+async def forget_completion(prompt: str):
+    """Drop the cached completion for a prompt whose scene failed to render."""
+    await llm_cache.delete(llm_cache.key(prompt, LLM_MODEL, SYSTEM_PROMPT_VERSION))
+
+async def repair_manim_code(prompt: str, code: str, error: str, max_tokens: int = REPAIR_MAX_TOKENS) -> tuple[str, int]:
+    """Ask the LLM to fix scene code that failed to render.
+
+    Returns the post-processed fix and the tokens spent on it. Raises if the reply
+    is unusable, doesn't parse, or doesn't change anything.
+    """
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+        {"role": "assistant", "content": code},
+        {"role": "user", "content": REPAIR_PROMPT.format(error=error.strip()[-REPAIR_ERROR_CHARS:])},
+    ]
+    completion, tokens = await _call_with_retries(
+        lambda: _repair_completion(messages, min(LLM_MAX_TOKENS, max_tokens))
+    )
+    reason = _unusable_reason(completion)
+    if reason or "Visualization not supported" in completion:
+        raise Exception(f"UNUSABLE_OUTPUT: {reason or 'model gave up on the scene'}")
+    # Static check before paying for another render: must parse and still have a construct()
+    result = default_pipeline.run(extract_code(completion))
+    if result.code.strip() == code.strip():
+        raise Exception("UNUSABLE_OUTPUT: repair returned the same code")
+    return result.code, tokens
@@ -1,14 +1,47 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.routes import router as generate_router
+from fastapi.responses import Response
+from contextlib import asynccontextmanager
+from app.artifact_store import artifact_store
+from app.config import ARTIFACT_SWEEP_INTERVAL
+from app.routes import router as generate_router, job_queue, batch_runner
+from app.video_routes import router as video_router
+from app.manim_runner import render_pool, render_cache
+from app.llm_handler import close_client as close_llm_client, llm_cache
+from app.metrics import registry, CACHE_HITS, CACHE_MISSES, CACHE_HIT_RATIO
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import asyncio
 import uvicorn
-import os
+
+_caches = {"llm": llm_cache, "render": render_cache}
+CACHE_HITS.set_function(lambda: {(name,): cache.hits for name, cache in _caches.items()})
+CACHE_MISSES.set_function(lambda: {(name,): cache.misses for name, cache in _caches.items()})
+CACHE_HIT_RATIO.set_function(lambda: {
+    (name,): cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0
+    for name, cache in _caches.items()
+})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the render workers with the event loop and stop them on shutdown
+    if render_pool.enabled:
+        render_pool.start()
+    await job_queue.start()
+    sweeper = asyncio.create_task(artifact_store.run_sweeper(ARTIFACT_SWEEP_INTERVAL))
+    yield
+    sweeper.cancel()
+    await batch_runner.stop()
+    await job_queue.stop()
+    render_pool.stop()
+    await close_llm_client()
+
 
 app = FastAPI(
     title="Manimate API",
     description="Backend service for generating animations from prompts using LLM + Manim.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
@@ -21,15 +54,18 @@ app.add_middleware(
 )
 
 
-os.makedirs("generate", exist_ok=True)
-# Mount static files (video outputs)
-app.mount("/videos",StaticFiles(directory="generate"), name="videos")
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 # Include API routes
 app.include_router(generate_router)
+app.include_router(video_router)
 
 
 if __name__ == "__main__":
@@ -1,113 +1,389 @@
 import subprocess
 import os
 import sys
-import glob
 import shutil
 import re
+import uuid
 import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+from app.config import (
+    RENDER_CACHE_ENABLED,
+    RENDER_CACHE_MAX_MB,
+    RENDER_TIMEOUT_MAX,
+    WARM_WORKERS,
+    WARM_WORKER_MAX_JOBS,
+    WARM_WORKER_MAX_RSS_MB,
+    GLYPH_CACHE_ENABLED,
+    GLYPH_CACHE_MAX_MB,
+    RENDER_FORMAT,
+    RENDER_FPS,
+    RENDER_RESOLUTION,
+    RENDER_VIDEO_CODEC,
+    RENDER_CRF,
+    RENDER_PRESET,
+    FFMPEG_BINARY,
+    GENERATE_DIR,
+    CACHE_DIR,
+)
+from app.artifact_store import artifact_store
+from app.glyph_cache import GlyphCache
+from app.metrics import PHASE_SECONDS, phase, span
+from app.resource_limits import ResourceLimits, limit_exceeded, limits_for
+from app.render_cache import RenderCache
+from app.worker_pool import WorkerPool, WorkerTimeout, WorkerCrashed, WorkerUnavailable
 
-def to_snake_case(name: str) -> str:
-    """Convert PascalCase scene name to snake_case (used by Manim for folders)."""
-    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
-
-def find_generated_video(generate_dir, scene_name="GeneratedScene"):
-    """Robust function to find the generated video file in various possible locations."""
-    scene_snake = to_snake_case(scene_name)
-    
-    search_patterns = [
-        os.path.join(generate_dir, "videos", scene_snake, "*", "output.mp4"),
-        os.path.join(generate_dir, "videos", scene_snake, "output.mp4"),
-        os.path.join(generate_dir, "videos", "*", "output.mp4"),
-        os.path.join(generate_dir, "videos", "output.mp4"),
-        os.path.join(generate_dir, "output.mp4"),
-        os.path.join(generate_dir, "**", "output.mp4"),
-        os.path.join(generate_dir, "**", f"{scene_name}.mp4"),
-        os.path.join(generate_dir, "**", f"{scene_snake}.mp4"),
-        os.path.join(generate_dir, "**", "generated_scene.mp4"),
-        os.path.join(generate_dir, "**", "*.mp4"),
-    ]
-    
-    for pattern in search_patterns:
-        matches = glob.glob(pattern, recursive=True)
-        if matches:
-            return matches[0]
-    
-    return None
-
-def write_to_file(code: str, filename="generated_scene.py") -> str:
-    """Write code to a Python file in the generate folder and return its full path."""
-    generate_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "generate"))
-    os.makedirs(generate_dir, exist_ok=True)
-
-    path = os.path.join(generate_dir, filename)
+ProgressCallback = Callable[..., None]
+
+WORKSPACE_DIR = os.path.join(GENERATE_DIR, "jobs")
+# Manim writes the finished video or frame straight to <workspace>/OUTPUT_DIR/output<ext>
+OUTPUT_DIR = "out"
+OUTPUT_NAME = "output"
+
+render_cache = RenderCache(
+    os.path.join(CACHE_DIR, "renders"),
+    max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024,
+    enabled=RENDER_CACHE_ENABLED,
+)
+
+glyph_cache = GlyphCache(
+    os.path.join(CACHE_DIR, "glyphs"),
+    max_bytes=GLYPH_CACHE_MAX_MB * 1024 * 1024,
+    enabled=GLYPH_CACHE_ENABLED,
+)
+
+# Memory and file-size limits hold for a warm worker's lifetime; CPU time is limited per job,
+# and jobs at another priority move the worker's nice level for their duration
+WARM_WORKER_LIMITS = replace(limits_for("interactive"), cpu_seconds=0)
+
+render_pool = WorkerPool(
+    WARM_WORKERS,
+    max_jobs=WARM_WORKER_MAX_JOBS,
+    max_rss_mb=WARM_WORKER_MAX_RSS_MB,
+    on_spawn=WARM_WORKER_LIMITS.apply_to,
+)
+
+@dataclass(frozen=True)
+class Encoding:
+    """Output settings for a render; the defaults leave Manim's own for the quality preset.
+
+    `format`, `fps` and `resolution` go to Manim. `codec`, `crf` and `preset` have no
+    Manim equivalent, so setting any of them re-encodes the finished video with ffmpeg.
+    """
+    format: str = "mp4"
+    fps: int = 0
+    resolution: str = ""
+    codec: str = ""
+    crf: str = ""
+    preset: str = ""
+
+    @property
+    def ext(self) -> str:
+        return f".{self.format}"
+
+    @property
+    def transcodes(self) -> bool:
+        return bool(self.codec or self.crf or self.preset) and self.format != "gif"
+
+    def manim_flags(self) -> list[str]:
+        flags = [] if self.format == "mp4" else ["--format", self.format]
+        if self.fps:
+            flags += ["--fps", str(self.fps)]
+        if self.resolution:
+            flags += ["-r", self.resolution]
+        return flags
+
+    def ffmpeg_args(self) -> list[str]:
+        if not self.transcodes:
+            return []
+        args = []
+        if self.codec:
+            args += ["-c:v", self.codec]
+        if self.crf:
+            args += ["-crf", self.crf]
+        if self.preset:
+            args += ["-preset", self.preset]
+        return args
+
+
+PREVIEW_ENCODING = Encoding()
+FINAL_ENCODING = Encoding(
+    format=RENDER_FORMAT,
+    fps=RENDER_FPS,
+    resolution=RENDER_RESOLUTION,
+    codec=RENDER_VIDEO_CODEC,
+    crf=RENDER_CRF,
+    preset=RENDER_PRESET,
+)
+
+def output_path(workspace: str, ext: str) -> str:
+    """Where Manim writes a render's final video (or `-s` frame) inside its workspace."""
+    return os.path.join(workspace, OUTPUT_DIR, f"{OUTPUT_NAME}{ext}")
+
+def write_to_file(code: str, filename="generated_scene.py", directory: str = GENERATE_DIR) -> str:
+    """Write code to a Python file in `directory` (the generate folder by default) and return its full path."""
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, filename)
     with open(path, "w") as f:
         f.write(code)
     return path
 
-def cleanup_old_files(generate_dir: str, keep_latest: int = 3):
-    """Remove old .mp4 files keeping only the `keep_latest` most recent."""
-    try:
-        mp4_files = glob.glob(os.path.join(generate_dir, "*.mp4"))
-        mp4_files.sort(key=os.path.getmtime, reverse=True)
-        for f in mp4_files[keep_latest:]:
-            os.remove(f)
-    except Exception:
-        pass
+def create_workspace(render_id: str) -> str:
+    """Create an isolated directory for one render and return its path."""
+    workspace = os.path.join(WORKSPACE_DIR, render_id)
+    os.makedirs(workspace)
+    return workspace
 
-def run_manim(code: str, scene_name: str = "GeneratedScene"):
-    generate_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "generate"))
-    os.makedirs(generate_dir, exist_ok=True)
+def write_manim_config(workspace: str) -> str:
+    """Pin Manim's tex/text directories to the workspace, where the glyph cache seeds them,
+    and its video/image directories to the fixed output directory."""
+    output_dir = os.path.join(workspace, OUTPUT_DIR)
+    return write_to_file(
+        "[CLI]\n"
+        f"tex_dir = {os.path.join(workspace, 'Tex')}\n"
+        f"text_dir = {os.path.join(workspace, 'texts')}\n"
+        f"video_dir = {output_dir}\n"
+        f"images_dir = {output_dir}\n",
+        "manim.cfg",
+        workspace,
+    )
 
-    cleanup_old_files(generate_dir, keep_latest=3)
-    filepath = write_to_file(code, "generated_scene.py")
+_ANIMATION_LINE = re.compile(r"Animation (\d+)")
 
+def _watch_output(pipe, lines: list[str], on_progress: Optional[ProgressCallback]):
+    """Collect a Manim output stream, reporting animation and encoding progress as it goes."""
+    last_index = -1
+    # Text mode turns the progress bar's carriage returns into line breaks
+    for line in pipe:
+        lines.append(line)
+        if on_progress is None:
+            continue
+        match = _ANIMATION_LINE.search(line)
+        if match and int(match.group(1)) != last_index:
+            last_index = int(match.group(1))
+            on_progress("rendering", animation=last_index + 1)
+        elif "Combining to Movie file" in line:
+            on_progress("encoding")
+
+def _render_cold(
+    filepath: str,
+    scene_name: str,
+    workspace: str,
+    flags: list[str],
+    timeout: int,
+    limits: ResourceLimits,
+    on_progress: Optional[ProgressCallback] = None,
+):
+    """Render in a fresh `python -m manim` process running under `limits`."""
     command = [
         sys.executable, "-m", "manim", filepath, scene_name,
-        "-qm", "--output_file", "output",
-        "--media_dir", generate_dir
+        *flags, "--output_file", OUTPUT_NAME,
+        "--media_dir", workspace,
+        "--config_file", write_manim_config(workspace)
     ]
 
     try:
-        result = subprocess.run(
+        proc = subprocess.Popen(
             command,
-            cwd=generate_dir,
-            capture_output=True,
+            cwd=workspace,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
-            timeout=600
         )
-    except subprocess.TimeoutExpired:
-        raise Exception("Rendering timed out (over 600 seconds). Please try a simpler prompt.")
     except FileNotFoundError as e:
         raise Exception(f"Manim or Python not installed properly: {e}")
     except Exception as e:
         raise Exception(f"Manim execution failed: {e}")
+    limits.apply_to(proc.pid)
 
-    if result.returncode != 0:
-        error_msg = result.stderr.strip() or result.stdout.strip() or f"Exit code {result.returncode}"
+    stdout_lines: list[str] = []
+    stderr_lines: list[str] = []
+    readers = [
+        threading.Thread(target=_watch_output, args=(proc.stdout, stdout_lines, on_progress), daemon=True),
+        threading.Thread(target=_watch_output, args=(proc.stderr, stderr_lines, on_progress), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    try:
+        returncode = proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        raise Exception(f"Rendering timed out (over {timeout} seconds). Please try a simpler prompt.")
+    finally:
+        for reader in readers:
+            reader.join(timeout=5)
+
+    if returncode != 0:
+        stderr = "".join(stderr_lines).strip()
+        stdout = "".join(stdout_lines).strip()
+        error_msg = stderr or stdout or f"Exit code {returncode}"
+        exceeded = limit_exceeded(limits, returncode, error_msg)
+        if exceeded:
+            raise Exception(f"RESOURCE_LIMIT: {exceeded}")
         raise Exception(f"Manim failed: {error_msg}")
 
-    logging.info("Manim rendered successfully.")
+def _render_warm(
+    filepath: str,
+    scene_name: str,
+    workspace: str,
+    quality: str,
+    last_frame: bool,
+    encoding: Encoding,
+    timeout: int,
+    limits: ResourceLimits,
+    on_progress: Optional[ProgressCallback] = None,
+):
+    """Render on a pre-imported worker from `render_pool`; raises WorkerUnavailable if none can be had."""
+    request = {
+        "file": filepath,
+        "scene": scene_name,
+        "media_dir": workspace,
+        "tex_dir": os.path.join(workspace, "Tex"),
+        "text_dir": os.path.join(workspace, "texts"),
+        "output_dir": os.path.join(workspace, OUTPUT_DIR),
+        "quality": quality,
+        "last_frame": last_frame,
+        "format": encoding.format,
+        "fps": encoding.fps,
+        "resolution": encoding.resolution,
+        "output_file": OUTPUT_NAME,
+        # The worker already runs at the interactive nice level; it applies the difference
+        "limits": replace(limits, nice=limits.nice - WARM_WORKER_LIMITS.nice).to_dict(),
+    }
+    try:
+        reply = render_pool.render(request, timeout, on_progress)
+    except WorkerTimeout:
+        raise Exception(f"Rendering timed out (over {timeout} seconds). Please try a simpler prompt.")
+    except (WorkerCrashed, OSError) as e:
+        exceeded = limit_exceeded(limits, getattr(e, "returncode", None))
+        if exceeded:
+            raise Exception(f"RESOURCE_LIMIT: {exceeded}")
+        # The worker process died, not the scene: nothing the repair loop could fix in the code
+        raise Exception(f"RENDER_WORKER_FAILED: {e}")
+
+    if not reply.get("ok"):
+        error_msg = reply.get("error", "").strip()
+        exceeded = limit_exceeded(limits, None, error_msg)
+        if exceeded:
+            raise Exception(f"RESOURCE_LIMIT: {exceeded}")
+        raise Exception(f"Manim failed: {error_msg}")
+
+def _transcode(src: str, encoding: Encoding, timeout: int, limits: ResourceLimits) -> str:
+    """Re-encode a finished video with the configured codec settings and return the new file."""
+    root, ext = os.path.splitext(src)
+    dest = f"{root}.encoded{ext}"
+    command = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", src,
+        *encoding.ffmpeg_args(), "-c:a", "copy",
+    ]
+    if ext in (".mp4", ".mov"):
+        command += ["-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+    command.append(dest)
+    try:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        raise Exception(f"ENCODING_FAILED: {FFMPEG_BINARY} not found")
+    limits.apply_to(proc.pid)
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise Exception(f"Encoding timed out (over {timeout} seconds).")
+    if proc.returncode != 0:
+        exceeded = limit_exceeded(limits, proc.returncode, stderr)
+        if exceeded:
+            raise Exception(f"RESOURCE_LIMIT: {exceeded}")
+        raise Exception(f"ENCODING_FAILED: {stderr.strip()[-500:]}")
+    return dest
+
+def run_manim(
+    code: str,
+    scene_name: str = "GeneratedScene",
+    quality: str = "m",
+    timeout: int = RENDER_TIMEOUT_MAX,
+    last_frame: bool = False,
+    on_progress: Optional[ProgressCallback] = None,
+    prompt: Optional[str] = None,
+    priority: str = "interactive",
+    preview: bool = False,
+) -> str:
+    """Render `code` at `-q<quality>` in its own workspace and return the artifact name of the result.
+
+    With `last_frame`, only the final frame is rendered (Manim's `-s`) and saved as a PNG.
+    `on_progress(phase, **data)` is called from the render thread as Manim reports progress.
+    `prompt` is recorded (hashed) in the artifact index. `priority` ("interactive" or
+    "batch") picks the resource limits and nice level the render runs under. Previews
+    keep Manim's defaults; everything else uses the configured RENDER_* encoding.
+    """
+    encoding = PREVIEW_ENCODING if preview else FINAL_ENCODING
+    ext = ".png" if last_frame else encoding.ext
+    render_id = uuid.uuid4().hex
+    flags = [f"-q{quality}"] + (["-s"] if last_frame else []) + encoding.manim_flags()
+    cache_key = render_cache.key(code, flags + ([] if last_frame else encoding.ffmpeg_args()))
+
+    workspace = create_workspace(render_id)
+    try:
+        cached = os.path.join(workspace, f"cached{ext}")
+        if render_cache.fetch(cache_key, cached):
+            return artifact_store.put(cached, ext, prompt)
+
+        filepath = write_to_file(code, "generated_scene.py", workspace)
+        glyph_cache.seed(workspace, code)
 
-    video_file = find_generated_video(generate_dir, scene_name)
-    
-    if not video_file:
-        # list_directory_contents(generate_dir, max_depth=5) # Removed as per edit hint
-        raise Exception("❌ Rendered file not found after exhaustive search")
+        # Everything before Manim reports its first animation is startup: interpreter,
+        # `import manim`, scene construction up to the first play()
+        started = time.monotonic()
+        first_progress = None
 
-    target_path = os.path.join(generate_dir, "output.mp4")
+        def track_progress(phase_name: str, **data):
+            nonlocal first_progress
+            if first_progress is None:
+                first_progress = time.monotonic()
+            if on_progress is not None:
+                on_progress(phase_name, **data)
 
-    if os.path.exists(target_path):
-        os.remove(target_path)
+        limits = limits_for(priority)
+        with span("manim", quality=quality, warm=render_pool.enabled, priority=priority):
+            warm = render_pool.enabled
+            if warm:
+                try:
+                    _render_warm(
+                        filepath, scene_name, workspace, quality, last_frame, encoding, timeout, limits, track_progress
+                    )
+                except WorkerUnavailable as e:
+                    logging.warning("No warm render worker available, rendering cold: %s", e)
+                    warm = False
+            if not warm:
+                _render_cold(filepath, scene_name, workspace, flags, timeout, limits, track_progress)
 
-    shutil.copy(video_file, target_path)
+        finished = time.monotonic()
+        if first_progress is not None:
+            PHASE_SECONDS.labels(phase="manim_startup").observe(first_progress - started)
+            PHASE_SECONDS.labels(phase="render").observe(finished - first_progress)
+        else:
+            PHASE_SECONDS.labels(phase="render").observe(finished - started)
+        logging.info("Manim rendered successfully.")
 
-    # Clean up Manim intermediate files to save disk space
-    for subdir in ["videos", "partial_movie_files", "images", "text", "tex"]:
-        path = os.path.join(generate_dir, subdir)
-        if os.path.exists(path):
-            try:
-                shutil.rmtree(path)
-            except Exception:
-                pass
+        video_file = output_path(workspace, ext)
+        if not os.path.exists(video_file):
+            raise Exception(f"Rendered file not found at {video_file}")
+        if encoding.transcodes and not last_frame:
+            if on_progress is not None:
+                on_progress("encoding", codec=encoding.codec or "default")
+            with phase("transcode"):
+                video_file = _transcode(video_file, encoding, timeout, limits)
 
-    return "output.mp4"
+        with phase("finalize"):
+            glyph_cache.publish(workspace, code)
+            render_cache.store(cache_key, video_file)
+            # Renamed, not copied, into the store
+            return artifact_store.put(video_file, ext, prompt)
+    finally:
+        # Only this render's source and Manim intermediates live in the workspace
+        shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,150 @@
+"""Prometheus metrics for the generate pipeline, plus optional trace spans.
+
+Metrics live in `registry` (a prometheus_client CollectorRegistry), which
+`/metrics` exposes. Values owned by other objects, like cache hit counts or
+the queue depth, are FunctionMetrics read from a callback at scrape time.
+When TRACING_ENABLED is set and the `opentelemetry` package is installed,
+`phase()` also opens a span, so timings show up in whatever tracer the
+process has configured.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.metrics_core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from app.config import TRACING_ENABLED
+
+_tracer = None
+if TRACING_ENABLED:
+    try:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("manimate")
+    except ImportError:
+        logging.warning("TRACING_ENABLED is set but the 'opentelemetry' package is not installed")
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+class FunctionMetric(Collector):
+    """A counter or gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, family: type, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.family = family
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self._function: Optional[Callable] = None
+
+    def set_function(self, function: Callable):
+        """Set the callback: it returns a number, or a {label values: number} dict for labelled metrics."""
+        self._function = function
+
+    def _family(self):
+        return self.family(self.name, self.documentation, labels=self.labelnames)
+
+    def describe(self):
+        return [self._family()]
+
+    def collect(self):
+        family = self._family()
+        if self._function is not None:
+            try:
+                value = self._function()
+                for values, number in (value if isinstance(value, dict) else {(): value}).items():
+                    family.add_metric(list(values), number)
+            except Exception as e:
+                # One broken callback shouldn't fail the whole scrape
+                logging.warning("Could not collect metric %s: %s", self.name, e)
+        return [family]
+
+
+registry = CollectorRegistry()
+
+
+def _function_metric(family: type, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> FunctionMetric:
+    metric = FunctionMetric(family, name, documentation, labelnames)
+    registry.register(metric)
+    return metric
+
+
+PHASE_SECONDS = Histogram(
+    "manimate_phase_seconds",
+    "Time spent in each pipeline phase (queue_wait, llm, postprocess, manim_startup, render, transcode, finalize, job).",
+    ("phase",),
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+REQUESTS = Counter(
+    "manimate_requests_total", "Generate requests by endpoint and outcome.", ("endpoint", "outcome"), registry=registry
+)
+JOBS = Counter("manimate_jobs_total", "Finished render jobs by final status.", ("status",), registry=registry)
+FALLBACKS = Counter(
+    "manimate_fallbacks_total", "Jobs that ended in a fallback video, by reason.", ("reason",), registry=registry
+)
+LLM_TOKENS = Counter(
+    "manimate_llm_tokens_total",
+    "LLM tokens used, by purpose (generate/repair) and type.",
+    ("purpose", "type"),
+    registry=registry,
+)
+QUEUE_DEPTH = _function_metric(GaugeMetricFamily, "manimate_queue_depth", "Jobs waiting for a render worker.")
+CACHE_HITS = _function_metric(CounterMetricFamily, "manimate_cache_hits_total", "Cache hits by cache.", ("cache",))
+CACHE_MISSES = _function_metric(
+    CounterMetricFamily, "manimate_cache_misses_total", "Cache misses by cache.", ("cache",)
+)
+CACHE_HIT_RATIO = _function_metric(
+    GaugeMetricFamily, "manimate_cache_hit_ratio", "Hit ratio since start, by cache.", ("cache",)
+)
+REPAIRS = _function_metric(
+    CounterMetricFamily,
+    "manimate_repairs_total",
+    "Render repair loop outcomes (attempts, repaired, failed).",
+    ("outcome",),
+)
+REPAIR_TOKENS = _function_metric(
+    CounterMetricFamily, "manimate_repair_tokens_total", "LLM tokens spent by the render repair loop."
+)
+TEMPLATES = Counter(
+    "manimate_template_renders_total",
+    "Jobs rendered from a built-in scene template instead of LLM code.",
+    ("template",),
+    registry=registry,
+)
+ARTIFACT_BYTES = _function_metric(GaugeMetricFamily, "manimate_artifact_bytes", "Bytes held in the artifact store.")
+
+
+def fallback_reason(err_str: str) -> str:
+    """Collapse an error message into a low-cardinality reason label."""
+    prefix = err_str.split(":", 1)[0]
+    if prefix.isupper() and prefix.replace("_", "").isalpha():
+        return prefix
+    lowered = err_str.lower()
+    if "timed out" in lowered:
+        return "TIMEOUT"
+    if "manim failed" in lowered:
+        return "MANIM_FAILED"
+    return "OTHER"
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """An OpenTelemetry span when tracing is enabled, otherwise nothing."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(f"manimate.{name}", attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def phase(name: str, **attributes):
+    """Time a pipeline phase into PHASE_SECONDS (and a span when tracing)."""
+    start = time.monotonic()
+    with span(name, **attributes):
+        try:
+            yield
+        finally:
+            PHASE_SECONDS.labels(phase=name).observe(time.monotonic() - start)
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import time
+import traceback
+from app.config import (
+    RENDER_TIMEOUT_MAX,
+    PREVIEW_MODE,
+    REPAIR_ENABLED,
+    REPAIR_MAX_ATTEMPTS,
+    REPAIR_BUDGET_SECONDS,
+    REPAIR_MAX_TOKENS,
+    TEMPLATE_QUALITY,
+    TEMPLATE_RENDER_TIMEOUT,
+)
+from app.artifact_store import artifact_store
+from app.cost_estimator import estimate_cost
+from app.job_queue import Job
+from app.llm_handler import get_manim_code, repair_manim_code, forget_completion
+from app.metrics import FALLBACKS, PHASE_SECONDS, REPAIRS, REPAIR_TOKENS, TEMPLATES, fallback_reason, phase
+from app.manim_runner import run_manim
+from app.scene_templates import TemplateMatch
+
+FALLBACK_TEMPLATE = """
+from manim import *
+
+class GeneratedScene(Scene):
+    def construct(self):
+        text = Text("{message}", font_size=36, color={color})
+        self.play(Write(text))
+        self.wait(2)
+"""
+
+
+class RepairStats:
+    """Counters for the render repair loop."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.tokens = 0
+        self.repaired = 0
+        self.failed = 0
+
+
+repair_stats = RepairStats()
+REPAIRS.set_function(lambda: {
+    ("attempts",): repair_stats.attempts,
+    ("repaired",): repair_stats.repaired,
+    ("failed",): repair_stats.failed,
+})
+REPAIR_TOKENS.set_function(lambda: repair_stats.tokens)
+
+
+def llm_error_message(err_str: str) -> str:
+    """Map an LLM handler error to the message shown in the fallback video."""
+    if err_str.startswith("QUOTA_EXHAUSTED"):
+        return "API credit exhausted. Contact admin."
+    if err_str.startswith("INVALID_API_KEY"):
+        return "API key invalid. Contact admin."
+    if err_str.startswith("RATE_LIMITED"):
+        return "Too many requests. Wait a moment and retry."
+    if err_str.startswith("NETWORK_ERROR"):
+        return "Network error. Check your connection."
+    if err_str.startswith("OPENAI_DOWN"):
+        return "AI service is down. Try again later."
+    if err_str.startswith("UNUSABLE_OUTPUT"):
+        return "Couldn't visualize that prompt. Try rephrasing it."
+    if err_str.startswith("INVALID_CODE"):
+        return "Generated code was invalid. Try a different prompt."
+    return "Failed to generate animation. Try a different prompt."
+
+
+def render_error_message(err_str: str) -> str:
+    """Map a rendering error to the message shown in the fallback video."""
+    if "timed out" in err_str.lower() or err_str.startswith("TOO_COMPLEX"):
+        return "Animation too complex. Try a simpler prompt."
+    if err_str.startswith("RESOURCE_LIMIT"):
+        return "Animation needs too much memory or CPU. Try a simpler prompt."
+    if err_str.startswith("RENDER_WORKER_FAILED"):
+        return "Renderer crashed. Try again."
+    if "manim failed" in err_str.lower():
+        return "Rendering failed. Try a different prompt."
+    return "Something went wrong. Try again."
+
+
+async def render_scene(
+    code: str,
+    quality: str = "m",
+    timeout: int = RENDER_TIMEOUT_MAX,
+    last_frame: bool = False,
+    on_progress=None,
+    prompt=None,
+    priority="interactive",
+    preview=False,
+) -> str:
+    """Render scene code off the event loop and return its public video URL."""
+    filename = await asyncio.to_thread(
+        run_manim,
+        code,
+        scene_name="GeneratedScene",
+        quality=quality,
+        timeout=timeout,
+        last_frame=last_frame,
+        on_progress=on_progress,
+        prompt=prompt,
+        priority=priority,
+        preview=preview,
+    )
+    return artifact_store.url(filename)
+
+
+def progress_reporter(job: Job, stage: str, total: int = 0):
+    """Build an on_progress callback that records render phases as job events."""
+    def report(phase: str, **data):
+        if phase == "rendering" and total:
+            data["total"] = max(total, data.get("animation", 0))
+        job.emit(phase, stage=stage, **data)
+    return report
+
+
+async def render_with_preview(job: Job, code: str, quality: str, timeout: int, total: int) -> str:
+    """Publish a cheap preview on the job first, then render the full-quality video."""
+    preview_progress = progress_reporter(job, "preview", total)
+    if PREVIEW_MODE == "frame":
+        job.preview_url = await render_scene(
+            code,
+            quality=quality,
+            timeout=timeout,
+            last_frame=True,
+            on_progress=preview_progress,
+            prompt=job.prompt,
+            priority=job.priority,
+            preview=True,
+        )
+    else:
+        job.preview_url = await render_scene(
+            code,
+            quality="l",
+            timeout=timeout,
+            on_progress=preview_progress,
+            prompt=job.prompt,
+            priority=job.priority,
+            # A -ql final render doubles as the preview, so it gets the final encoding
+            preview=quality != "l",
+        )
+        if quality == "l":
+            # The preview already is the final render
+            return job.preview_url
+    job.status = "preview_ready"
+    job.emit("preview_ready", preview_url=job.preview_url)
+    return await render_scene(
+        code,
+        quality=quality,
+        timeout=timeout,
+        on_progress=progress_reporter(job, "final", total),
+        prompt=job.prompt,
+        priority=job.priority,
+    )
+
+
+def check_cost(job: Job, code: str):
+    """Estimate the render cost, rejecting scenes that are too expensive to render."""
+    estimate = estimate_cost(code)
+    if estimate.rejected:
+        raise Exception(f"TOO_COMPLEX: estimated render cost {estimate.score} ({', '.join(estimate.reasons)})")
+    job.emit("code_validated", score=estimate.score, quality=estimate.quality, animations=estimate.play_count)
+    return estimate
+
+
+async def render_generated(job: Job, code: str) -> str:
+    estimate = check_cost(job, code)
+    if job.preview:
+        return await render_with_preview(job, code, estimate.quality, estimate.timeout, estimate.play_count)
+    return await render_scene(
+        code,
+        quality=estimate.quality,
+        timeout=estimate.timeout,
+        on_progress=progress_reporter(job, "final", estimate.play_count),
+        prompt=job.prompt,
+        priority=job.priority,
+    )
+
+
+async def render_template(job: Job, template: TemplateMatch) -> str:
+    """Render a built-in scene with the fixed template quality and time budget."""
+    job.emit("template_matched", template=template.name, params=template.params)
+    TEMPLATES.labels(template=template.name).inc()
+    if job.preview:
+        return await render_with_preview(
+            job, template.code, TEMPLATE_QUALITY, TEMPLATE_RENDER_TIMEOUT, template.animations
+        )
+    return await render_scene(
+        template.code,
+        quality=TEMPLATE_QUALITY,
+        timeout=TEMPLATE_RENDER_TIMEOUT,
+        on_progress=progress_reporter(job, "final", template.animations),
+        prompt=job.prompt,
+        priority=job.priority,
+    )
+
+
+async def render_with_repair(job: Job, code: str) -> str:
+    """Render generated code; if Manim rejects it, ask the LLM for a fix and try again.
+
+    Repairs stop after REPAIR_MAX_ATTEMPTS, or once REPAIR_BUDGET_SECONDS or
+    REPAIR_MAX_TOKENS are used up, and the last render error is raised.
+    """
+    deadline = time.monotonic() + REPAIR_BUDGET_SECONDS
+    tokens_left = REPAIR_MAX_TOKENS
+    attempt = 0
+    while True:
+        try:
+            video_url = await render_generated(job, code)
+            if attempt:
+                repair_stats.repaired += 1
+            return video_url
+        except Exception as e:
+            repairable = "manim failed" in str(e).lower()
+            if repairable and attempt == 0:
+                # Don't serve the broken completion to the next identical prompt
+                await forget_completion(job.prompt)
+            remaining = deadline - time.monotonic()
+            if (
+                not REPAIR_ENABLED or not repairable or attempt >= REPAIR_MAX_ATTEMPTS
+                or remaining <= 0 or tokens_left <= 0
+            ):
+                if attempt:
+                    repair_stats.failed += 1
+                raise
+            attempt += 1
+            repair_stats.attempts += 1
+            job.emit("repairing", attempt=attempt)
+            try:
+                with phase("repair"):
+                    code, tokens = await asyncio.wait_for(
+                        repair_manim_code(job.prompt, code, str(e), tokens_left), remaining
+                    )
+            except Exception as repair_err:
+                logging.warning("Repair attempt %d failed: %s", attempt, str(repair_err)[:200])
+                repair_stats.failed += 1
+                raise e
+            tokens_left -= tokens
+            repair_stats.tokens += tokens
+
+
+async def render_fallback(job: Job, message: str, color: str, reason: str) -> str:
+    FALLBACKS.labels(reason=reason).inc()
+    job.emit("fallback", message=message, reason=reason)
+    return await render_scene(FALLBACK_TEMPLATE.format(message=message, color=color), priority=job.priority)
+
+
+async def process_job(job: Job) -> str:
+    if job.started_at is not None:
+        PHASE_SECONDS.labels(phase="queue_wait").observe(job.started_at - job.created_at)
+    with phase("job", job_id=job.id, batch_id=job.batch_id or ""):
+        return await _process_job(job)
+
+
+async def _process_job(job: Job) -> str:
+    if job.code is not None:
+        return await render_scene(job.code, on_progress=progress_reporter(job, "final"), priority=job.priority)
+
+    if job.template is not None:
+        try:
+            return await render_template(job, job.template)
+        except Exception as e:
+            logging.warning("Template %s failed, falling back to the LLM: %s", job.template.name, str(e)[:200])
+
+    try:
+        try:
+            if job.llm_task is not None:
+                manim_code = await job.llm_task
+            else:
+                job.emit("llm_generating")
+                manim_code = await get_manim_code(job.prompt)
+        except Exception as e:
+            err_str = str(e)
+            logging.warning("LLM error: %s", err_str[:200])
+            return await render_fallback(job, llm_error_message(err_str), "YELLOW", fallback_reason(err_str))
+
+        return await render_with_repair(job, manim_code)
+
+    except Exception as e:
+        logging.warning("Rendering failed. Falling back to error scene.")
+        traceback.print_exc()
+
+        try:
+            return await render_fallback(job, render_error_message(str(e)), "RED", fallback_reason(str(e)))
+        except Exception as fb_err:
+            logging.warning("Fallback rendering also failed: %s", fb_err)
+            raise Exception("Video generation failed completely.")
@@ -1,26 +1,169 @@
-import time
+import abc
+import hashlib
 import logging
-from collections import defaultdict, deque
+import math
+import threading
+import time
+from typing import Optional
+from app.config import (
+    RATE_LIMIT_MAX_REQUESTS,
+    RATE_LIMIT_WINDOW_SECONDS,
+    RATE_LIMIT_REDIS_URL,
+    RATE_LIMIT_API_KEYS,
+)
+
+# Generic Cell Rate Algorithm: each key stores a single "theoretical arrival time" (TAT).
+# A request is allowed while TAT - now <= tolerance, and then pushes TAT one emission
+# interval further. With interval = window / limit and tolerance = window - interval,
+# a client can burst `limit` requests and then earns one back every interval.
+
+
+class RateLimitBackend(abc.ABC):
+    """Stores one TAT per key and applies a GCRA step atomically.
+
+    `acquire` is awaited from the request handlers, so backends doing I/O must not block the event loop.
+    """
+
+    @abc.abstractmethod
+    async def acquire(self, key: str, interval: float, tolerance: float) -> tuple[bool, float]:
+        """Return (allowed, seconds until the next request would be allowed)."""
+
+
+class MemoryBackend(RateLimitBackend):
+    """Process-local backend; keys whose TAT has passed are idle and get evicted."""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._tat: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    async def acquire(self, key, interval, tolerance):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tat = max(self._tat.get(key, now), now)
+            if tat - now > tolerance:
+                return False, tat - tolerance - now
+            self._tat[key] = tat + interval
+            return True, 0.0
+
+    def _sweep(self, now: float):
+        # A key whose TAT is in the past behaves exactly like a key we've never seen
+        for key in [k for k, tat in self._tat.items() if tat <= now]:
+            del self._tat[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class RedisBackend(RateLimitBackend):
+    """Shared backend for multiple workers/hosts.
+
+    `client` is a `redis.asyncio` client (or anything with its `register_script`).
+    The script is sent with EVALSHA, and loaded again only if Redis has lost it.
+    Keys expire once their TAT passes.
+    """
+
+    SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+if tat - now > tolerance then
+    return {0, tostring(tat - tolerance - now)}
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+    def __init__(self, client, prefix: str = "manimate:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed")
+        return cls(redis.Redis.from_url(url))
+
+    async def acquire(self, key, interval, tolerance):
+        allowed, retry_after = await self._script(keys=[self.prefix + key], args=[interval, tolerance])
+        return bool(int(allowed)), float(retry_after)
+
+
+def parse_api_key_quotas(spec: str) -> dict[str, tuple[int, int]]:
+    """Parse "key1:100/3600,key2:1000/86400" into {key: (max_requests, window_seconds)}."""
+    quotas = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            key, quota = item.rsplit(":", 1)
+            limit, window = quota.split("/")
+            quotas[key] = (int(limit), int(window))
+        except ValueError:
+            logging.warning("Ignoring malformed API key quota entry")
+    return quotas
+
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 5, window_seconds: int = 900):
+    def __init__(
+        self,
+        max_requests: int = 5,
+        window_seconds: int = 900,
+        backend: Optional[RateLimitBackend] = None,
+        api_key_quotas: Optional[dict[str, tuple[int, int]]] = None,
+    ):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self._requests: dict[str, deque] = defaultdict(deque)
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.api_key_quotas = api_key_quotas or {}
+
+    async def is_allowed(
+        self, key: str, max_requests: Optional[int] = None, window_seconds: Optional[int] = None
+    ) -> tuple[bool, int]:
+        limit = max_requests or self.max_requests
+        window = window_seconds or self.window_seconds
+        interval = window / limit
+        try:
+            allowed, retry_after = await self.backend.acquire(key, interval, window - interval)
+        except Exception as e:
+            # Fail open: an unreachable limiter shouldn't take the whole API down
+            logging.warning("Rate limiter backend error, allowing request: %s", e)
+            return True, 0
+        if allowed:
+            return True, 0
+        return False, max(math.ceil(retry_after), 1)
+
+    async def check(self, client_ip: str, api_key: Optional[str] = None) -> tuple[bool, int]:
+        """Apply the API key's own quota when it has one, otherwise the per-IP limit.
 
-    def is_allowed(self, key: str) -> tuple[bool, int]:
-        now = time.time()
-        window_start = now - self.window_seconds
-        reqs = self._requests[key]
+        A key's quota replaces the per-IP limit rather than adding to it: it is one
+        budget shared by every client presenting the key, whatever their IP.
+        """
+        if api_key and api_key in self.api_key_quotas:
+            limit, window = self.api_key_quotas[api_key]
+            digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+            return await self.is_allowed(f"key:{digest}", limit, window)
+        return await self.is_allowed(f"ip:{client_ip}")
 
-        while reqs and reqs[0] < window_start:
-            reqs.popleft()
 
-        if len(reqs) >= self.max_requests:
-            wait_time = int(reqs[0] + self.window_seconds - now)
-            return False, max(wait_time, 1)
+def _build_backend() -> RateLimitBackend:
+    if RATE_LIMIT_REDIS_URL:
+        return RedisBackend.from_url(RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
 
-        reqs.append(now)
-        return True, 0
 
-rate_limiter = RateLimiter(max_requests=2, window_seconds=86400)
+rate_limiter = RateLimiter(
+    max_requests=RATE_LIMIT_MAX_REQUESTS,
+    window_seconds=RATE_LIMIT_WINDOW_SECONDS,
+    backend=_build_backend(),
+    api_key_quotas=parse_api_key_quotas(RATE_LIMIT_API_KEYS),
+)
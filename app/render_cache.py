@@ -0,0 +1,124 @@
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+import tokenize
+import uuid
+from typing import Optional
+
+
+def normalize_code(code: str) -> str:
+    """Reduce scene source to its token stream so comments and whitespace don't change the key."""
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+        parts = []
+        for tok in tokens:
+            if tok.type in (tokenize.COMMENT, tokenize.NL):
+                continue
+            # Indentation width doesn't change what the scene draws
+            parts.append(str(tok.type) if tok.type in (tokenize.INDENT, tokenize.DEDENT) else tok.string)
+        return "\x1f".join(parts)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return code.replace("\r\n", "\n").strip()
+
+
+def _link_or_copy(src: str, dest: str):
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class RenderCache:
+    """Content-addressed store of finished videos with size-bounded LRU eviction."""
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running total of cached bytes, seeded by one directory scan on first store
+        self._size: Optional[int] = None
+
+    def key(self, code: str, flags: list[str]) -> str:
+        payload = normalize_code(code) + "\x00" + " ".join(flags)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}{ext}")
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """Materialize a cached render at `dest`; returns False on a miss."""
+        if not self.enabled:
+            return False
+        path = self._path(key, os.path.splitext(dest)[1])
+        try:
+            # mtime doubles as the LRU clock (atime is unreliable on noatime mounts)
+            os.utime(path)
+            _link_or_copy(path, dest)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        logging.info("Render cache hit: %s", key[:12])
+        return True
+
+    def store(self, key: str, src: str):
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            dest = self._path(key, os.path.splitext(src)[1])
+            tmp = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+            _link_or_copy(src, tmp)
+            added = os.path.getsize(tmp)
+            try:
+                added -= os.path.getsize(dest)
+            except OSError:
+                pass
+            os.replace(tmp, dest)
+        except OSError as e:
+            logging.warning("Could not store render in cache: %s", e)
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += added
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> tuple[list[tuple[float, int, str]], int]:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        """Drop least recently used renders down to 90% of the budget (caller holds the lock).
+
+        Evicting below the limit means the directory is scanned once per batch of
+        stores, not after every store once the cache is full.
+        """
+        entries, total = self._scan()
+        target = self.max_bytes * 0.9
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
@@ -0,0 +1,175 @@
+"""Long-lived Manim render worker.
+
+Run as `python -m app.render_worker`. The worker imports Manim once, then
+reads one JSON render request per line on stdin and answers with zero or
+more {"progress": ...} lines followed by one result line on its protocol
+stream. Manim's own console output is redirected to stderr so it can
+never corrupt the protocol.
+"""
+import json
+import os
+import resource
+import sys
+import traceback
+import types
+
+QUALITIES = {"l": "low_quality", "m": "medium_quality", "h": "high_quality"}
+
+
+def render(request: dict, progress=lambda phase, **data: None):
+    from manim import config, tempconfig
+
+    scene_file = request["file"]
+    with open(scene_file) as f:
+        source = f.read()
+
+    # Every job gets a fresh module namespace so scenes can't leak state into each other
+    module = types.ModuleType("generated_scene")
+    module.__file__ = scene_file
+
+    os.chdir(request["media_dir"])
+    with tempconfig({}):
+        config.media_dir = request["media_dir"]
+        config.tex_dir = request.get("tex_dir", "{media_dir}/Tex")
+        config.text_dir = request.get("text_dir", "{media_dir}/texts")
+        config.input_file = scene_file
+        config.output_file = request.get("output_file", "output")
+        config.quality = QUALITIES[request.get("quality", "m")]
+        if request.get("output_dir"):
+            # Same fixed output location the CLI path gets from manim.cfg
+            config.video_dir = request["output_dir"]
+            config.images_dir = request["output_dir"]
+        if request.get("format"):
+            config.format = request["format"]
+        if request.get("fps"):
+            config.frame_rate = request["fps"]
+        if request.get("resolution"):
+            width, height = (int(value) for value in request["resolution"].split(","))
+            config.pixel_width, config.pixel_height = width, height
+        config.scene_names = [request["scene"]]
+        if request.get("last_frame"):
+            # Equivalent of the CLI's -s: skip the movie, keep only the final frame
+            config.save_last_frame = True
+            config.write_to_movie = False
+        config.progress_bar = "none"
+        config.verbosity = "WARNING"
+
+        exec(compile(source, scene_file, "exec"), module.__dict__)
+        scene_cls = module.__dict__.get(request["scene"])
+        if scene_cls is None:
+            raise NameError(f"Scene class {request['scene']} not found in generated code")
+        scene = scene_cls()
+        _report_progress(scene, progress)
+        scene.render()
+
+
+def _report_progress(scene, progress):
+    """Wrap the scene's play() and its renderer's finish step to report progress."""
+    play = scene.play
+    scene_finished = scene.renderer.scene_finished
+    count = 0
+
+    def reporting_play(*args, **kwargs):
+        nonlocal count
+        count += 1
+        progress("rendering", animation=count)
+        return play(*args, **kwargs)
+
+    def reporting_scene_finished(*args, **kwargs):
+        progress("encoding")
+        return scene_finished(*args, **kwargs)
+
+    scene.play = reporting_play
+    scene.renderer.scene_finished = reporting_scene_finished
+
+
+def _limit_cpu(seconds: int):
+    """Cap this job's CPU time: the soft RLIMIT_CPU counts the whole process, so offset it by what's used."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if not seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    limit = int(usage.ru_utime + usage.ru_stime) + seconds
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+def _set_nice(value: int) -> bool:
+    """Move this process to niceness `value`; returns False if it may not (lowering needs privileges)."""
+    if os.getpriority(os.PRIO_PROCESS, 0) == value:
+        return True
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, value)
+    except PermissionError:
+        return False
+    return True
+
+
+def _can_lower_nice(base: int) -> bool:
+    """Whether this process may move back down to `base` after a job raised its niceness.
+
+    That needs CAP_SYS_NICE (or a permissive RLIMIT_NICE), which e.g. a default Docker
+    container doesn't grant. Probed by stepping one level below `base` and back up.
+    """
+    if base <= -20:
+        return True  # Nothing below to probe; getting here took the privilege in the first place
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, base - 1)
+    except PermissionError:
+        return False
+    os.setpriority(os.PRIO_PROCESS, 0, base)
+    return True
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def reply(message: dict):
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    try:
+        import manim  # noqa: F401 - pay the import cost once, up front
+    except Exception:
+        reply({"ready": False, "error": traceback.format_exc()})
+        return
+    # Job nice levels are increments on top of the niceness the worker started at, so
+    # jobs at the worker's own priority never need to lower it again
+    base_nice = os.getpriority(os.PRIO_PROCESS, 0)
+    # Without it a batch job's nice level would stick, and the pool would have to recycle the
+    # worker after every batch job; such workers run every job at their own level instead.
+    # Reported in the ready reply, since the pool discards the worker's stderr
+    can_renice = _can_lower_nice(base_nice)
+    reply({"ready": True, "pid": os.getpid(), "renice": can_renice})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            limits = request.get("limits", {})
+            # Exceeding it kills the worker with SIGXCPU, which the pool reports as a resource limit
+            _limit_cpu(limits.get("cpu_seconds", 0))
+            if can_renice:
+                _set_nice(base_nice + limits.get("nice", 0))
+            render(request, lambda phase, **data: reply({"progress": {"phase": phase, **data}}))
+            message = {"ok": True}
+        except Exception:
+            message = {"ok": False, "error": traceback.format_exc()}
+        message["rss_mb"] = _rss_mb()
+        if not _set_nice(base_nice):
+            # Stuck at a batch job's nice level after all; ask the pool for a fresh worker
+            message["recycle"] = True
+        reply(message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import signal
+from dataclasses import dataclass
+from typing import Optional
+from app.config import (
+    RENDER_MAX_MEMORY_MB,
+    RENDER_MAX_CPU_SECONDS,
+    RENDER_MAX_FILE_MB,
+    RENDER_NICE,
+    RENDER_BATCH_NICE,
+)
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits become no-ops there
+    resource = None
+
+PRIORITIES = ("interactive", "batch")
+
+_MEMORY_ERRORS = ("MemoryError", "Cannot allocate memory", "std::bad_alloc", "out of memory")
+_FILE_ERRORS = ("File too large", "EFBIG")
+
+
+@dataclass
+class ResourceLimits:
+    """Per-render OS limits; 0 means unlimited."""
+    memory_mb: int = 0
+    cpu_seconds: int = 0
+    file_mb: int = 0
+    nice: int = 0
+
+    def apply_to(self, pid: int):
+        """Limit the running process `pid` (and whatever it spawns afterwards, e.g. ffmpeg and LaTeX).
+
+        Called by the parent right after spawning, instead of from a Popen
+        `preexec_fn`, which isn't safe to run in a process with threads.
+        """
+        if resource is None or not hasattr(resource, "prlimit"):
+            return
+        try:
+            if self.memory_mb:
+                _set_soft_limit(pid, resource.RLIMIT_AS, self.memory_mb * 1024 * 1024)
+            if self.cpu_seconds:
+                _set_soft_limit(pid, resource.RLIMIT_CPU, self.cpu_seconds)
+            if self.file_mb:
+                _set_soft_limit(pid, resource.RLIMIT_FSIZE, self.file_mb * 1024 * 1024)
+            if self.nice:
+                # An increment on top of our own niceness, like os.nice() in the child
+                os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + self.nice)
+        except ProcessLookupError:
+            pass  # Already exited; the caller sees its exit status
+
+    def to_dict(self) -> dict:
+        return {"memory_mb": self.memory_mb, "cpu_seconds": self.cpu_seconds, "file_mb": self.file_mb, "nice": self.nice}
+
+
+def _set_soft_limit(pid: int, which: int, value: int):
+    soft, hard = resource.prlimit(pid, which)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.prlimit(pid, which, (value, hard))
+
+
+def limits_for(priority: str = "interactive") -> ResourceLimits:
+    return ResourceLimits(
+        memory_mb=RENDER_MAX_MEMORY_MB,
+        cpu_seconds=RENDER_MAX_CPU_SECONDS,
+        file_mb=RENDER_MAX_FILE_MB,
+        nice=RENDER_BATCH_NICE if priority == "batch" else RENDER_NICE,
+    )
+
+
+def limit_exceeded(limits: ResourceLimits, returncode: Optional[int], output: str = "") -> Optional[str]:
+    """Name the limit a failed render ran into, or None if it failed for another reason."""
+    if returncode == -signal.SIGXCPU:
+        return f"CPU time limit ({limits.cpu_seconds}s) exceeded"
+    if returncode == -signal.SIGXFSZ or any(marker in output for marker in _FILE_ERRORS):
+        return f"output file size limit ({limits.file_mb} MB) exceeded"
+    if any(marker in output for marker in _MEMORY_ERRORS):
+        return f"memory limit ({limits.memory_mb} MB) exceeded"
+    if returncode == -signal.SIGKILL:
+        # We only SIGKILL renders on timeout, which is reported separately; anything else is the OOM killer
+        return "killed by the kernel, most likely out of memory"
+    return None
@@ -1,9 +1,24 @@
+import json
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from app.batch import BatchRunner
+from app.config import (
+    RENDER_WORKERS,
+    RENDER_QUEUE_SIZE,
+    JOB_HISTORY_SIZE,
+    BATCH_MAX_ITEMS,
+    BATCH_LLM_CONCURRENCY,
+    TEMPLATES_ENABLED,
+)
+from app.job_queue import Job, JobQueue, QueueFullError
+from app.llm_cache import normalize_prompt
 from app.llm_handler import get_manim_code
-from app.manim_runner import run_manim, write_to_file
+from app.metrics import QUEUE_DEPTH, REQUESTS
+from app.pipeline import FALLBACK_TEMPLATE, process_job
 from app.rate_limiter import rate_limiter
-import traceback
+from app.scene_templates import match_template
 import logging
 
 router = APIRouter(
@@ -11,83 +26,177 @@ router = APIRouter(
     tags=['Generate']
 )
 
+job_queue = JobQueue(
+    process_job,
+    workers=RENDER_WORKERS,
+    max_queue=RENDER_QUEUE_SIZE,
+    history=JOB_HISTORY_SIZE,
+)
+QUEUE_DEPTH.set_function(lambda: job_queue.depth)
+
+batch_runner = BatchRunner(
+    job_queue,
+    get_manim_code,
+    concurrency=BATCH_LLM_CONCURRENCY,
+    history=JOB_HISTORY_SIZE,
+)
+
 class PromptModel(BaseModel):
     prompt: str
+    preview: bool = False
 
-class VideoResponse(BaseModel):
-    video_url: str
+class BatchModel(BaseModel):
+    items: list[PromptModel]
 
-FALLBACK_TEMPLATE = """
-from manim import *
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
 
-class GeneratedScene(Scene):
-    def construct(self):
-        text = Text("{message}", font_size=36, color={color})
-        self.play(Write(text))
-        self.wait(2)
-"""
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    video_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    error: Optional[str] = None
 
-@router.post("/", response_model=VideoResponse)
-async def generate_video(data: PromptModel, request: Request):
-    client_ip = request.client.host if request.client else "unknown"
+class BatchResponse(BaseModel):
+    batch_id: str
+    status: str
+    items: list[JobResponse]
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: str
+    counts: dict[str, int]
+    items: list[JobStatusResponse]
+
+def _client_ip(request: Request) -> str:
     forwarded = request.headers.get("x-forwarded-for")
     if forwarded:
-        client_ip = forwarded.split(",")[0].strip()
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _job_status(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "video_url": job.video_url,
+        "preview_url": job.preview_url,
+        "error": job.error,
+    }
+
+def _prompt_job(prompt: str, preview: bool) -> Job:
+    # Classifying is a few regexes, so it happens here and batches know which prompts skip the LLM
+    template = match_template(prompt) if TEMPLATES_ENABLED else None
+    return Job(prompt=prompt, preview=preview, template=template)
+
+def _format_wait(seconds: int) -> str:
+    # Coarse wording keeps the rate-limit scene to a few variants the render cache can reuse
+    if seconds >= 3600:
+        hours = round(seconds / 3600)
+        return f"about {hours} hour{'s' if hours != 1 else ''}"
+    if seconds >= 60:
+        minutes = round(seconds / 60)
+        return f"about {minutes} minute{'s' if minutes != 1 else ''}"
+    return "a minute"
 
-    allowed, wait_time = rate_limiter.is_allowed(client_ip)
+def _submit(job: Job, outcome: str = "accepted") -> dict:
+    try:
+        job_queue.submit(job)
+    except QueueFullError as e:
+        logging.warning("Rejecting job: %s", e)
+        REQUESTS.labels(endpoint="generate", outcome="queue_full").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy rendering other animations. Try again shortly.",
+            headers={"Retry-After": "30"},
+        )
+    REQUESTS.labels(endpoint="generate", outcome=outcome).inc()
+    return {"job_id": job.id, "status": job.status}
+
+@router.post("/", response_model=JobResponse, status_code=202)
+async def generate_video(data: PromptModel, request: Request):
+    client_ip = _client_ip(request)
+    allowed, wait_time = await rate_limiter.check(client_ip, request.headers.get("x-api-key"))
     if not allowed:
-        msg = f"Rate limit exceeded. Try again in {wait_time} seconds."
+        msg = f"Rate limit exceeded. Try again in {_format_wait(wait_time)}."
         logging.warning("Rate limited: %s", client_ip)
         fallback = FALLBACK_TEMPLATE.format(message=msg, color="YELLOW")
-        write_to_file(fallback, "rate_limit_scene.py")
-        video = run_manim(fallback, scene_name="GeneratedScene")
-        return {"video_url": f"/videos/{video}"}
+        return _submit(Job(prompt=data.prompt, code=fallback), outcome="rate_limited")
 
-    try:
-        try:
-            manim_code = get_manim_code(data.prompt)
-        except Exception as e:
-            err_str = str(e)
-            logging.warning("LLM error: %s", err_str[:200])
-
-            if err_str.startswith("QUOTA_EXHAUSTED"):
-                msg = "API credit exhausted. Contact admin."
-            elif err_str.startswith("INVALID_API_KEY"):
-                msg = "API key invalid. Contact admin."
-            elif err_str.startswith("RATE_LIMITED"):
-                msg = "Too many requests. Wait a moment and retry."
-            elif err_str.startswith("NETWORK_ERROR"):
-                msg = "Network error. Check your connection."
-            elif err_str.startswith("OPENAI_DOWN"):
-                msg = "AI service is down. Try again later."
+    return _submit(_prompt_job(data.prompt, data.preview))
+
+@router.post("/batch", response_model=BatchResponse, status_code=202)
+async def generate_batch(data: BatchModel, request: Request):
+    """Submit many prompts at once; identical prompts share one job."""
+    if not data.items:
+        raise HTTPException(status_code=400, detail="Batch has no items.")
+    if len(data.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch has more than {BATCH_MAX_ITEMS} items.")
+
+    client_ip = _client_ip(request)
+    api_key = request.headers.get("x-api-key")
+    jobs: dict[tuple[str, bool], Job] = {}
+    item_job_ids = []
+    for item in data.items:
+        key = (normalize_prompt(item.prompt), item.preview)
+        if key not in jobs:
+            # Every distinct prompt costs one request against the caller's quota
+            allowed, wait_time = await rate_limiter.check(client_ip, api_key)
+            REQUESTS.labels(endpoint="batch", outcome="accepted" if allowed else "rate_limited").inc()
+            if allowed:
+                jobs[key] = _prompt_job(item.prompt, item.preview)
             else:
-                msg = "Failed to generate animation. Try a different prompt."
+                msg = f"Rate limit exceeded. Try again in {_format_wait(wait_time)}."
+                jobs[key] = Job(prompt=item.prompt, code=FALLBACK_TEMPLATE.format(message=msg, color="YELLOW"))
+        else:
+            REQUESTS.labels(endpoint="batch", outcome="deduplicated").inc()
+        item_job_ids.append(jobs[key].id)
 
-            fallback = FALLBACK_TEMPLATE.format(message=msg, color="YELLOW")
-            write_to_file(fallback, "llm_error_scene.py")
-            video = run_manim(fallback, scene_name="GeneratedScene")
-            return {"video_url": f"/videos/{video}"}
+    batch = batch_runner.submit(list(jobs.values()), item_job_ids)
+    by_id = {job.id: job for job in batch.jobs}
+    return {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "items": [{"job_id": job_id, "status": by_id[job_id].status} for job_id in item_job_ids],
+    }
 
-        filename = run_manim(manim_code, scene_name="GeneratedScene")
-        return {"video_url": f"/videos/{filename}"}
+@router.get("/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch(batch_id: str):
+    batch = batch_runner.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    by_id = {job.id: job for job in batch.jobs}
+    return {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "counts": batch.counts(),
+        "items": [_job_status(by_id[job_id]) for job_id in batch.item_job_ids],
+    }
 
-    except Exception as e:
-        logging.warning("Rendering failed. Falling back to error scene.")
-        traceback.print_exc()
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return _job_status(job)
 
-        err_msg = str(e)
-        if "timed out" in err_msg.lower():
-            msg = "Animation too complex. Try a simpler prompt."
-        elif "manim failed" in err_msg.lower():
-            msg = "Rendering failed. Try a different prompt."
-        else:
-            msg = "Something went wrong. Try again."
-
-        fallback = FALLBACK_TEMPLATE.format(message=msg, color="RED")
-        try:
-            write_to_file(fallback, "fallback_scene.py")
-            video = run_manim(fallback, scene_name="GeneratedScene")
-            return {"video_url": f"/videos/{video}"}
-        except Exception as fb_err:
-            logging.warning("Fallback rendering also failed: %s", fb_err)
-            raise HTTPException(status_code=500, detail="Video generation failed completely.")
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-Sent Events feed of a job's progress, closed once the job finishes."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def event_stream():
+        async for event in job_queue.stream(job):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['phase']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
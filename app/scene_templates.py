@@ -0,0 +1,639 @@
+"""Built-in parameterized scenes for the most common kinds of prompt.
+
+`match_template()` recognises four prompt shapes with regexes: plotting a
+function, the area under a curve, a well-known formula, and the first N terms
+of a sequence. It returns ready-to-render scene code, so those prompts never
+reach the LLM. Functions are parsed with `ast`. Only arithmetic on the
+variable, numbers and a short list of functions is accepted, and the function
+is evaluated over the plotted range before it is used. Any prompt that does not
+fit one of these shapes goes to the LLM as before.
+
+The scene source depends only on the parsed parameters, not on how the prompt
+was worded. "plot x^2" and "Graph y = x**2." therefore produce the same code,
+and the render cache serves the second one.
+"""
+import ast
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+MAX_EXPRESSION_LENGTH = 100
+MAX_EXPRESSION_NODES = 60
+# The system prompt's limit for sequences, so the cells fit the frame; longer ones go to the LLM
+SEQUENCE_MAX_TERMS = 8
+DEFAULT_DOMAINS = ((-5.0, 5.0), (0.0, 5.0))
+DEFAULT_AREA = (0.0, 2.0)
+_SAMPLES = 200
+_MAX_MAGNITUDE = 1e6
+# Largest change between neighbouring samples, as a fraction of the y-range, before it counts as a pole
+_MAX_JUMP = 0.5
+
+
+@dataclass
+class TemplateMatch:
+    name: str
+    params: dict
+    code: str
+    animations: int
+
+
+# --- Expressions -------------------------------------------------------------
+
+_FUNCTIONS: dict[str, tuple[Callable[[float], float], str]] = {
+    # name in the prompt: (evaluator, numpy function used in the scene)
+    "sin": (math.sin, "sin"),
+    "cos": (math.cos, "cos"),
+    "tan": (math.tan, "tan"),
+    "exp": (math.exp, "exp"),
+    "log": (math.log, "log"),
+    "log10": (math.log10, "log10"),
+    "log2": (math.log2, "log2"),
+    "ln": (math.log, "log"),
+    "sqrt": (math.sqrt, "sqrt"),
+    "abs": (abs, "abs"),
+}
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+_PRECEDENCE = {ast.Add: 1, ast.Sub: 1, ast.Mult: 2, ast.Div: 3, ast.Pow: 4}
+
+_SUBSTITUTIONS = (("π", "pi"), ("^", "**"), ("−", "-"), ("×", "*"), ("·", "*"), ("÷", "/"))
+# One factor of a product: a number, pi or a single letter, optionally raised to a power
+_FACTOR = r"(?:\d+(?:\.\d+)?|pi\b|[a-z]\b)(?:\s*\*\*\s*(?:\d+(?:\.\d+)?|[a-z]\b))?"
+# A function name without parentheses takes the whole product after it: "sin 2x" is sin(2x), not sin(2)*x.
+# "log" followed by digits is only log10/log2; "log3(x)" and the like match nothing and fail to parse
+_IMPLICIT_CALL = re.compile(
+    rf"\b(sin|cos|tan|exp|ln|log10|log2|log(?!\d)|sqrt)\s*({_FACTOR}(?:\s*\*?\s*{_FACTOR})*)"
+)
+
+
+def _normalize(text: str, variable: str) -> str:
+    text = text.strip().lower()
+    for old, new in _SUBSTITUTIONS:
+        text = text.replace(old, new)
+    # "sin 2x" -> "sin(2x)", "2x" -> "2*x", "x(x+1)" -> "x*(x+1)", "(x+1)(x-1)" -> "(x+1)*(x-1)"
+    text = _IMPLICIT_CALL.sub(r"\1(\2)", text)
+    # \b keeps the digits of "log10(" out of this
+    text = re.sub(r"\b(\d+(?:\.\d+)?)\s*([a-z(])", r"\1*\2", text)
+    text = re.sub(rf"\b({variable}|pi)\s*([a-z(])", r"\1*\2", text)
+    text = re.sub(r"\)\s*([a-z\d(])", r")*\1", text)
+    return text
+
+
+def _check(node: ast.AST, variable: str):
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _OPERATORS):
+        _check(node.left, variable)
+        _check(node.right, variable)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        _check(node.operand, variable)
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"unsupported constant {node.value!r}")
+        if abs(node.value) > _MAX_MAGNITUDE:
+            raise ValueError(f"constant {node.value} is too large")
+    elif isinstance(node, ast.Name):
+        if node.id != variable and node.id not in _CONSTANTS:
+            raise ValueError(f"unknown name {node.id!r}")
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise ValueError("unsupported function")
+        if len(node.args) != 1 or node.keywords:
+            raise ValueError(f"{node.func.id}() takes exactly one argument")
+        _check(node.args[0], variable)
+    else:
+        raise ValueError(f"unsupported syntax {type(node).__name__}")
+
+
+class _ToNumpy(ast.NodeTransformer):
+    def visit_Name(self, node: ast.Name):
+        if node.id in _CONSTANTS:
+            return ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr=node.id, ctx=ast.Load())
+        return node
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        name = _FUNCTIONS[node.func.id][1]
+        node.func = ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr=name, ctx=ast.Load())
+        return node
+
+
+class _ToFloat(ast.NodeTransformer):
+    # Float arithmetic overflows instead of building huge integers, so 10**10**10 fails fast
+    def visit_Constant(self, node: ast.Constant):
+        return ast.Constant(value=float(node.value))
+
+
+def _format_number(value: float) -> str:
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.4g}"
+
+
+def _precedence(node: ast.AST) -> int:
+    if isinstance(node, ast.BinOp):
+        return _PRECEDENCE[type(node.op)]
+    if isinstance(node, ast.UnaryOp):
+        return 3
+    return 5
+
+
+def _wrap(node: ast.AST, minimum: int) -> str:
+    text = _latex(node)
+    return rf"\left({text}\right)" if _precedence(node) < minimum else text
+
+
+def _latex(node: ast.AST) -> str:
+    if isinstance(node, ast.Constant):
+        return _format_number(node.value)
+    if isinstance(node, ast.Name):
+        return r"\pi" if node.id == "pi" else node.id
+    if isinstance(node, ast.UnaryOp):
+        operand = _wrap(node.operand, 3)
+        return f"-{operand}" if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.Call):
+        name, arg = node.func.id, _latex(node.args[0])
+        if name == "sqrt":
+            return rf"\sqrt{{{arg}}}"
+        if name == "abs":
+            return rf"\left|{arg}\right|"
+        if name == "exp":
+            return f"e^{{{arg}}}"
+        if name in ("log10", "log2"):
+            command = rf"\log_{{{name[3:]}}}"
+        else:
+            command = r"\ln" if name in ("ln", "log") else "\\" + name
+        return rf"{command}\left({arg}\right)"
+    op = type(node.op)
+    if op is ast.Div:
+        return rf"\frac{{{_latex(node.left)}}}{{{_latex(node.right)}}}"
+    if op is ast.Pow:
+        return f"{_wrap(node.left, 5)}^{{{_latex(node.right)}}}"
+    if op is ast.Mult:
+        left, right = _wrap(node.left, 2), _wrap(node.right, 4)
+        return f"{left} \\cdot {right}" if right[0].isdigit() else f"{left} {right}"
+    right = _wrap(node.right, 2) if op is ast.Sub else _wrap(node.right, 1)
+    return f"{_latex(node.left)} {'-' if op is ast.Sub else '+'} {right}"
+
+
+class Expression:
+    """A whitelisted arithmetic expression in one variable, parsed from prompt text.
+
+    Raises ValueError for anything that isn't one. `source` is the numpy code used
+    in the scene, `latex` its MathTex form, and calling the expression evaluates it
+    (None where it is undefined).
+    """
+
+    def __init__(self, text: str, variable: str = "x"):
+        if len(text) > MAX_EXPRESSION_LENGTH:
+            raise ValueError("expression is too long")
+        try:
+            tree = ast.parse(_normalize(text, variable), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"not an expression: {e.msg}")
+        if sum(1 for _ in ast.walk(tree)) > MAX_EXPRESSION_NODES:
+            raise ValueError("expression is too long")
+        _check(tree.body, variable)
+        self.variable = variable
+        self.depends = any(isinstance(node, ast.Name) and node.id == variable for node in ast.walk(tree))
+        self.source = ast.unparse(_ToNumpy().visit(ast.parse(ast.unparse(tree), mode="eval")))
+        self.latex = _latex(tree.body)
+        self.precedence = _precedence(tree.body)
+        self._code = compile(ast.fix_missing_locations(_ToFloat().visit(tree)), "<expression>", "eval")
+        self._names = {name: function for name, (function, _) in _FUNCTIONS.items()}
+        self._names.update(_CONSTANTS)
+
+    def __call__(self, value: float = 0.0) -> Optional[float]:
+        try:
+            result = eval(self._code, {"__builtins__": {}}, {**self._names, self.variable: float(value)})
+        except (ArithmeticError, ValueError):
+            return None
+        if isinstance(result, complex) or not math.isfinite(result):
+            return None
+        return float(result)
+
+
+def _constant(text: str) -> Expression:
+    bound = Expression(text)
+    if bound.depends or bound() is None:
+        raise ValueError(f"{text!r} is not a number")
+    return bound
+
+
+def _sample(function: Expression, lo: float, hi: float) -> Optional[list[float]]:
+    """Values across [lo, hi], or None if the function is undefined, huge or has a pole anywhere in it."""
+    values = []
+    for i in range(_SAMPLES + 1):
+        value = function(lo + (hi - lo) * i / _SAMPLES)
+        if value is None or abs(value) > _MAX_MAGNITUDE:
+            return None
+        values.append(value)
+    # Poles between samples (tan x, 1/(x - 1)) show up as a jump across most of the range,
+    # which the plot would draw as a vertical line
+    limit = (max(values) - min(values)) * _MAX_JUMP
+    if any(abs(b - a) > limit for a, b in zip(values, values[1:])):
+        return None
+    return values
+
+
+def _nice_step(span: float, ticks: int = 8) -> float:
+    raw = span / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 5):
+        if raw <= multiple * magnitude:
+            return multiple * magnitude
+    return 10 * magnitude
+
+
+def _axis_range(lo: float, hi: float, pad: float = 0.0) -> list[float]:
+    if hi - lo < 1e-9:
+        lo, hi = lo - 1, hi + 1
+    lo, hi = lo - (hi - lo) * pad, hi + (hi - lo) * pad
+    step = _nice_step(hi - lo)
+    return [
+        round(math.floor(lo / step) * step, 6),
+        round(math.ceil(hi / step) * step, 6),
+        round(step, 6),
+    ]
+
+
+def _plot_range(lo: float, hi: float) -> list[float]:
+    return [round(lo, 6), round(hi, 6), round((hi - lo) / _SAMPLES, 6)]
+
+
+# --- Scenes --------------------------------------------------------------------
+
+_PLOT_SCENE = """from manim import *
+import numpy as np
+
+
+class GeneratedScene(Scene):
+    def construct(self):
+        axes = Axes(
+            x_range={x_range},
+            y_range={y_range},
+            x_length=10,
+            y_length=5.5,
+            tips=False,
+            axis_config={{"include_numbers": True, "font_size": 24}},
+        )
+        label = MathTex({label!r}, font_size=44)
+        label.scale_to_fit_width(min(label.width, 12))
+        VGroup(label, axes).arrange(DOWN, buff=0.4)
+        graph = axes.plot(lambda x: {function}, x_range={plot_range}, color=BLUE)
+        self.play(FadeIn(VGroup(label, axes)), run_time=0.5)
+        self.play(Create(graph), run_time=1.5)
+        self.wait(2)
+"""
+
+_AREA_SCENE = """from manim import *
+import numpy as np
+
+
+class GeneratedScene(Scene):
+    def construct(self):
+        axes = Axes(
+            x_range={x_range},
+            y_range={y_range},
+            x_length=10,
+            y_length=5.5,
+            tips=False,
+            axis_config={{"include_numbers": True, "font_size": 24}},
+        )
+        label = MathTex({label!r}, font_size=44)
+        label.scale_to_fit_width(min(label.width, 12))
+        VGroup(label, axes).arrange(DOWN, buff=0.4)
+        graph = axes.plot(lambda x: {function}, x_range={plot_range}, color=BLUE)
+        area = axes.get_area(graph, x_range={area_range}, color=BLUE, opacity=0.3)
+        self.play(FadeIn(VGroup(label, axes)), run_time=0.5)
+        self.play(Create(graph), run_time=1)
+        self.play(FadeIn(area), run_time=0.5)
+        self.wait(2)
+"""
+
+_FORMULA_SCENE = """from manim import *
+import numpy as np
+
+
+class GeneratedScene(Scene):
+    def construct(self):
+        title = Text({title!r}, font_size=40)
+        formula = MathTex({latex!r}, font_size=60)
+        formula.scale_to_fit_width(min(formula.width, 12))
+        VGroup(title, formula).arrange(DOWN, buff=0.8)
+        self.play(FadeIn(title), run_time=0.5)
+        self.play(FadeIn(formula, shift=UP * 0.3), run_time=0.5)
+        self.wait(2)
+"""
+
+_SEQUENCE_SCENE = """from manim import *
+import numpy as np
+
+
+class GeneratedScene(Scene):
+    def construct(self):
+        title = {title}
+        cells = VGroup()
+        for index, term in enumerate({terms!r}, start=1):
+            box = Square(side_length=1.3, color=BLUE)
+            value = MathTex(term, font_size=40)
+            if value.width > 1.0:
+                value.scale_to_fit_width(1.0)
+            name = MathTex("a_{{" + str(index) + "}}", font_size=28, color=GRAY).next_to(box, DOWN, buff=0.2)
+            cells.add(VGroup(box, value, name))
+        cells.arrange(RIGHT, buff=0.25)
+        VGroup(title, cells).arrange(DOWN, buff=0.8)
+        self.play(FadeIn(title), run_time=0.5)
+        self.play(FadeIn(cells, lag_ratio=0.3), run_time=1.5)
+        self.wait(2)
+"""
+
+
+# --- Prompt shapes -------------------------------------------------------------
+
+_ASK = r"(?:(?:please|can\s+you|could\s+you)\s+)?"
+_FUNCTION = r"(?:the\s+)?(?:graph\s+of\s+)?(?:the\s+)?(?:function\s+|curve\s+)?(?:(?:y|f\(x\))\s*=\s*)?(?P<expr>.+?)"
+_RANGE = r"""
+    (?:,?\s+(?:for|over|on|from|between|in)\s+
+        (?:the\s+(?:interval|range)\s+)?
+        (?:x\s*(?:=|in|from|between)?\s*)?
+        (?:[\[(]\s*(?P<a>[^,\[\]()]+?)\s*,\s*(?P<b>[^,\[\]()]+?)\s*[\])]
+          |(?P<lo>\S+?)\s+(?:to|and)\s+(?:x\s*=\s*)?(?P<hi>\S+?)))
+"""
+_END = r"\s*[.!?]?$"
+
+_PLOT = re.compile(
+    rf"^{_ASK}(?:plot|graph|draw|sketch|show(?:\s+me)?|visuali[sz]e|animate)\s+{_FUNCTION}{_RANGE}?{_END}",
+    re.IGNORECASE | re.VERBOSE,
+)
+_AREA = re.compile(
+    rf"""^{_ASK}(?:(?:shade|show(?:\s+me)?|find|compute|calculate|visuali[sz]e|illustrate|draw|plot)\s+)?
+    (?:the\s+)?area\s+(?:under|beneath|below)\s+{_FUNCTION}{_RANGE}?{_END}""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_INTEGRAL = re.compile(
+    rf"""^{_ASK}(?:(?:show(?:\s+me)?|find|compute|calculate|evaluate|visuali[sz]e|illustrate)\s+)?
+    (?:(?:the\s+)?(?:definite\s+)?integral\s+of|integrate)\s+{_FUNCTION}{_RANGE}{_END}""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_SEQUENCE = re.compile(
+    rf"""^{_ASK}(?:(?:show|list|display|write|draw|visuali[sz]e|animate|give)\s+)?(?:me\s+)?(?:the\s+)?
+    first\s+(?P<count>\d+|[a-z]+)\s+(?:(?:terms|elements|numbers|values)\s+(?:of|in)\s+)?(?:the\s+)?
+    (?P<name>.+?){_END}""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_FORMULA = re.compile(
+    rf"""^{_ASK}(?:(?:show|display|write|present|visuali[sz]e|animate|render)\s+)?(?:me\s+)?(?:the\s+)?
+    (?P<name>.+?){_END}""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_SEQUENCE_FORMULA = re.compile(r"^(?:(?:the\s+)?sequence\s+)?(?:a_?n|a\(n\)|f\(n\))\s*=\s*(?P<expr>.+)$")
+_POWERS = re.compile(r"^(?:powers|multiples)\s+of\s+(\d+)$")
+
+_NUMBER_WORDS = {
+    word: value for value, word in enumerate(
+        ("one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve"),
+        start=1,
+    )
+}
+
+
+def _bounds(match: re.Match) -> Optional[tuple[Expression, Expression]]:
+    lo, hi = match.group("a") or match.group("lo"), match.group("b") or match.group("hi")
+    if lo is None:
+        return None
+    lo, hi = _constant(lo), _constant(hi)
+    if lo() >= hi():
+        raise ValueError("range is empty")
+    return lo, hi
+
+
+def _function(match: re.Match) -> Expression:
+    function = Expression(match.group("expr"))
+    if not function.depends:
+        raise ValueError("expression does not depend on x")
+    return function
+
+
+def _match_plot(prompt: str) -> Optional[TemplateMatch]:
+    match = _PLOT.match(prompt)
+    if not match:
+        return None
+    function = _function(match)
+    bounds = _bounds(match)
+    domains = [(bounds[0](), bounds[1]())] if bounds else DEFAULT_DOMAINS
+    for lo, hi in domains:
+        values = _sample(function, lo, hi)
+        if values is not None:
+            break
+    else:
+        return None
+    code = _PLOT_SCENE.format(
+        x_range=_axis_range(lo, hi),
+        y_range=_axis_range(min(values + [0.0]), max(values + [0.0]), pad=0.1),
+        label=f"y = {function.latex}",
+        function=function.source,
+        plot_range=_plot_range(lo, hi),
+    )
+    return TemplateMatch("plot", {"function": function.source, "range": [lo, hi]}, code, animations=2)
+
+
+def _match_area(prompt: str) -> Optional[TemplateMatch]:
+    match = _AREA.match(prompt) or _INTEGRAL.match(prompt)
+    if not match:
+        return None
+    function = _function(match)
+    bounds = _bounds(match) or (_constant(str(DEFAULT_AREA[0])), _constant(str(DEFAULT_AREA[1])))
+    a, b = bounds[0](), bounds[1]()
+    values = _sample(function, a, b)
+    if values is None:
+        return None
+    # Trapezoid rule over the samples; plenty for a label rounded to 4 digits
+    integral = (b - a) / _SAMPLES * (sum(values) - (values[0] + values[-1]) / 2)
+    # Show some of the curve on either side of the shaded region when it is defined there
+    pad = (b - a) / 4
+    wider = _sample(function, a - pad, b + pad)
+    lo, hi, shown = (a - pad, b + pad, wider) if wider is not None else (a, b, values)
+    integrand = rf"\left({function.latex}\right)" if function.precedence < 2 else function.latex
+    code = _AREA_SCENE.format(
+        x_range=_axis_range(lo, hi),
+        y_range=_axis_range(min(shown + [0.0]), max(shown + [0.0]), pad=0.1),
+        label=rf"\int_{{{bounds[0].latex}}}^{{{bounds[1].latex}}} {integrand} \, dx \approx {integral:.4g}",
+        function=function.source,
+        plot_range=_plot_range(lo, hi),
+        area_range=[round(a, 6), round(b, 6)],
+    )
+    return TemplateMatch("area", {"function": function.source, "range": [a, b]}, code, animations=3)
+
+
+_FORMULAS = {
+    "pythagorean_theorem": (
+        "Pythagorean theorem", "a^2 + b^2 = c^2",
+        ("pythagorean theorem", "pythagoras theorem", "pythagoras' theorem", "pythagorean formula"),
+    ),
+    "quadratic_formula": (
+        "Quadratic formula", r"x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}",
+        ("quadratic formula",),
+    ),
+    "euler_identity": (
+        "Euler's identity", r"e^{i\pi} + 1 = 0",
+        ("euler's identity", "eulers identity", "euler identity"),
+    ),
+    "euler_formula": (
+        "Euler's formula", r"e^{i\theta} = \cos\theta + i\sin\theta",
+        ("euler's formula", "eulers formula", "euler formula"),
+    ),
+    "circle_area": (
+        "Area of a circle", r"A = \pi r^2",
+        ("area of a circle", "area of circle", "circle area"),
+    ),
+    "circle_circumference": (
+        "Circumference of a circle", r"C = 2\pi r",
+        ("circumference of a circle", "circumference of circle", "circle circumference"),
+    ),
+    "mass_energy": (
+        "Mass-energy equivalence", "E = mc^2",
+        ("e=mc^2", "e = mc^2", "e=mc2", "mass-energy equivalence", "mass energy equivalence"),
+    ),
+    "newton_second_law": (
+        "Newton's second law", "F = ma",
+        ("newton's second law", "newtons second law", "f=ma", "f = ma"),
+    ),
+    "binomial_theorem": (
+        "Binomial theorem", r"(a + b)^n = \sum_{k=0}^{n} \binom{n}{k} a^{n-k} b^k",
+        ("binomial theorem",),
+    ),
+    "derivative_definition": (
+        "Definition of the derivative", r"f'(x) = \lim_{h \to 0} \frac{f(x + h) - f(x)}{h}",
+        ("definition of the derivative", "derivative definition", "limit definition of the derivative"),
+    ),
+    "fundamental_theorem": (
+        "Fundamental theorem of calculus", r"\int_a^b f(x)\,dx = F(b) - F(a)",
+        ("fundamental theorem of calculus",),
+    ),
+    "law_of_cosines": (
+        "Law of cosines", r"c^2 = a^2 + b^2 - 2ab\cos\gamma",
+        ("law of cosines", "cosine rule"),
+    ),
+    "distance_formula": (
+        "Distance formula", r"d = \sqrt{(x_2 - x_1)^2 + (y_2 - y_1)^2}",
+        ("distance formula",),
+    ),
+    "slope_formula": (
+        "Slope formula", r"m = \frac{y_2 - y_1}{x_2 - x_1}",
+        ("slope formula",),
+    ),
+    "geometric_series": (
+        "Sum of a geometric series", r"\sum_{k=0}^{\infty} ar^k = \frac{a}{1 - r}, \quad |r| < 1",
+        ("sum of a geometric series", "geometric series", "geometric series formula"),
+    ),
+}
+_FORMULA_ALIASES = {alias: key for key, (_, _, aliases) in _FORMULAS.items() for alias in aliases}
+
+
+def _match_formula(prompt: str) -> Optional[TemplateMatch]:
+    match = _FORMULA.match(prompt.replace("’", "'"))
+    if not match:
+        return None
+    name = re.sub(r"\s+", " ", match.group("name").lower())
+    key = _FORMULA_ALIASES.get(name) or _FORMULA_ALIASES.get(re.sub(r" (formula|equation)$", "", name))
+    if key is None:
+        return None
+    title, latex, _ = _FORMULAS[key]
+    code = _FORMULA_SCENE.format(title=title, latex=latex)
+    return TemplateMatch("formula", {"formula": key}, code, animations=2)
+
+
+def _fibonacci(count: int) -> list[int]:
+    terms = [0, 1]
+    while len(terms) < count:
+        terms.append(terms[-1] + terms[-2])
+    return terms[:count]
+
+
+def _primes(count: int) -> list[int]:
+    primes = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+_SEQUENCES: dict[str, tuple[str, Callable[[int], list[int]]]] = {
+    "fibonacci": ("Fibonacci sequence", _fibonacci),
+    "prime": ("Prime numbers", _primes),
+    "square": ("Square numbers", lambda n: [k * k for k in range(1, n + 1)]),
+    "cube": ("Cube numbers", lambda n: [k ** 3 for k in range(1, n + 1)]),
+    "triangular": ("Triangular numbers", lambda n: [k * (k + 1) // 2 for k in range(1, n + 1)]),
+    "even": ("Even numbers", lambda n: [2 * k for k in range(1, n + 1)]),
+    "odd": ("Odd numbers", lambda n: [2 * k - 1 for k in range(1, n + 1)]),
+    "natural": ("Natural numbers", lambda n: list(range(1, n + 1))),
+}
+
+
+def _named_sequence(name: str, count: int) -> Optional[tuple[str, str, list[str]]]:
+    """(params key, title code, terms) for a named sequence, or None."""
+    name = re.sub(r"\s+(sequence|series|numbers|terms)$", "", name)
+    powers = _POWERS.match(name)
+    if powers:
+        base = int(powers.group(1))
+        if name.startswith("powers"):
+            if base > 10:
+                return None
+            terms = [base ** k for k in range(count)]
+        else:
+            terms = [base * k for k in range(1, count + 1)]
+        title = name[0].upper() + name[1:]
+        return name, f"Text({title!r}, font_size=40)", [str(term) for term in terms]
+    name = re.sub(r"s$", "", name)
+    if name not in _SEQUENCES:
+        return None
+    title, generate = _SEQUENCES[name]
+    return name, f"Text({title!r}, font_size=40)", [str(term) for term in generate(count)]
+
+
+def _formula_sequence(text: str, count: int) -> Optional[tuple[str, str, list[str]]]:
+    match = _SEQUENCE_FORMULA.match(text)
+    if not match:
+        return None
+    term = Expression(match.group("expr"), variable="n")
+    values = [term(n) for n in range(1, count + 1)]
+    if not term.depends or any(value is None or abs(value) > _MAX_MAGNITUDE for value in values):
+        return None
+    return term.source, f"MathTex({'a_n = ' + term.latex!r}, font_size=44)", [_format_number(v) for v in values]
+
+
+def _match_sequence(prompt: str) -> Optional[TemplateMatch]:
+    match = _SEQUENCE.match(prompt)
+    if not match:
+        return None
+    count = match.group("count").lower()
+    count = int(count) if count.isdigit() else _NUMBER_WORDS.get(count)
+    if not count or count > SEQUENCE_MAX_TERMS:
+        return None
+    name = re.sub(r"\s+", " ", match.group("name").lower())
+    found = _named_sequence(name, count) or _formula_sequence(name, count)
+    if found is None:
+        return None
+    key, title, terms = found
+    code = _SEQUENCE_SCENE.format(title=title, terms=terms)
+    return TemplateMatch("sequence", {"sequence": key, "count": count}, code, animations=2)
+
+
+_MATCHERS = (_match_sequence, _match_area, _match_plot, _match_formula)
+
+
+def match_template(prompt: str) -> Optional[TemplateMatch]:
+    """Return a built-in scene for the prompt, or None if it needs the LLM."""
+    prompt = prompt.strip()
+    if len(prompt) > 200:
+        return None
+    for matcher in _MATCHERS:
+        try:
+            match = matcher(prompt)
+        except ValueError:
+            match = None
+        if match is not None:
+            return match
+    return None
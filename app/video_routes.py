@@ -0,0 +1,123 @@
+import os
+import re
+from typing import Optional
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from app.artifact_store import MEDIA_TYPES, artifact_store
+from app.config import VIDEO_ACCEL_REDIRECT
+
+router = APIRouter(
+    prefix="/videos",
+    tags=['Videos']
+)
+
+# Artifact names are content hashes, so a name's bytes never change
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 256 * 1024
+
+_ARTIFACT_NAME = re.compile(r"^[0-9a-f]{32}\.[a-z0-9]+$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Return the inclusive (start, end) of a single byte range, or None when it can't be satisfied.
+
+    Raises ValueError for headers we don't handle (multiple ranges, other units),
+    which are answered with the whole file as RFC 9110 allows.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        raise ValueError(header)
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(header)
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        raise ValueError(header)
+    if start >= size:
+        return None
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def _file_range(path: str, start: int, end: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"])
+async def get_video(filename: str, request: Request):
+    if not _ARTIFACT_NAME.match(filename):
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    path = artifact_store.path(filename)
+    if path is None:
+        # Remote backend: the object store serves the bytes
+        return RedirectResponse(artifact_store.url(filename), status_code=307)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    etag = f'"{filename.split(".")[0]}"'
+    media_type = MEDIA_TYPES.get(os.path.splitext(filename)[1], "application/octet-stream")
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() != etag:
+        range_header = None  # the client's partial copy is of something else; send it all
+
+    if not range_header or range_header.replace(" ", "").startswith("bytes=0-"):
+        # Seeking sends lots of ranged requests; only whole-file reads count as an access
+        await anyio.to_thread.run_sync(artifact_store.touch, filename)
+
+    if VIDEO_ACCEL_REDIRECT:
+        # nginx takes over: it handles Range itself and sends the file with sendfile()
+        headers["X-Accel-Redirect"] = VIDEO_ACCEL_REDIRECT.rstrip("/") + "/" + filename
+        return Response(media_type=media_type, headers=headers)
+
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            byte_range = ()  # unsupported range form: fall through to the whole file
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{stat.st_size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            if request.method == "HEAD":
+                return Response(status_code=206, media_type=media_type, headers=headers)
+            return StreamingResponse(_file_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+    # Whole file: FileResponse streams it in chunks read by Python; only VIDEO_ACCEL_REDIRECT is zero-copy
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
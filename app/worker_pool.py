@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STARTUP_TIMEOUT = 120
+# How long a render waits for a busy or still-starting pool before it is rendered cold instead
+ACQUIRE_TIMEOUT = 30
+
+
+class WorkerTimeout(Exception):
+    pass
+
+
+class WorkerUnavailable(Exception):
+    """No warm worker could be had in time; the render never started."""
+
+
+class WorkerCrashed(Exception):
+    def __init__(self, message: str = "", returncode: Optional[int] = None):
+        super().__init__(message)
+        self.returncode = returncode
+
+
+class RenderWorker:
+    """One pre-imported `app.render_worker` process and the thread reading its replies."""
+
+    def __init__(self, on_spawn: Optional[Callable[[int], None]] = None):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "app.render_worker"],
+            cwd=ROOT_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        if on_spawn is not None:
+            on_spawn(self.proc.pid)
+        self.jobs = 0
+        self.rss_mb = 0.0
+        self.recycle = False
+        self._replies: queue.Queue = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+        try:
+            ready = self._next(STARTUP_TIMEOUT)
+        except (WorkerTimeout, WorkerCrashed) as e:
+            self.kill()
+            raise WorkerCrashed(f"Render worker failed to start: {e or 'timed out'}")
+        if not ready.get("ready"):
+            self.kill()
+            raise WorkerCrashed(f"Render worker failed to start: {ready.get('error', '').strip()}")
+        if not ready.get("renice", True):
+            logging.warning(
+                "Render worker %d may not lower its niceness (no CAP_SYS_NICE); batch jobs run at its own level",
+                self.proc.pid,
+            )
+
+    def _read(self):
+        for line in self.proc.stdout:
+            try:
+                self._replies.put(json.loads(line))
+            except ValueError:
+                logging.warning("Ignoring malformed render worker output: %s", line[:200])
+        self._replies.put(None)
+
+    def _next(self, timeout: float) -> dict:
+        try:
+            message = self._replies.get(timeout=timeout)
+        except queue.Empty:
+            raise WorkerTimeout()
+        if message is None:
+            code = self.proc.wait()
+            raise WorkerCrashed(f"render worker exited unexpectedly (exit code {code})", code)
+        return message
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def render(self, request: dict, timeout: float, on_progress: Optional[Callable[..., None]] = None) -> dict:
+        self.jobs += 1
+        self.proc.stdin.write(json.dumps(request) + "\n")
+        self.proc.stdin.flush()
+        deadline = time.monotonic() + timeout
+        while True:
+            reply = self._next(max(deadline - time.monotonic(), 0))
+            if "progress" not in reply:
+                break
+            if on_progress is not None:
+                progress = dict(reply["progress"])
+                on_progress(progress.pop("phase"), **progress)
+        self.rss_mb = reply.get("rss_mb", self.rss_mb)
+        self.recycle = reply.get("recycle", False)
+        return reply
+
+    def kill(self):
+        if self.alive:
+            self.proc.kill()
+        self.proc.wait()
+
+
+class WorkerPool:
+    """Pool of warm render workers, recycled after `max_jobs` renders or `max_rss_mb` of memory.
+
+    `on_spawn(pid)` is called with every new worker's pid as soon as it starts, e.g. to set rlimits.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs: int = 50,
+        max_rss_mb: int = 2048,
+        on_spawn: Optional[Callable[[int], None]] = None,
+    ):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.on_spawn = on_spawn
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._spawned = 0
+        self._stopped = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self):
+        """Warm up the whole pool in the background so the first requests don't pay for it."""
+        for _ in range(self.size):
+            threading.Thread(target=self._spawn_idle, daemon=True).start()
+
+    def stop(self):
+        self._stopped = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.kill()
+
+    def _spawn_idle(self):
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            logging.warning("Could not start render worker: %s", e)
+            return
+        if worker is None:
+            return
+        if self._stopped:
+            worker.kill()
+        else:
+            self._idle.put(worker)
+
+    def _spawn(self) -> Optional[RenderWorker]:
+        """Start a worker if the pool has room; returns None when it is already full."""
+        with self._lock:
+            if self._spawned >= self.size:
+                return None
+            self._spawned += 1
+        try:
+            return RenderWorker(self.on_spawn)
+        except Exception:
+            with self._lock:
+                self._spawned -= 1
+            raise
+
+    def _acquire(self) -> RenderWorker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            raise WorkerUnavailable(str(e))
+        if worker is not None:
+            return worker
+        try:
+            # Bounded: background respawns that keep failing never put a worker here
+            return self._idle.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise WorkerUnavailable(f"no render worker became idle within {ACQUIRE_TIMEOUT}s")
+
+    def _retire(self, worker: RenderWorker):
+        worker.kill()
+        with self._lock:
+            self._spawned -= 1
+        if not self._stopped:
+            threading.Thread(target=self._spawn_idle, daemon=True).start()
+
+    def _release(self, worker: RenderWorker):
+        if not worker.alive or worker.recycle or worker.jobs >= self.max_jobs or worker.rss_mb >= self.max_rss_mb:
+            logging.info("Recycling render worker after %d jobs (%.0f MB)", worker.jobs, worker.rss_mb)
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+    def render(self, request: dict, timeout: float, on_progress: Optional[Callable[..., None]] = None) -> dict:
+        """Run one render request on a warm worker; raises WorkerUnavailable/WorkerTimeout/WorkerCrashed."""
+        worker = self._acquire()
+        try:
+            reply = worker.render(request, timeout, on_progress)
+        except (WorkerTimeout, WorkerCrashed, OSError):
+            # Same contract as the cold path: a timed-out or crashed render takes its process with it
+            self._retire(worker)
+            raise
+        self._release(worker)
+        return reply
@@ -0,0 +1,152 @@
+"""Concurrent-request throughput through the FastAPI app, with the LLM served by the offline stub.
+
+Starts the stub OpenAI server and the app (uvicorn, in-process) and pushes
+`--requests` prompts through POST /generate/ (or one POST /generate/batch)
+from `--concurrency` clients, polling each job until it finishes. Reports
+submit latency, time to a finished video, throughput and the per-phase means
+from /metrics. Rendering is real, so Manim must be installed. Videos, the render,
+glyph and LLM caches and the artifact index live in a temporary directory for
+the run, so each run starts cold and the live generate/ and cache/ are untouched.
+
+    python -m benchmarks.bench_api --requests 20 --concurrency 5 --llm-latency 1 --output api.json
+"""
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import time
+from benchmarks.common import load_corpus, summarize, write_results
+from benchmarks.stub_openai import StubOpenAI
+
+_PHASE_LINE = re.compile(r'^manimate_phase_seconds_(sum|count)\{phase="(\w+)"\} (\S+)$', re.MULTILINE)
+
+
+def phase_means(metrics_text: str) -> dict:
+    totals: dict[str, dict[str, float]] = {}
+    for kind, phase, value in _PHASE_LINE.findall(metrics_text):
+        totals.setdefault(phase, {})[kind] = float(value)
+    return {
+        phase: {"count": int(t.get("count", 0)), "mean_ms": t["sum"] / t["count"] * 1000}
+        for phase, t in totals.items()
+        if t.get("count")
+    }
+
+
+async def wait_for_job(client, job_id: str, poll: float) -> dict:
+    while True:
+        response = await client.get(f"/generate/{job_id}")
+        job = response.json()
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(poll)
+
+
+async def run(args) -> dict:
+    import httpx
+    import uvicorn
+    from app.main import app
+
+    prompts = [entry.prompt for entry in load_corpus(args.category)]
+    prompts = [f"{prompts[i % len(prompts)]} (variant {i})" if args.unique else prompts[i % len(prompts)]
+               for i in range(args.requests)]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    submit_samples, done_samples, statuses = [], [], {}
+    slots = asyncio.Semaphore(args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+
+            async def one(prompt: str):
+                async with slots:
+                    t0 = time.perf_counter()
+                    response = await client.post("/generate/", json={"prompt": prompt})
+                    submit_samples.append(time.perf_counter() - t0)
+                    if response.status_code != 202:
+                        statuses[f"http_{response.status_code}"] = statuses.get(f"http_{response.status_code}", 0) + 1
+                        return
+                    job = await wait_for_job(client, response.json()["job_id"], args.poll)
+                    done_samples.append(time.perf_counter() - t0)
+                    statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+
+            async def batch():
+                t0 = time.perf_counter()
+                response = await client.post("/generate/batch", json={"items": [{"prompt": p} for p in prompts]})
+                submit_samples.append(time.perf_counter() - t0)
+                response.raise_for_status()
+                job_ids = dict.fromkeys(item["job_id"] for item in response.json()["items"])
+
+                async def finish(job_id):
+                    job = await wait_for_job(client, job_id, args.poll)
+                    done_samples.append(time.perf_counter() - t0)
+                    statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+
+                await asyncio.gather(*(finish(job_id) for job_id in job_ids))
+
+            started = time.perf_counter()
+            if args.batch:
+                await batch()
+            else:
+                await asyncio.gather(*(one(prompt) for prompt in prompts))
+            elapsed = time.perf_counter() - started
+            metrics_text = (await client.get("/metrics")).text
+    finally:
+        server.should_exit = True
+        await serving
+
+    finished = sum(count for status, count in statuses.items() if status in ("done", "failed"))
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "mode": "batch" if args.batch else "single",
+        "elapsed_s": elapsed,
+        "jobs_per_minute": finished / elapsed * 60 if elapsed else 0.0,
+        "statuses": statuses,
+        "submit": summarize(submit_samples),
+        "time_to_video": summarize(done_samples),
+        "phases": phase_means(metrics_text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API end to end against the stub LLM")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--batch", action="store_true", help="submit everything as one /generate/batch")
+    parser.add_argument("--unique", action="store_true", help="make every prompt distinct (defeats the caches)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM takes per call")
+    parser.add_argument("--category", action="append", help="only use prompts from these corpus categories")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--poll", type=float, default=0.2)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    stub = StubOpenAI(latency=args.llm_latency)
+    base_url = stub.start()
+    # Must be set before app.config is imported (inside run())
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["RATE_LIMIT_MAX_REQUESTS"] = str(10 ** 9)
+    os.environ.setdefault("RENDER_QUEUE_SIZE", str(max(args.requests, 20)))
+    # A fresh artifact store and caches per run: the live ones would be polluted, and their warm
+    # entries would make later runs look faster
+    data_dir = tempfile.mkdtemp(prefix="manimate-bench-")
+    os.environ["GENERATE_DIR"] = os.path.join(data_dir, "generate")
+    os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+    os.environ["LLM_CACHE_DB"] = os.path.join(data_dir, "llm.sqlite3")
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        stub.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    results["llm_calls"] = stub.requests
+    write_results("api", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Throughput of the post-processing that get_manim_code applies to every completion.
+
+Runs extract_code, the AST transform pipeline and the cost estimator over
+each recorded completion, without any network or rendering.
+
+    python -m benchmarks.bench_postprocess --iterations 200 --output post.json
+"""
+import argparse
+import time
+from benchmarks.common import load_corpus, summarize, write_results
+from app.code_transforms import default_pipeline, extract_code
+from app.cost_estimator import estimate_cost
+
+
+def postprocess(completion: str):
+    result = default_pipeline.run(extract_code(completion))
+    return estimate_cost(result.code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark completion post-processing")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--category", action="append", help="only run these corpus categories")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    entries = load_corpus(args.category)
+    per_entry = {}
+    all_samples = []
+    started = time.perf_counter()
+    for entry in entries:
+        samples = []
+        outcome = "ok"
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            try:
+                estimate = postprocess(entry.completion)
+                outcome = "rejected" if estimate.rejected else "ok"
+            except Exception as e:
+                outcome = f"error: {str(e).split(':', 1)[0]}"
+            samples.append(time.perf_counter() - t0)
+        all_samples.extend(samples)
+        per_entry[entry.name] = {"category": entry.category, "outcome": outcome, **summarize(samples)}
+    elapsed = time.perf_counter() - started
+
+    write_results("postprocess", {
+        "iterations": args.iterations,
+        "completions_per_second": len(all_samples) / elapsed if elapsed else 0.0,
+        "overall": summarize(all_samples),
+        "entries": per_entry,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""End-to-end run_manim latency per corpus scene and quality level.
+
+Needs Manim (and LaTeX for the MathTex scenes) installed. The render cache is
+off unless --render-cache is passed, so every sample is a real render; the
+glyph cache and warm workers follow the usual env settings (GLYPH_CACHE_ENABLED,
+WARM_WORKERS), which is how their effect can be compared. Rendered artifacts
+go to a temporary artifact store, never the live generate/ directory, whose
+content-hashed names may be shared with real jobs; it is removed afterwards.
+
+    python -m benchmarks.bench_render --quality l --quality m --repeat 3 --output render.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from benchmarks.common import load_corpus, summarize, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Manim rendering of the recorded corpus")
+    parser.add_argument("--quality", action="append", choices=["l", "m", "h"], help="default: l, m and h")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--category", action="append", help="only run these corpus categories")
+    parser.add_argument("--render-cache", action="store_true", help="leave the render cache on")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    if not args.render_cache:
+        os.environ["RENDER_CACHE_ENABLED"] = "false"
+    # Imported late so the env overrides above reach app.config
+    from app import manim_runner
+    from app.artifact_store import ArtifactStore, LocalBackend
+    from app.code_transforms import default_pipeline, extract_code
+    from app.manim_runner import render_pool, run_manim
+
+    artifact_dir = tempfile.mkdtemp(prefix="manimate-bench-")
+    # No sweeper runs here, so the retention limits never apply
+    artifact_store = ArtifactStore(
+        LocalBackend(artifact_dir),
+        os.path.join(artifact_dir, "index.sqlite3"),
+        max_bytes=0,
+        max_age_seconds=0,
+    )
+    manim_runner.artifact_store = artifact_store
+
+    qualities = args.quality or ["l", "m", "h"]
+    results = {}
+    try:
+        for entry in load_corpus(args.category):
+            try:
+                code = default_pipeline.run(extract_code(entry.completion)).code
+            except Exception as e:
+                results[entry.name] = {"category": entry.category, "skipped": str(e).split(":", 1)[0]}
+                continue
+            per_quality = {}
+            for quality in qualities:
+                samples = []
+                errors = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    try:
+                        name = run_manim(code, quality=quality)
+                    except Exception as e:
+                        errors.append(str(e).splitlines()[0][:200])
+                        continue
+                    samples.append(time.perf_counter() - t0)
+                    artifact_store.delete(name)
+                per_quality[quality] = {**summarize(samples), "errors": errors}
+            results[entry.name] = {"category": entry.category, "qualities": per_quality}
+    finally:
+        render_pool.stop()
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+
+    write_results("render", {
+        "repeat": args.repeat,
+        "warm_workers": render_pool.size,
+        "render_cache": args.render_cache,
+        "entries": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Shared helpers for the benchmark scripts: the recorded corpus, timing stats and JSON results."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+@dataclass
+class CorpusEntry:
+    name: str
+    category: str
+    prompt: str
+    completion: str
+
+
+def load_corpus(categories: Optional[list[str]] = None) -> list[CorpusEntry]:
+    """Read corpus/<category>_<name>.txt files: a "Prompt: ..." line, a blank line, then the raw completion."""
+    entries = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+            header, _, completion = f.read().partition("\n\n")
+        name = filename[:-4]
+        category = name.split("_", 1)[0]
+        if categories and category not in categories:
+            continue
+        entries.append(CorpusEntry(name, category, header.removeprefix("Prompt:").strip(), completion.strip()))
+    return entries
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(benchmark: str, results: dict, output: Optional[str] = None):
+    """Print the results as JSON (and save them to `output`), tagged with enough context to compare runs."""
+    document = {
+        "benchmark": benchmark,
+        "timestamp": time.time(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
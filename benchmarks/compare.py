@@ -0,0 +1,80 @@
+"""Compare two benchmark result files and flag regressions.
+
+Latencies (`*_ms`, except the outlier-prone `max_ms`) are better when lower,
+throughputs (`*_per_second`, `*_per_minute`) when higher. Exits with status 1
+if anything regressed by more than --threshold percent.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+
+def _flatten(node, prefix: str = "") -> dict[str, float]:
+    values = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            values.update(_flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        values[prefix] = float(node)
+    return values
+
+
+def _direction(path: str) -> int:
+    """+1 when higher is better, -1 when lower is better, 0 for values we don't judge."""
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.endswith(("_per_second", "_per_minute")):
+        return 1
+    if leaf.endswith("_ms") and leaf != "max_ms":  # a single outlier isn't a regression
+        return -1
+    return 0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[dict]:
+    before = _flatten(baseline["results"])
+    after = _flatten(candidate["results"])
+    rows = []
+    for path in sorted(before.keys() & after.keys()):
+        direction = _direction(path)
+        if not direction or before[path] == 0:
+            continue
+        change = (after[path] - before[path]) / before[path] * 100
+        rows.append({
+            "metric": path,
+            "baseline": before[path],
+            "candidate": after[path],
+            "change_pct": change,
+            "regression": change * direction < -threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        sys.exit(f"Cannot compare a {baseline.get('benchmark')} run with a {candidate.get('benchmark')} run")
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(json.dumps({
+        "baseline": baseline.get("commit"),
+        "candidate": candidate.get("commit"),
+        "threshold_pct": args.threshold,
+        "regressions": [row for row in rows if row["regression"]],
+        "metrics": rows,
+    }, indent=2))
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Offline stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions from the recorded corpus: the last user
+message is looked up by prompt, and unknown prompts get the corpus entry
+picked by a hash of the prompt, so arbitrary load-test prompts still get
+realistic code. Supports `stream=true` (SSE chunks) and an artificial
+latency so LLM-bound behaviour can be simulated.
+
+    python -m benchmarks.stub_openai --port 8765 --latency 1.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.common import load_corpus
+
+
+class StubOpenAI:
+    def __init__(self, latency: float = 0.0, chunk_chars: int = 16, categories=None):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.entries = load_corpus(categories)
+        self.by_prompt = {entry.prompt: entry.completion for entry in self.entries}
+        self.requests = 0
+        self._server = None
+
+    def completion_for(self, prompt: str) -> str:
+        if prompt in self.by_prompt:
+            return self.by_prompt[prompt]
+        index = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % len(self.entries)
+        return self.entries[index].completion
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread; returns the base URL to use as OPENAI_BASE_URL."""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/v1"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub.requests += 1
+                prompt = next(
+                    (m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), ""
+                )
+                # Repair requests end with the error report; answer them with the original prompt's code
+                if len(body.get("messages", [])) > 2:
+                    prompt = body["messages"][1]["content"]
+                completion = stub.completion_for(prompt)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if body.get("stream"):
+                    self._stream(body.get("model", "stub"), completion)
+                else:
+                    self._complete(body.get("model", "stub"), body.get("messages", []), completion)
+
+            def _complete(self, model, messages, completion):
+                prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+                completion_tokens = len(completion) // 4
+                payload = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": completion},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, model, completion):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+                try:
+                    for start in range(0, len(completion), stub.chunk_chars):
+                        self._event(chunk_id, model, {"content": completion[start:start + stub.chunk_chars]}, None)
+                    self._event(chunk_id, model, {}, "stop")
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client hung up early, as it does on unusable output
+                self.close_connection = True
+
+            def _event(self, chunk_id, model, delta, finish_reason):
+                chunk = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    args = parser.parse_args()
+
+    stub = StubOpenAI(latency=args.latency)
+    url = stub.start(args.host, args.port)
+    print(f"Stub OpenAI API on {url} ({len(stub.entries)} recorded completions)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
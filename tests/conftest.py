@@ -0,0 +1,4 @@
+import os
+
+# app.llm_handler builds its AsyncOpenAI client at import; tests never reach the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
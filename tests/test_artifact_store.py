@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from app.artifact_store import ArtifactBackend, ArtifactStore, S3Backend
+
+
+class FakeS3:
+    """Stands in for a boto3 S3 client, keeping objects in a dict."""
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], tuple[bytes, dict]] = {}
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None):
+        with open(filename, "rb") as f:
+            self.objects[(bucket, key)] = (f.read(), ExtraArgs or {})
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?op={operation}&expires={ExpiresIn}"
+
+
+def write_file(path, data=b"video bytes"):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ArtifactBackend()
+
+
+def test_s3_put_uploads_with_content_type_and_removes_local_file(tmp_path):
+    client = FakeS3()
+    backend = S3Backend(client, "renders", prefix="videos/")
+    src = write_file(tmp_path / "render.mp4")
+
+    backend.put("abc.mp4", src)
+
+    data, extra = client.objects[("renders", "videos/abc.mp4")]
+    assert data == b"video bytes"
+    assert extra == {"ContentType": "video/mp4"}
+    assert not os.path.exists(src)
+    assert backend.path("abc.mp4") is None
+
+
+def test_s3_delete_removes_object():
+    client = FakeS3()
+    client.objects[("renders", "videos/abc.mp4")] = (b"", {})
+
+    S3Backend(client, "renders", prefix="videos/").delete("abc.mp4")
+
+    assert client.objects == {}
+
+
+def test_s3_url_is_presigned_unless_public_url_is_set():
+    client = FakeS3()
+
+    presigned = S3Backend(client, "renders", prefix="videos/").url("abc.mp4")
+    assert presigned == f"https://s3.test/renders/videos/abc.mp4?op=get_object&expires={S3Backend.PRESIGNED_TTL}"
+
+    public = S3Backend(client, "renders", prefix="videos/", public_url="https://cdn.test/").url("abc.mp4")
+    assert public == "https://cdn.test/videos/abc.mp4"
+
+
+def test_store_on_s3_puts_and_sweeps(tmp_path):
+    client = FakeS3()
+    store = ArtifactStore(S3Backend(client, "renders"), str(tmp_path / "index.sqlite3"), 10**9, max_age_seconds=0)
+
+    name = store.put(write_file(tmp_path / "render.mp4"), ".mp4", prompt="draw a circle")
+
+    assert ("renders", name) in client.objects
+    assert store.get(name).size == len(b"video bytes")
+    assert store.sweep() == 1
+    assert client.objects == {}
+    assert store.get(name) is None
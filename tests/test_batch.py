@@ -0,0 +1,125 @@
+import asyncio
+
+from app.batch import BatchRunner
+from app.job_queue import Job, JobQueue
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Generator:
+    """LLM stand-in that counts concurrent calls and holds them until released."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, prompt: str) -> str:
+        self.calls.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await self.release.wait()
+            return f"code for {prompt}"
+        finally:
+            self.active -= 1
+
+
+async def render(job: Job) -> str:
+    """Worker handler: collects the prefetched code like process_job does."""
+    code = job.code if job.llm_task is None else await job.llm_task
+    return f"/videos/{code}.mp4"
+
+
+async def settle(batch, timeout: float = 1):
+    async def wait():
+        while not batch.finished:
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(wait(), timeout)
+
+
+def test_items_get_job_handles_and_the_batch_reports_its_status():
+    async def scenario():
+        queue = JobQueue(render, max_queue=10)
+        await queue.start()
+        generate = Generator()
+        runner = BatchRunner(queue, generate)
+        circle, square = Job(prompt="circle"), Job(prompt="square")
+        # Duplicate items share a job
+        batch = runner.submit([circle, square], [circle.id, square.id, circle.id])
+
+        tracked = [queue.get(job_id) for job_id in batch.item_job_ids]
+        before = (batch.status, batch.counts())
+        generate.release.set()
+        await settle(batch)
+        await queue.stop()
+        return runner, batch, tracked, before
+
+    runner, batch, tracked, before = run(scenario())
+    circle, square = batch.jobs
+    assert tracked == [circle, square, circle]
+    assert all(job.batch_id == batch.id and job.priority == "batch" for job in batch.jobs)
+    assert runner.get(batch.id) is batch
+    assert before == ("queued", {"queued": 2})
+    assert (batch.status, batch.counts()) == ("done", {"done": 2})
+    assert circle.video_url == "/videos/code for circle.mp4"
+
+
+def test_status_is_running_once_any_job_moves():
+    async def scenario():
+        queue = JobQueue(render, max_queue=10)
+        await queue.start()
+        generate = Generator()
+        batch = BatchRunner(queue, generate).submit([Job(prompt="a"), Job(prompt="b", code="b")], [])
+        while batch.counts().get("done") != 1:
+            await asyncio.sleep(0.001)
+        status = batch.status
+        generate.release.set()
+        await settle(batch)
+        await queue.stop()
+        return status, generate.calls
+
+    status, calls = run(scenario())
+    assert status == "running"
+    # Jobs that already have code skip the LLM
+    assert calls == ["a"]
+
+
+def test_prefetch_respects_the_concurrency_bound():
+    async def scenario():
+        queue = JobQueue(render, max_queue=10)
+        await queue.start()
+        generate = Generator()
+        batch = BatchRunner(queue, generate, concurrency=2).submit([Job(prompt=str(i)) for i in range(5)], [])
+        await asyncio.sleep(0.01)
+        started = len(generate.calls)
+        generate.release.set()
+        await settle(batch)
+        await queue.stop()
+        return started, generate.peak, len(generate.calls)
+
+    started, peak, total = run(scenario())
+    assert (started, peak, total) == (2, 2, 5)
+
+
+def test_stop_cancels_pending_llm_calls():
+    async def scenario():
+        queue = JobQueue(render, max_queue=10)
+        await queue.start()
+        generate = Generator()
+        runner = BatchRunner(queue, generate, concurrency=1)
+        batch = runner.submit([Job(prompt="a"), Job(prompt="b")], [])
+        await asyncio.sleep(0.01)
+        await runner.stop()
+        await queue.stop()
+        return runner, batch, generate
+
+    runner, batch, generate = run(scenario())
+    first, second = batch.jobs
+    assert first.llm_task.cancelled()
+    # The second job was still waiting for a slot and never called the LLM
+    assert second.llm_task is None and generate.calls == ["a"]
+    assert not runner._tasks
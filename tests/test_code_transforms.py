@@ -0,0 +1,37 @@
+from app.code_transforms import TransformPipeline
+
+SCENE = """from manim import *
+
+
+class GeneratedScene(Scene):
+    def construct(self):
+{body}
+"""
+
+
+def run(body: str):
+    return TransformPipeline().run(SCENE.format(body=body))
+
+
+def test_auto_layout_goes_before_a_lone_wait():
+    result = run("        self.wait()")
+
+    assert "auto_layout" in result.fired
+    assert "__auto_layout__" not in result.code
+    assert result.code.index("_mobs = ") < result.code.index("self.wait()")
+    compile(result.code, "<scene>", "exec")
+
+
+def test_auto_layout_goes_before_the_last_wait():
+    result = run("        self.wait()\n        self.play(FadeIn(Circle()))\n        self.wait(1)")
+
+    code = result.code
+    assert code.index("self.wait()") < code.index("_mobs = ") < code.index("self.wait(1)")
+
+
+def test_auto_layout_is_not_injected_twice():
+    once = run("        self.wait()").code
+    again = TransformPipeline().run(once)
+
+    assert "auto_layout" not in again.fired
+    assert again.code.count("_mobs = ") == 1
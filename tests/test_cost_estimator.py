@@ -0,0 +1,91 @@
+import pytest
+
+from app import cost_estimator
+from app.cost_estimator import estimate_cost
+
+
+def scene(body: str, base: str = "Scene") -> str:
+    lines = "\n".join("        " + line for line in body.strip().splitlines())
+    return f"from manim import *\n\nclass Demo({base}):\n    def construct(self):\n{lines}\n"
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setattr(cost_estimator, "COST_HIGH_QUALITY_SCORE", 8.0)
+    monkeypatch.setattr(cost_estimator, "COST_LOW_QUALITY_SCORE", 40.0)
+    monkeypatch.setattr(cost_estimator, "COST_REJECT_SCORE", 300.0)
+    monkeypatch.setattr(cost_estimator, "COST_TIMEOUT_PER_POINT", 6.0)
+    monkeypatch.setattr(cost_estimator, "RENDER_TIMEOUT_MIN", 120)
+    monkeypatch.setattr(cost_estimator, "RENDER_TIMEOUT_MAX", 600)
+
+
+def test_loops_multiply_their_body():
+    estimate = estimate_cost(scene("""
+for i in range(3):
+    for j in range(2):
+        self.play(FadeIn(Dot()), run_time=2)
+"""))
+    assert estimate.play_count == 6
+    # 12s animated plus 0.5 per play
+    assert estimate.score == 15.0
+
+
+def test_unknown_loops_count_as_short():
+    estimate = estimate_cost(scene("""
+for dot in dots:
+    self.play(FadeIn(dot))
+while False:
+    self.wait()
+"""))
+    assert estimate.play_count == 3
+    assert estimate.score == 4.5 + 3.0
+
+
+def test_three_d_scenes_are_multiplied():
+    code = scene("""
+self.set_camera_orientation(phi=75 * DEGREES)
+self.play(Create(Sphere()))
+""", base="ThreeDScene")
+    estimate = estimate_cost(code)
+    assert "3D scene" in estimate.reasons
+    assert estimate.score == 1.5 * cost_estimator.THREE_D_MULTIPLIER
+
+
+def test_surfaces_add_their_resolution():
+    estimate = estimate_cost(scene("""
+surface = Surface(lambda u, v: np.array([u, v, 0]), resolution=(64, 32))
+self.play(Create(surface))
+""", base="ThreeDScene"))
+    # 1.5 tripled for 3D plus two default surfaces' worth of cells
+    assert estimate.score == 4.5 + 2 * cost_estimator.SURFACE_WEIGHT
+
+
+def test_tex_heavy_scenes():
+    estimate = estimate_cost(scene("""
+terms = [MathTex(f"x^{i}") for i in range(3)]
+for i in range(5):
+    self.add(MathTex(str(i)))
+self.play(Write(Tex("done")))
+"""))
+    assert "7 LaTeX objects" in estimate.reasons
+    assert estimate.score == 1.5 + 7 * cost_estimator.TEX_WEIGHT
+
+
+@pytest.mark.parametrize("seconds, quality", [(8, "h"), (8.5, "m"), (40, "m"), (40.5, "l")])
+def test_quality_thresholds(seconds, quality):
+    assert estimate_cost(scene(f"self.wait({seconds})")).quality == quality
+
+
+def test_timeout_scales_with_score_and_is_capped():
+    assert estimate_cost(scene("self.wait(10)")).timeout == 120 + 60
+    assert estimate_cost(scene("self.wait(100)")).timeout == 600
+
+
+def test_reject_threshold():
+    assert not estimate_cost(scene("self.wait(300)")).rejected
+    assert estimate_cost(scene("self.wait(301)")).rejected
+
+
+def test_unparseable_code_gets_the_longest_timeout():
+    estimate = estimate_cost("class Demo(Scene:\n")
+    assert (estimate.quality, estimate.timeout, estimate.reasons) == ("m", 600, ["unparseable"])
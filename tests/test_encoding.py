@@ -0,0 +1,124 @@
+import signal
+import subprocess
+
+import pytest
+
+from app import manim_runner
+from app.manim_runner import PREVIEW_ENCODING, Encoding, _transcode
+from app.resource_limits import ResourceLimits
+
+
+def test_defaults_leave_manim_alone():
+    assert PREVIEW_ENCODING.manim_flags() == []
+    assert PREVIEW_ENCODING.ffmpeg_args() == []
+    assert not PREVIEW_ENCODING.transcodes
+    assert PREVIEW_ENCODING.ext == ".mp4"
+
+
+def test_manim_flags():
+    encoding = Encoding(format="webm", fps=30, resolution="1280,720")
+    assert encoding.manim_flags() == ["--format", "webm", "--fps", "30", "-r", "1280,720"]
+    assert encoding.ext == ".webm"
+    assert not encoding.transcodes
+
+
+@pytest.mark.parametrize("encoding, args", [
+    (Encoding(codec="libx265"), ["-c:v", "libx265"]),
+    (Encoding(crf="28"), ["-crf", "28"]),
+    (Encoding(preset="veryfast"), ["-preset", "veryfast"]),
+    (Encoding(format="webm", codec="libvpx-vp9", crf="35"), ["-c:v", "libvpx-vp9", "-crf", "35"]),
+])
+def test_ffmpeg_args(encoding, args):
+    assert encoding.transcodes
+    assert encoding.ffmpeg_args() == args
+
+
+def test_gifs_are_never_transcoded():
+    encoding = Encoding(format="gif", codec="libx264", crf="20")
+    assert not encoding.transcodes
+    assert encoding.ffmpeg_args() == []
+
+
+class FakeFfmpeg:
+    """Popen stand-in that records the command and exits with `returncode`."""
+
+    def __init__(self, returncode: int = 0, stderr: str = ""):
+        self.returncode = returncode
+        self.stderr = stderr
+        self.commands = []
+        self.pid = 4242
+        self.limited = []
+
+    def __call__(self, command, **kwargs):
+        self.commands.append(command)
+        return self
+
+    def communicate(self, timeout=None):
+        return "", self.stderr
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    fake = FakeFfmpeg()
+    monkeypatch.setattr(manim_runner, "FFMPEG_BINARY", "ffmpeg")
+    monkeypatch.setattr(manim_runner.subprocess, "Popen", fake)
+    # Record the limits instead of applying them to whatever process has the fake pid
+    monkeypatch.setattr(ResourceLimits, "apply_to", lambda limits, pid: fake.limited.append((limits, pid)))
+    return fake
+
+
+def test_transcode_command_for_mp4(ffmpeg):
+    dest = _transcode("/tmp/job/GeneratedScene.mp4", Encoding(codec="libx264", crf="23", preset="slow"), 60, ResourceLimits())
+    assert dest == "/tmp/job/GeneratedScene.encoded.mp4"
+    assert ffmpeg.commands == [[
+        "ffmpeg", "-y", "-loglevel", "error", "-i", "/tmp/job/GeneratedScene.mp4",
+        "-c:v", "libx264", "-crf", "23", "-preset", "slow", "-c:a", "copy",
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+        "/tmp/job/GeneratedScene.encoded.mp4",
+    ]]
+    assert ffmpeg.limited == [(ResourceLimits(), 4242)]
+
+
+def test_transcode_command_for_webm(ffmpeg):
+    dest = _transcode("/tmp/job/GeneratedScene.webm", Encoding(format="webm", codec="libvpx-vp9"), 60, ResourceLimits())
+    # The MP4 pixel format and faststart flags don't apply to WebM
+    assert ffmpeg.commands == [[
+        "ffmpeg", "-y", "-loglevel", "error", "-i", "/tmp/job/GeneratedScene.webm",
+        "-c:v", "libvpx-vp9", "-c:a", "copy", dest,
+    ]]
+
+
+def test_transcode_failures(ffmpeg):
+    limits = ResourceLimits(file_mb=100)
+    ffmpeg.returncode, ffmpeg.stderr = 1, "Unknown encoder 'libx999'\n"
+    with pytest.raises(Exception, match="ENCODING_FAILED: Unknown encoder 'libx999'"):
+        _transcode("/tmp/job/GeneratedScene.mp4", Encoding(codec="libx999"), 60, limits)
+
+    ffmpeg.returncode = -signal.SIGXFSZ
+    with pytest.raises(Exception, match="RESOURCE_LIMIT: output file size limit"):
+        _transcode("/tmp/job/GeneratedScene.mp4", Encoding(codec="libx264"), 60, limits)
+
+
+def test_missing_ffmpeg(monkeypatch):
+    def missing(command, **kwargs):
+        raise FileNotFoundError(command[0])
+
+    monkeypatch.setattr(manim_runner.subprocess, "Popen", missing)
+    monkeypatch.setattr(manim_runner, "FFMPEG_BINARY", "/opt/ffmpeg")
+    with pytest.raises(Exception, match="ENCODING_FAILED: /opt/ffmpeg not found"):
+        _transcode("/tmp/job/GeneratedScene.mp4", Encoding(codec="libx264"), 60, ResourceLimits())
+
+
+def test_transcode_timeout_kills_ffmpeg(ffmpeg):
+    killed = []
+
+    def communicate(timeout=None):
+        if timeout is not None:
+            raise subprocess.TimeoutExpired("ffmpeg", timeout)
+        return "", ""
+
+    ffmpeg.communicate = communicate
+    ffmpeg.kill = lambda: killed.append(True)
+    with pytest.raises(Exception, match="Encoding timed out"):
+        _transcode("/tmp/job/GeneratedScene.mp4", Encoding(codec="libx264"), 5, ResourceLimits())
+    assert killed
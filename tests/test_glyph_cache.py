@@ -0,0 +1,27 @@
+import os
+
+from app.glyph_cache import GlyphCache, glyph_keys
+
+
+def render(workspace, name, size):
+    os.makedirs(workspace / "Tex", exist_ok=True)
+    (workspace / "Tex" / name).write_bytes(b"x" * size)
+
+
+def test_keys_ignore_numbers():
+    code = 'self.play(FadeIn(MathTex("x^2")), run_time=0.5)\nself.wait(2)'
+    assert glyph_keys(code) == glyph_keys('MathTex("x^2")')
+    assert len(glyph_keys(code)) == 1
+
+
+def test_publish_evicts_below_the_budget(tmp_path):
+    cache = GlyphCache(str(tmp_path / "cache"), max_bytes=2500)
+    for i in range(3):
+        workspace = tmp_path / f"job{i}"
+        render(workspace, f"{i}.svg", 1000)
+        cache.publish(str(workspace), f'Tex("{i}")')
+        os.utime(tmp_path / "cache" / "Tex" / f"{i}.svg", (i, i))
+
+    remaining = sorted(os.listdir(tmp_path / "cache" / "Tex"))
+    assert remaining == ["1.svg", "2.svg"]
+    assert cache._size <= 2500 * 0.9
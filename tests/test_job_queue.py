@@ -0,0 +1,210 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import job_queue as job_queue_module, routes
+from app.job_queue import Job, JobQueue, QueueFullError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Handler:
+    """Render handler that holds each job until the test releases it."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.release = asyncio.Event()
+        self.jobs: list[Job] = []
+
+    async def __call__(self, job: Job) -> str:
+        self.jobs.append(job)
+        job.emit("rendering")
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("manim failed")
+        return f"/videos/{job.id}.mp4"
+
+
+async def collect(queue: JobQueue, job: Job) -> list:
+    return [event async for event in queue.stream(job)]
+
+
+def test_submit_runs_the_job_and_streams_its_events():
+    async def scenario():
+        handler = Handler()
+        queue = JobQueue(handler)
+        await queue.start()
+        job = queue.submit(Job(prompt="circle"))
+        assert queue.get(job.id) is job and job.status == "queued"
+
+        events = asyncio.create_task(collect(queue, job))
+        while not handler.jobs:
+            await asyncio.sleep(0)
+        assert job.status == "running"
+        handler.release.set()
+        events = await asyncio.wait_for(events, 1)
+        await queue.stop()
+        return job, events
+
+    job, events = run(scenario())
+    assert job.status == "done" and job.video_url == f"/videos/{job.id}.mp4"
+    assert [event["phase"] for event in events] == ["queued", "rendering", "done"]
+    assert events[-1]["video_url"] == job.video_url
+
+
+def test_failed_jobs_end_the_stream_with_the_error():
+    async def scenario():
+        handler = Handler(fail=True)
+        handler.release.set()
+        queue = JobQueue(handler)
+        await queue.start()
+        job = queue.submit(Job(prompt="circle"))
+        events = await asyncio.wait_for(collect(queue, job), 1)
+        await queue.stop()
+        return job, events
+
+    job, events = run(scenario())
+    assert (job.status, job.error) == ("failed", "manim failed")
+    assert (events[-1]["phase"], events[-1]["error"]) == ("failed", "manim failed")
+
+
+def test_stream_sends_keepalives_while_idle(monkeypatch):
+    monkeypatch.setattr(job_queue_module, "KEEPALIVE_SECONDS", 0.01)
+
+    async def scenario():
+        handler = Handler()
+        queue = JobQueue(handler)
+        await queue.start()
+        job = queue.submit(Job(prompt="circle"))
+        events = []
+        async for event in queue.stream(job):
+            events.append(event)
+            if events.count(None) == 2:
+                handler.release.set()
+        await queue.stop()
+        return events
+
+    events = run(scenario())
+    phases = [event["phase"] if event else None for event in events]
+    assert phases[:2] == ["queued", "rendering"]
+    assert phases[-1] == "done"
+    assert phases.count(None) >= 2
+
+
+def test_stream_of_a_finished_job_replays_and_ends():
+    async def scenario():
+        handler = Handler()
+        handler.release.set()
+        queue = JobQueue(handler)
+        await queue.start()
+        job = queue.submit(Job(prompt="circle"))
+        await asyncio.wait_for(collect(queue, job), 1)
+        replay = await asyncio.wait_for(collect(queue, job), 1)
+        await queue.stop()
+        return replay
+
+    assert [event["phase"] for event in run(scenario())] == ["queued", "rendering", "done"]
+
+
+def test_submit_rejects_jobs_when_the_queue_is_full():
+    async def scenario():
+        # No workers started draining yet: the queue only fills up
+        queue = JobQueue(Handler(), max_queue=2)
+        await queue.start()
+        for task in queue._tasks:
+            task.cancel()
+        queue.submit(Job(prompt="a"))
+        queue.submit(Job(prompt="b"))
+        rejected = Job(prompt="c")
+        with pytest.raises(QueueFullError):
+            queue.submit(rejected)
+        await queue.stop()
+        return queue, rejected
+
+    queue, rejected = run(scenario())
+    assert queue.get(rejected.id) is None
+
+
+def test_submit_before_start_is_an_error():
+    with pytest.raises(RuntimeError):
+        JobQueue(Handler()).submit(Job(prompt="a"))
+
+
+def test_full_queue_is_a_503_with_retry_after(monkeypatch):
+    class FullQueue:
+        def submit(self, job):
+            raise QueueFullError("Render queue is full (2 jobs waiting)")
+
+    async def allow(ip, api_key=None):
+        return True, 0
+
+    monkeypatch.setattr(routes, "job_queue", FullQueue())
+    monkeypatch.setattr(routes.rate_limiter, "check", allow)
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    response = TestClient(app).post("/generate/", json={"prompt": "a blue circle"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "30"
+
+
+def test_interactive_jobs_overtake_queued_batch_jobs():
+    async def scenario():
+        order = []
+
+        async def handler(job):
+            order.append(job.prompt)
+            return ""
+
+        queue = JobQueue(handler, max_queue=10)
+        await queue.start()
+        # Queue everything before the single worker gets a turn
+        for prompt in ("batch 1", "batch 2"):
+            queue.submit(Job(prompt=prompt, priority="batch"))
+        for prompt in ("interactive 1", "interactive 2"):
+            queue.submit(Job(prompt=prompt))
+        while len(order) < 4:
+            await asyncio.sleep(0)
+        await queue.stop()
+        return order
+
+    assert run(scenario()) == ["interactive 1", "interactive 2", "batch 1", "batch 2"]
+
+
+def test_batch_jobs_only_fill_their_share_of_the_queue(monkeypatch):
+    monkeypatch.setattr(job_queue_module, "BATCH_QUEUE_SHARE", 0.5)
+
+    async def scenario():
+        handler = Handler()
+        queue = JobQueue(handler, max_queue=4)
+        await queue.start()
+        # Occupy the only worker so queued jobs stay queued
+        queue.submit(Job(prompt="running"))
+        while not handler.jobs:
+            await asyncio.sleep(0)
+
+        batch = [asyncio.create_task(queue.enqueue(Job(prompt=f"b{i}", priority="batch"))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        waiting = sum(not task.done() for task in batch)
+        depth = queue.depth
+        # Interactive jobs still find room next to the batch share
+        queue.submit(Job(prompt="interactive"))
+        queue.submit(Job(prompt="interactive"))
+        full = False
+        try:
+            queue.submit(Job(prompt="interactive"))
+        except QueueFullError:
+            full = True
+
+        handler.release.set()
+        await asyncio.wait_for(asyncio.gather(*batch), 1)
+        await queue.stop()
+        return depth, waiting, full
+
+    depth, waiting, full = run(scenario())
+    assert (depth, waiting) == (2, 1)
+    assert full
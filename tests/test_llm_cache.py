@@ -0,0 +1,17 @@
+import asyncio
+
+from app.llm_cache import LLMCache
+
+
+def test_completions_persist_in_sqlite(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMCache(ttl_seconds=60, max_entries=10, sqlite_path=path)
+    key = LLMCache.key("Plot x^2, please", "gpt-4", "v1")
+
+    asyncio.run(cache.set(key, "completion"))
+    # A fresh instance has an empty memory tier, so this hit comes from SQLite
+    reloaded = LLMCache(ttl_seconds=60, max_entries=10, sqlite_path=path)
+    assert asyncio.run(reloaded.get(LLMCache.key("plot x^2", "gpt-4", "v1"))) == "completion"
+
+    asyncio.run(reloaded.delete(key))
+    assert asyncio.run(LLMCache(ttl_seconds=60, max_entries=10, sqlite_path=path).get(key)) is None
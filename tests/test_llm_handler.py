@@ -0,0 +1,219 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AuthenticationError,
+    BadRequestError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from app import llm_handler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Stream:
+    """Streamed completion that records how far it was read and whether it was closed."""
+
+    def __init__(self, deltas: list[str]):
+        self.deltas = deltas
+        self.sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.sent == len(self.deltas):
+            raise StopAsyncIteration
+        delta = self.deltas[self.sent]
+        self.sent += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+    async def close(self):
+        self.closed = True
+
+
+def stub_client(monkeypatch, stream: Stream):
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream
+
+    completions = SimpleNamespace(create=create)
+    monkeypatch.setattr(llm_handler, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+
+SCENE = [
+    "```python\nfrom manim import *\n\n",
+    "class GeneratedScene(Scene):\n",
+    "    def construct(self):\n        self.wait(2)\n",
+    "```",
+]
+
+
+def stream_completion(monkeypatch, deltas: list[str]) -> tuple[Stream, object]:
+    stream = Stream(deltas)
+    stub_client(monkeypatch, stream)
+    try:
+        result = run(llm_handler._stream_completion([]))
+    except Exception as e:
+        result = e
+    return stream, result
+
+
+def test_refusal_hangs_up_on_the_first_chunk(monkeypatch):
+    stream, result = stream_completion(monkeypatch, ["I'm sorry, but", " I can't help with that."] + SCENE)
+    assert str(result) == "UNUSABLE_OUTPUT: model refused the prompt"
+    assert stream.sent == 1 and stream.closed
+
+
+def test_prose_without_code_is_abandoned(monkeypatch):
+    monkeypatch.setattr(llm_handler, "LLM_PROSE_LIMIT", 20)
+    stream, result = stream_completion(monkeypatch, ["Let me explain ", "how a circle works ", "in great detail."] + SCENE)
+    assert str(result) == "UNUSABLE_OUTPUT: no code in the first 20 characters"
+    assert stream.sent == 2 and stream.closed
+
+
+def test_wrong_scene_class_is_abandoned(monkeypatch):
+    deltas = ["from manim import *\n", "class Circles(Scene):\n", "    def construct(self):\n"]
+    stream, result = stream_completion(monkeypatch, deltas)
+    assert str(result) == "UNUSABLE_OUTPUT: scene class is named Circles instead of GeneratedScene"
+    assert stream.sent == 2 and stream.closed
+
+
+def test_token_budget_is_enforced_mid_stream(monkeypatch):
+    monkeypatch.setattr(llm_handler, "LLM_MAX_TOKENS", 3)
+    stream, result = stream_completion(monkeypatch, ["from manim import *\n"] + ["        self.wait()\n"] * 10)
+    assert str(result) == "UNUSABLE_OUTPUT: exceeded the 3 token budget"
+    assert stream.sent == 4 and stream.closed
+
+
+def test_commentary_after_the_code_fence_is_not_read(monkeypatch):
+    stream, result = stream_completion(monkeypatch, SCENE + ["\n\nThis scene shows", " a pause."])
+    assert result == "".join(SCENE)
+    assert stream.sent == len(SCENE) and stream.closed
+
+
+def test_unfenced_code_is_read_to_the_end(monkeypatch):
+    deltas = [delta.strip("`").removeprefix("python\n") for delta in SCENE]
+    stream, result = stream_completion(monkeypatch, deltas)
+    assert result == "".join(deltas).strip()
+    assert stream.sent == len(deltas) and stream.closed
+
+
+def api_error(cls, status: int, message: str = "upstream error", headers: dict = None):
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    return cls(message, response=httpx.Response(status, headers=headers, request=request), body=None)
+
+
+class Flaky:
+    """Call that raises the given errors in turn, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_handler, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_MAX", 0.004)
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_MAX", 5.0)
+    bounds = []
+    monkeypatch.setattr(llm_handler.random, "uniform", lambda low, high: bounds.append((low, high)) or high / 2)
+    error = APIConnectionError(request=httpx.Request("POST", "https://api.example.com"))
+
+    assert [llm_handler._retry_delay(error, attempt) for attempt in range(4)] == [0.5, 1.0, 2.0, 2.5]
+    assert bounds == [(0, 1.0), (0, 2.0), (0, 4.0), (0, 5.0)]
+
+
+def test_backoff_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_MAX", 5.0)
+    assert llm_handler._retry_delay(api_error(RateLimitError, 429, headers={"retry-after": "3"}), 0) >= 3.0
+    # Capped, so a server can't park a worker for minutes
+    assert llm_handler._retry_delay(api_error(RateLimitError, 429, headers={"retry-after": "600"}), 0) == 5.0
+
+
+def test_transient_errors_are_retried(fast_backoff):
+    call = Flaky(
+        api_error(InternalServerError, 502),
+        APITimeoutError(request=httpx.Request("POST", "https://api.example.com")),
+    )
+    assert run(llm_handler._call_with_retries(call)) == "ok"
+    assert call.calls == 3
+
+
+def test_retries_give_up_after_the_limit(fast_backoff):
+    call = Flaky(*[api_error(RateLimitError, 429) for _ in range(3)])
+    with pytest.raises(RateLimitError):
+        run(llm_handler._call_with_retries(call))
+    assert call.calls == 3
+
+
+@pytest.mark.parametrize("error", [
+    api_error(RateLimitError, 429, "You exceeded your current quota"),
+    api_error(AuthenticationError, 401),
+    api_error(BadRequestError, 400),
+])
+def test_permanent_errors_are_not_retried(fast_backoff, error):
+    call = Flaky(error)
+    with pytest.raises(type(error)):
+        run(llm_handler._call_with_retries(call))
+    assert call.calls == 1
+
+
+def test_in_flight_calls_are_bounded(monkeypatch, fast_backoff):
+    monkeypatch.setattr(llm_handler, "_in_flight", asyncio.Semaphore(2))
+    active = peak = 0
+
+    async def call():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(*(llm_handler._call_with_retries(call) for _ in range(5)))
+
+    assert run(scenario()) == ["ok"] * 5
+    assert peak == 2
+
+
+def test_backoff_does_not_hold_an_in_flight_slot(monkeypatch, fast_backoff):
+    monkeypatch.setattr(llm_handler, "_in_flight", asyncio.Semaphore(1))
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(llm_handler, "LLM_BACKOFF_MAX", 0.05)
+    monkeypatch.setattr(llm_handler.random, "uniform", lambda low, high: high)
+    finished = []
+
+    async def named(name, call):
+        await llm_handler._call_with_retries(call)
+        finished.append(name)
+
+    async def scenario():
+        failing = Flaky(api_error(InternalServerError, 503))
+        await asyncio.gather(named("retried", failing), named("other", Flaky()))
+
+    run(scenario())
+    # The second call ran while the first was backing off
+    assert finished == ["other", "retried"]
@@ -0,0 +1,40 @@
+from prometheus_client import generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.metrics import CACHE_HITS, FALLBACKS, PHASE_SECONDS, QUEUE_DEPTH, phase, registry
+
+
+def scrape() -> dict:
+    samples = {}
+    for family in text_string_to_metric_families(generate_latest(registry).decode()):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return samples
+
+
+def test_scrape_includes_phases_and_callback_metrics():
+    with phase("test_phase"):
+        pass
+    FALLBACKS.labels(reason='quote " and \\ backslash').inc()
+    QUEUE_DEPTH.set_function(lambda: 3)
+    CACHE_HITS.set_function(lambda: {("llm",): 5, ("render",): 2})
+
+    samples = scrape()
+
+    assert samples[("manimate_phase_seconds_count", (("phase", "test_phase"),))] == 1
+    assert samples[("manimate_fallbacks_total", (("reason", 'quote " and \\ backslash'),))] == 1
+    assert samples[("manimate_queue_depth", ())] == 3
+    assert samples[("manimate_cache_hits_total", (("cache", "render"),))] == 2
+
+
+def test_failing_callback_does_not_break_the_scrape():
+    def broken():
+        raise RuntimeError("database is locked")
+
+    QUEUE_DEPTH.set_function(broken)
+    PHASE_SECONDS.labels(phase="still_there").observe(0.2)
+
+    samples = scrape()
+
+    assert ("manimate_queue_depth", ()) not in samples
+    assert samples[("manimate_phase_seconds_sum", (("phase", "still_there"),))] == 0.2
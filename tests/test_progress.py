@@ -0,0 +1,75 @@
+import io
+import threading
+
+from app.manim_runner import _watch_output
+from app.render_worker import _report_progress
+
+# What Manim's progress bar prints once text mode has split its carriage returns into lines
+MANIM_OUTPUT = """\
+Animation 0: Create(Circle):   0%|          | 0/15
+Animation 0: Create(Circle):  53%|#####     | 8/15
+Animation 0: Create(Circle): 100%|##########| 15/15
+Animation 1: FadeOut(Circle):   0%|          | 0/15
+Animation 1: FadeOut(Circle): 100%|##########| 15/15
+INFO     Combining to Movie file.
+INFO     File ready at '/tmp/output/GeneratedScene.mp4'
+"""
+
+
+def watch(output: str, with_progress: bool = True):
+    events, lines = [], []
+    on_progress = (lambda phase, **data: events.append((phase, data))) if with_progress else None
+    reader = threading.Thread(target=_watch_output, args=(io.StringIO(output), lines, on_progress))
+    reader.start()
+    reader.join(1)
+    return events, lines
+
+
+def test_reports_each_animation_once_then_encoding():
+    events, lines = watch(MANIM_OUTPUT)
+    assert events == [
+        ("rendering", {"animation": 1}),
+        ("rendering", {"animation": 2}),
+        ("encoding", {}),
+    ]
+    assert "".join(lines) == MANIM_OUTPUT
+
+
+def test_output_without_progress_lines_reports_nothing():
+    events, lines = watch("Traceback (most recent call last):\nNameError: name 'Foo' is not defined\n")
+    assert events == []
+    assert len(lines) == 2
+
+
+def test_collects_output_without_a_callback():
+    events, lines = watch(MANIM_OUTPUT, with_progress=False)
+    assert events == [] and "".join(lines) == MANIM_OUTPUT
+
+
+class FakeScene:
+    """Just enough of a Manim scene for _report_progress to wrap."""
+
+    def __init__(self):
+        self.calls = []
+        self.renderer = self
+
+    def play(self, *animations):
+        self.calls.append(("play", animations))
+
+    def scene_finished(self, scene):
+        self.calls.append(("finished", scene))
+
+    def render(self):
+        self.play("Create")
+        self.play("FadeOut")
+        self.renderer.scene_finished(self)
+
+
+def test_warm_worker_reports_plays_and_encoding():
+    scene, events = FakeScene(), []
+    _report_progress(scene, lambda phase, **data: events.append((phase, data)))
+    scene.render()
+
+    assert events == [("rendering", {"animation": 1}), ("rendering", {"animation": 2}), ("encoding", {})]
+    # The wrapped methods still run
+    assert [call[0] for call in scene.calls] == ["play", "play", "finished"]
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.rate_limiter import MemoryBackend, RateLimitBackend, RateLimiter, RedisBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def redis_backend(**kwargs) -> RedisBackend:
+    """A RedisBackend on fakeredis, which runs RedisBackend.SCRIPT with a real Lua interpreter."""
+    pytest.importorskip("lupa")
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    return RedisBackend(aioredis.FakeRedis(), **kwargs)
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+
+
+def test_redis_script_stores_tat_with_expiry():
+    backend = redis_backend(prefix="test:")
+
+    async def scenario():
+        allowed = await backend.acquire("ip:1.2.3.4", 10.0, 20.0)
+        ttl_ms = await backend.client.pttl("test:ip:1.2.3.4")
+        return allowed, ttl_ms
+
+    allowed, ttl_ms = run(scenario())
+    assert allowed == (True, 0.0)
+    assert 9000 < ttl_ms <= 10000
+
+
+def test_redis_script_bursts_then_reports_retry_after():
+    limiter = RateLimiter(max_requests=3, window_seconds=30, backend=redis_backend())
+
+    async def scenario():
+        burst = [(await limiter.is_allowed("ip:a"))[0] for _ in range(3)]
+        return burst, await limiter.is_allowed("ip:a"), await limiter.is_allowed("ip:b")
+
+    burst, denied, other = run(scenario())
+    assert burst == [True, True, True]
+    assert denied == (False, 10)
+    # Other keys have their own budget
+    assert other == (True, 0)
+
+
+def test_redis_script_earns_requests_back():
+    backend = redis_backend()
+
+    async def scenario():
+        results = [await backend.acquire("ip:a", 0.05, 0.05) for _ in range(3)]
+        await asyncio.sleep(0.06)
+        results.append(await backend.acquire("ip:a", 0.05, 0.05))
+        return results
+
+    first, second, third, later = run(scenario())
+    assert first[0] and second[0] and later[0]
+    assert not third[0] and 0 < third[1] <= 0.05
+
+
+def test_redis_errors_fail_open():
+    class Unreachable:
+        def register_script(self, script):
+            async def call(keys, args):
+                raise ConnectionError("redis is down")
+            return call
+
+    limiter = RateLimiter(max_requests=1, window_seconds=60, backend=RedisBackend(Unreachable()))
+    assert run(limiter.is_allowed("ip:a")) == (True, 0)
+    assert run(limiter.is_allowed("ip:a")) == (True, 0)
+
+
+def test_memory_backend_matches_redis_backend():
+    limiter = RateLimiter(max_requests=2, window_seconds=60, backend=MemoryBackend())
+
+    assert run(limiter.is_allowed("ip:a")) == (True, 0)
+    assert run(limiter.is_allowed("ip:a")) == (True, 0)
+    allowed, retry_after = run(limiter.is_allowed("ip:a"))
+    assert not allowed and 1 <= retry_after <= 30
+
+
+def test_api_key_quota_replaces_the_ip_limit():
+    limiter = RateLimiter(max_requests=1, window_seconds=60, api_key_quotas={"k": (2, 60)})
+
+    assert run(limiter.check("1.1.1.1")) == (True, 0)
+    assert not run(limiter.check("1.1.1.1"))[0]
+    # The key's budget is shared across IPs and independent of their own limits
+    assert run(limiter.check("1.1.1.1", "k")) == (True, 0)
+    assert run(limiter.check("2.2.2.2", "k")) == (True, 0)
+    assert not run(limiter.check("3.3.3.3", "k"))[0]
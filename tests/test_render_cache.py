@@ -0,0 +1,76 @@
+import os
+
+from app.render_cache import RenderCache
+
+SCENE = """from manim import *
+
+class GeneratedScene(Scene):
+    def construct(self):
+        self.play(Create(Circle()))
+"""
+
+
+def cache(tmp_path, **kwargs) -> RenderCache:
+    return RenderCache(str(tmp_path / "renders"), kwargs.pop("max_bytes", 1 << 20), **kwargs)
+
+
+def video(tmp_path, name: str, data: bytes = b"video") -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_key_ignores_comments_and_layout(tmp_path):
+    renders = cache(tmp_path)
+    reformatted = SCENE.replace("    ", "  ").replace("Circle()))", "Circle()))  # the circle") + "\n\n"
+    assert renders.key(SCENE, ["-qm"]) == renders.key(reformatted, ["-qm"])
+    # Stable across instances, so a restart keeps its cache
+    assert renders.key(SCENE, ["-qm"]) == cache(tmp_path / "other").key(SCENE, ["-qm"])
+
+
+def test_key_changes_with_code_and_flags(tmp_path):
+    renders = cache(tmp_path)
+    key = renders.key(SCENE, ["-qm"])
+    assert renders.key(SCENE.replace("Circle", "Square"), ["-qm"]) != key
+    assert renders.key(SCENE, ["-qh"]) != key
+    assert renders.key(SCENE, ["-qm", "-s"]) != key
+
+
+def test_miss(tmp_path):
+    renders = cache(tmp_path)
+    dest = tmp_path / "out.mp4"
+    assert not renders.fetch(renders.key(SCENE, ["-qm"]), str(dest))
+    assert not dest.exists()
+    assert (renders.hits, renders.misses) == (0, 1)
+
+
+def test_store_then_fetch(tmp_path):
+    renders = cache(tmp_path)
+    key = renders.key(SCENE, ["-qm"])
+    renders.store(key, video(tmp_path, "render.mp4", b"frames"))
+
+    dest = tmp_path / "cached.mp4"
+    assert renders.fetch(key, str(dest))
+    assert dest.read_bytes() == b"frames"
+    assert (renders.hits, renders.misses) == (1, 0)
+    # Entries are per extension: the same scene's PNG frame is a separate render
+    assert not renders.fetch(key, str(tmp_path / "cached.png"))
+
+
+def test_disabled_cache_never_hits(tmp_path):
+    renders = cache(tmp_path, enabled=False)
+    key = renders.key(SCENE, ["-qm"])
+    renders.store(key, video(tmp_path, "render.mp4"))
+    assert not renders.fetch(key, str(tmp_path / "cached.mp4"))
+    assert not os.path.exists(renders.directory)
+
+
+def test_evicts_least_recently_used_over_budget(tmp_path):
+    renders = cache(tmp_path, max_bytes=25)
+    for i, key in enumerate(["a", "b"]):
+        renders.store(key, video(tmp_path, f"{key}.mp4", b"x" * 10))
+        os.utime(renders._path(key, ".mp4"), (i, i))
+    renders.store("c", video(tmp_path, "c.mp4", b"x" * 10))
+
+    assert sorted(os.listdir(renders.directory)) == ["b.mp4", "c.mp4"]
+    assert renders._size == 20
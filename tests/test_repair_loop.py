@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app import pipeline
+from app.job_queue import Job
+
+
+class Renderer:
+    """Stands in for render_generated: fails with each error in turn, then renders."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.codes = []
+
+    async def __call__(self, job, code):
+        self.codes.append(code)
+        if self.errors:
+            raise Exception(self.errors.pop(0))
+        return "/videos/ok.mp4"
+
+
+@pytest.fixture
+def repair(monkeypatch):
+    """Enable repairs with a stub LLM; returns the list of (code, error) it was asked to fix."""
+    calls = []
+
+    async def repair_manim_code(prompt, code, error, max_tokens):
+        calls.append((code, error, max_tokens))
+        return f"fixed {len(calls)}", 1000
+
+    async def forget_completion(prompt):
+        pass
+
+    monkeypatch.setattr(pipeline, "REPAIR_ENABLED", True)
+    monkeypatch.setattr(pipeline, "REPAIR_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(pipeline, "REPAIR_BUDGET_SECONDS", 60)
+    monkeypatch.setattr(pipeline, "REPAIR_MAX_TOKENS", 5000)
+    monkeypatch.setattr(pipeline, "repair_manim_code", repair_manim_code)
+    monkeypatch.setattr(pipeline, "forget_completion", forget_completion)
+    monkeypatch.setattr(pipeline, "repair_stats", pipeline.RepairStats())
+    return calls
+
+
+def test_first_repair_succeeds(monkeypatch, repair):
+    renderer = Renderer("Manim failed: NameError: name 'Foo' is not defined")
+    monkeypatch.setattr(pipeline, "render_generated", renderer)
+    job = Job(prompt="a circle")
+
+    assert asyncio.run(pipeline.render_with_repair(job, "broken")) == "/videos/ok.mp4"
+
+    assert renderer.codes == ["broken", "fixed 1"]
+    assert repair[0][1].startswith("Manim failed")
+    assert [e["attempt"] for e in job.events if e["phase"] == "repairing"] == [1]
+    stats = pipeline.repair_stats
+    assert (stats.attempts, stats.repaired, stats.failed, stats.tokens) == (1, 1, 0, 1000)
+
+
+def test_stops_at_the_attempt_cap(monkeypatch, repair):
+    renderer = Renderer(*["Manim failed: still broken"] * 5)
+    monkeypatch.setattr(pipeline, "render_generated", renderer)
+
+    with pytest.raises(Exception, match="still broken"):
+        asyncio.run(pipeline.render_with_repair(Job(prompt="a circle"), "broken"))
+
+    assert len(repair) == 2
+    assert renderer.codes == ["broken", "fixed 1", "fixed 2"]
+    assert (pipeline.repair_stats.attempts, pipeline.repair_stats.failed) == (2, 1)
+
+
+def test_stops_when_the_token_budget_is_spent(monkeypatch, repair):
+    monkeypatch.setattr(pipeline, "REPAIR_MAX_ATTEMPTS", 10)
+    monkeypatch.setattr(pipeline, "REPAIR_MAX_TOKENS", 1500)
+    monkeypatch.setattr(pipeline, "render_generated", Renderer(*["Manim failed: still broken"] * 5))
+
+    with pytest.raises(Exception, match="still broken"):
+        asyncio.run(pipeline.render_with_repair(Job(prompt="a circle"), "broken"))
+
+    # 1500 tokens cover one 1000-token repair and leave 500 for a second; then nothing is left
+    assert [max_tokens for _, _, max_tokens in repair] == [1500, 500]
+
+
+def test_stops_when_the_time_budget_is_spent(monkeypatch, repair):
+    monkeypatch.setattr(pipeline, "REPAIR_BUDGET_SECONDS", 0)
+    monkeypatch.setattr(pipeline, "render_generated", Renderer("Manim failed: broken"))
+
+    with pytest.raises(Exception, match="broken"):
+        asyncio.run(pipeline.render_with_repair(Job(prompt="a circle"), "broken"))
+
+    assert repair == []
+
+
+def test_infrastructure_errors_are_not_repaired(monkeypatch, repair):
+    monkeypatch.setattr(pipeline, "render_generated", Renderer("RENDER_WORKER_FAILED: worker exited"))
+
+    with pytest.raises(Exception, match="RENDER_WORKER_FAILED"):
+        asyncio.run(pipeline.render_with_repair(Job(prompt="a circle"), "fine"))
+
+    assert repair == []
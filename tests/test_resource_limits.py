@@ -0,0 +1,40 @@
+import signal
+
+from app import resource_limits
+from app.resource_limits import ResourceLimits, limit_exceeded, limits_for
+
+LIMITS = ResourceLimits(memory_mb=4096, cpu_seconds=900, file_mb=2048)
+
+
+def test_sigkill_is_reported_as_out_of_memory():
+    assert "out of memory" in limit_exceeded(LIMITS, -signal.SIGKILL)
+
+
+def test_memory_errors_in_the_output():
+    traceback = "Traceback (most recent call last):\n  ...\nMemoryError"
+    assert limit_exceeded(LIMITS, 1, traceback) == "memory limit (4096 MB) exceeded"
+    assert limit_exceeded(LIMITS, 1, "OSError: [Errno 12] Cannot allocate memory") == "memory limit (4096 MB) exceeded"
+
+
+def test_file_size_limit():
+    assert limit_exceeded(LIMITS, -signal.SIGXFSZ) == "output file size limit (2048 MB) exceeded"
+    assert limit_exceeded(LIMITS, 1, "OSError: [Errno 27] File too large") == "output file size limit (2048 MB) exceeded"
+
+
+def test_cpu_limit():
+    assert limit_exceeded(LIMITS, -signal.SIGXCPU) == "CPU time limit (900s) exceeded"
+
+
+def test_ordinary_failures_are_not_limits():
+    assert limit_exceeded(LIMITS, 1, "NameError: name 'Foo' is not defined") is None
+    assert limit_exceeded(LIMITS, None) is None
+
+
+def test_limits_for_priority_classes(monkeypatch):
+    monkeypatch.setattr(resource_limits, "RENDER_NICE", 0)
+    monkeypatch.setattr(resource_limits, "RENDER_BATCH_NICE", 10)
+
+    assert limits_for("interactive").nice == 0
+    assert limits_for("batch").nice == 10
+    # Only the nice level differs between the classes
+    assert limits_for("batch").to_dict() == {**limits_for("interactive").to_dict(), "nice": 10}
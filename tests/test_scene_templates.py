@@ -0,0 +1,28 @@
+import pytest
+
+from app.scene_templates import Expression, match_template
+
+
+@pytest.mark.parametrize("prompt, function", [
+    ("plot sin 2x", "np.sin(2 * x)"),
+    ("plot cos 3x from 0 to pi", "np.cos(3 * x)"),
+    ("plot sin x^2", "np.sin(x ** 2)"),
+    ("plot sin x cos x", "np.sin(x) * np.cos(x)"),
+    ("plot sin x + 1", "np.sin(x) + 1"),
+    ("plot log2(x) from 1 to 10", "np.log2(x)"),
+    ("plot log10(x) from 1 to 100", "np.log10(x)"),
+])
+def test_implicit_call_takes_the_whole_product(prompt, function):
+    match = match_template(prompt)
+    assert match is not None and match.params["function"] == function
+
+
+def test_log_with_a_base_uses_that_base():
+    assert Expression("log10(x)").latex == r"\log_{10}\left(x\right)"
+    assert Expression("log2 x")(8) == 3
+    # "plot log10(x)" has no domain where log10 is defined everywhere, so it goes to the LLM
+    assert match_template("plot log10(x)") is None
+
+
+def test_unknown_log_base_goes_to_the_llm():
+    assert match_template("plot log3(x) from 1 to 10") is None
@@ -0,0 +1,93 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import video_routes
+from app.artifact_store import ArtifactStore, LocalBackend
+
+DATA = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    """A client for the /videos route and the name of a 1 KiB artifact it serves."""
+    store = ArtifactStore(LocalBackend(str(tmp_path / "generate")), str(tmp_path / "index.sqlite3"), 1 << 30, 3600)
+    src = tmp_path / "render.mp4"
+    src.write_bytes(DATA)
+    name = store.put(str(src), ".mp4")
+    monkeypatch.setattr(video_routes, "artifact_store", store)
+    monkeypatch.setattr(video_routes, "VIDEO_ACCEL_REDIRECT", None)
+    app = FastAPI()
+    app.include_router(video_routes.router)
+    return TestClient(app), name
+
+
+def test_whole_file_is_immutable(video):
+    client, name = video
+    response = client.get(f"/videos/{name}")
+
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["etag"] == f'"{name[:32]}"'
+    assert "immutable" in response.headers["cache-control"]
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=-100", 924, 1023),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+def test_single_ranges(video, header, start, end):
+    client, name = video
+    response = client.get(f"/videos/{name}", headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/1024"
+
+
+def test_multiple_ranges_get_the_whole_file(video):
+    client, name = video
+    response = client.get(f"/videos/{name}", headers={"Range": "bytes=0-9,20-29"})
+
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_unsatisfiable_range(video):
+    client, name = video
+    response = client.get(f"/videos/{name}", headers={"Range": "bytes=2048-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+
+def test_if_none_match(video):
+    client, name = video
+    etag = client.get(f"/videos/{name}").headers["etag"]
+
+    response = client.get(f"/videos/{name}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_if_range_mismatch_sends_the_whole_file(video):
+    client, name = video
+    response = client.get(f"/videos/{name}", headers={"Range": "bytes=0-9", "If-Range": '"something-else"'})
+
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_parse_range_rejects_what_it_does_not_handle():
+    for header in ("bytes=0-9,20-29", "items=0-9", "bytes=-", "bytes=9-0"):
+        with pytest.raises(ValueError):
+            video_routes._parse_range(header, 1024)
+    assert video_routes._parse_range("bytes=-0", 1024) is None
+
+
+def test_unknown_names_are_404(video):
+    client, _ = video
+    assert client.get("/videos/../config.py").status_code == 404
+    assert client.get(f"/videos/{'0' * 32}.mp4").status_code == 404
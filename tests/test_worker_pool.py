@@ -0,0 +1,25 @@
+import pytest
+
+from app import worker_pool
+from app.worker_pool import WorkerCrashed, WorkerPool, WorkerUnavailable
+
+
+def test_acquire_gives_up_when_no_worker_becomes_idle(monkeypatch):
+    monkeypatch.setattr(worker_pool, "ACQUIRE_TIMEOUT", 0.01)
+    pool = WorkerPool(1)
+    pool._spawned = 1  # a background respawn that will never deliver
+
+    with pytest.raises(WorkerUnavailable):
+        pool.render({}, timeout=1)
+
+
+def test_spawn_failure_is_reported_as_unavailable(monkeypatch):
+    def crash(on_spawn=None):
+        raise WorkerCrashed("Render worker failed to start: ImportError")
+
+    monkeypatch.setattr(worker_pool, "RenderWorker", crash)
+    pool = WorkerPool(1)
+
+    with pytest.raises(WorkerUnavailable):
+        pool.render({}, timeout=1)
+    assert pool._spawned == 0